@@ -1,20 +1,36 @@
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 from config import Config
-from flasgger import Swagger
-from app.extensions import db, migrate, jwt
+from app.extensions import db, jwt
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    from app.utils.uploads import SpooledUploadRequest
+    app.request_class = SpooledUploadRequest
+    
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
     jwt.init_app(app)
+    # Flask-Migrate loads Alembic, which only the `flask db` commands need
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
+    # Registered first so the profile covers the other request hooks
+    from app.utils.profiler import init_profiling
+    init_profiling(app)
+    from app.utils.sql_instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+    from app.utils.slow_queries import init_slow_query_log
+    init_slow_query_log(app)
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
     
     # Import models
-    from app.models import user, space, booking, testimonial
+    from app.models import user, space, booking, testimonial, media
     
     # Configure CORS - Development configuration
     CORS(app, 
@@ -28,7 +44,7 @@ def create_app(config_class=Config):
              "supports_credentials": True,
              "max_age": 120
          }})
-
+    
     # Add error handlers
     @app.errorhandler(500)
     def handle_500_error(e):
@@ -38,7 +54,7 @@ def create_app(config_class=Config):
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 500
-
+    
     @app.errorhandler(404)
     def handle_404_error(e):
         response = jsonify({"error": "Not found", "message": str(e)})
@@ -47,7 +63,19 @@ def create_app(config_class=Config):
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 404
-
+    
+    @app.errorhandler(413)
+    def handle_413_error(e):
+        response = jsonify({
+            "error": "Request too large",
+            "message": f"Uploads are limited to {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB per request"
+        })
+        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:5174')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 413
+    
     @app.after_request
     def after_request(response):
         if not response.headers.get('Access-Control-Allow-Origin'):
@@ -57,117 +85,6 @@ def create_app(config_class=Config):
             response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
     
-    # Configure Swagger
-    swagger_config = {
-        "headers": [],
-        "specs": [
-            {
-                "endpoint": 'apispec',
-                "route": '/apispec.json',
-                "rule_filter": lambda rule: True,  # all in
-                "model_filter": lambda tag: True,  # all in
-            }
-        ],
-        "static_url_path": "/flasgger_static",
-        "swagger_ui": True,
-        "specs_route": "/docs"
-    }
-    
-    swagger_template = {
-        "swagger": "2.0",
-        "info": {
-            "title": "Spacer API",
-            "description": "API for managing space bookings",
-            "version": "1.0.0"
-        },
-        "securityDefinitions": {
-            "BearerAuth": {
-                "type": "apiKey",
-                "name": "Authorization",
-                "in": "header"
-            }
-        },
-        "components": {
-            "schemas": {
-                "User": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "integer", "example": 1},
-                        "email": {"type": "string", "example": "user@example.com"},
-                        "first_name": {"type": "string", "example": "John"},
-                        "last_name": {"type": "string", "example": "Doe"},
-                        "name": {"type": "string", "example": "John Doe"},
-                        "role": {"type": "string", "enum": ["admin", "owner", "client"], "example": "client"},
-                        "phone": {"type": "string", "example": "254712345678"},
-                        "bio": {"type": "string", "example": "Software developer"},
-                        "avatar_url": {"type": "string", "example": "https://example.com/avatar.jpg"},
-                        "is_verified": {"type": "boolean", "example": True},
-                        "created_at": {"type": "string", "format": "date-time"},
-                        "updated_at": {"type": "string", "format": "date-time"}
-                    }
-                },
-                "Space": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "integer", "example": 1},
-                        "name": {"type": "string", "example": "Conference Room"},
-                        "description": {"type": "string", "example": "Spacious room for meetings"},
-                        "address": {"type": "string", "example": "123 Main St"},
-                        "city": {"type": "string", "example": "Nairobi"},
-                        "price_per_hour": {"type": "number", "example": 100.0},
-                        "capacity": {"type": "integer", "example": 20},
-                        "is_available": {"type": "boolean", "example": True},
-                        "owner_id": {"type": "integer", "example": 1},
-                        "images": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "id": {"type": "integer", "example": 1},
-                                    "image_url": {"type": "string", "example": "https://example.com/space.jpg"},
-                                    "is_primary": {"type": "boolean", "example": True}
-                                }
-                            }
-                        },
-                        "created_at": {"type": "string", "format": "date-time"},
-                        "updated_at": {"type": "string", "format": "date-time"}
-                    }
-                },
-                "Booking": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "integer", "example": 1},
-                        "space_id": {"type": "integer", "example": 1},
-                        "user_id": {"type": "integer", "example": 1},
-                        "start_time": {"type": "string", "format": "date-time"},
-                        "end_time": {"type": "string", "format": "date-time"},
-                        "total_price": {"type": "number", "example": 200.0},
-                        "purpose": {"type": "string", "example": "Team meeting"},
-                        "status": {"type": "string", "enum": ["pending", "confirmed", "cancelled", "completed"], "example": "pending"},
-                        "payment_status": {"type": "string", "enum": ["pending", "paid", "refunded"], "example": "pending"},
-                        "created_at": {"type": "string", "format": "date-time"},
-                        "updated_at": {"type": "string", "format": "date-time"}
-                    }
-                },
-                "Payment": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "integer", "example": 1},
-                        "booking_id": {"type": "integer", "example": 1},
-                        "amount": {"type": "number", "example": 200.0},
-                        "payment_method": {"type": "string", "enum": ["mpesa", "card", "cash"], "example": "mpesa"},
-                        "transaction_id": {"type": "string", "example": "MPESA123456789"},
-                        "status": {"type": "string", "enum": ["pending", "completed", "failed", "refunded"], "example": "completed"},
-                        "created_at": {"type": "string", "format": "date-time"},
-                        "updated_at": {"type": "string", "format": "date-time"}
-                    }
-                }
-            }
-        }
-    }
-    
-    Swagger(app, config=swagger_config, template=swagger_template)
-    
     # Register blueprints
     from app.routes.main import main_bp
     from app.routes.auth import auth_bp
@@ -178,11 +95,36 @@ def create_app(config_class=Config):
     from app.routes.testimonials import testimonials_bp
     
     app.register_blueprint(main_bp)
+    if app.config['METRICS_ENABLED']:
+        from app.routes.metrics import metrics_bp
+        app.register_blueprint(metrics_bp)
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(spaces_bp, url_prefix='/api/spaces')
     app.register_blueprint(bookings_bp, url_prefix='/api/bookings')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(payments_bp, url_prefix='/api/payments')
     app.register_blueprint(testimonials_bp, url_prefix='/api/testimonials')
+    if app.config['PROFILING_ENABLED']:
+        from app.routes.profiles import profiles_bp
+        app.register_blueprint(profiles_bp, url_prefix='/api/profiles')
+    
+    if app.config['IMAGE_STORAGE_BACKEND'] == 'local':
+        from app.routes.media import media_bp
+        app.register_blueprint(media_bp)
+    
+    from app.utils.openapi import init_openapi
+    init_openapi(app)
+    
+    from app.commands import register_commands
+    register_commands(app)
+    
+    if app.config['SEED_TESTIMONIALS_ON_STARTUP']:
+        from app.utils.testimonials import seed_testimonials
+        with app.app_context():
+            try:
+                seed_testimonials()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Failed to seed testimonials: {str(e)}")
     
     return app 
\ No newline at end of file
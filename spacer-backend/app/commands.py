@@ -0,0 +1,188 @@
+import click
+import json
+import time
+from flask import current_app
+
+def register_commands(app):
+    """Attach the maintenance commands to ``flask <command>``."""
+    
+    @app.cli.command('process-mpesa-callbacks')
+    @click.option('--batch-size', type=int, default=None, help='Callbacks applied per transaction')
+    def process_mpesa_callbacks(batch_size):
+        """Apply stored M-Pesa callbacks that have not been processed yet."""
+        from app.utils.mpesa_callbacks import process_pending_callbacks
+        processed = process_pending_callbacks(batch_size or current_app.config['MPESA_CALLBACK_BATCH_SIZE'])
+        click.echo(f'Processed {processed} callbacks')
+    
+    @app.cli.command('seed-testimonials')
+    def seed_testimonials():
+        """Insert the sample landing page testimonials if they are missing."""
+        from app.utils.testimonials import seed_testimonials
+        click.echo(f'Added {seed_testimonials()} testimonials')
+    
+    @app.cli.command('reconcile-payments')
+    @click.option('--older-than', type=int, default=None, help='Minutes a payment must have been pending')
+    @click.option('--limit', type=int, default=None, help='Maximum payments to check per run')
+    @click.option('--workers', type=int, default=None, help='Concurrent STK status queries')
+    @click.option('--dry-run', is_flag=True, help='Report what would change without writing')
+    @click.option('--interval', type=int, default=0, help='Repeat every N seconds instead of running once')
+    def reconcile_payments(older_than, limit, workers, dry_run, interval):
+        """Settle stale pending M-Pesa payments via the STK query API.
+        
+        Schedule it from cron (e.g. every 5 minutes) or run it as a sidecar
+        with --interval.
+        """
+        from app.utils.reconciler import reconcile_pending_payments
+        while True:
+            report = reconcile_pending_payments(older_than, limit, workers, dry_run)
+            click.echo(json.dumps(report, indent=2))
+            if not interval:
+                break
+            time.sleep(interval)
+    
+    @app.cli.command('process-space-images')
+    @click.option('--older-than', type=int, default=10, help='Minutes an image must have been processing')
+    def process_space_images(older_than):
+        """Retry space images left in "processing", e.g. after a worker restart."""
+        from datetime import datetime, timedelta
+        from app.models.space import SpaceImage
+        from app.utils.image_pipeline import process_space_images
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than)
+        image_ids = [
+            image_id for (image_id,) in SpaceImage.query.with_entities(SpaceImage.id).filter(
+                SpaceImage.status == 'processing',
+                SpaceImage.created_at < cutoff
+            )
+        ]
+        processed = process_space_images(image_ids) if image_ids else 0
+        click.echo(f'Processed {processed} of {len(image_ids)} stuck images')
+    
+    @app.cli.command('gc-images')
+    @click.option('--older-than', type=int, default=None, help='Minutes a tombstone must have aged')
+    @click.option('--limit', type=int, default=None, help='Tombstones handled per batch')
+    @click.option('--workers', type=int, default=None, help='Concurrent storage deletes')
+    @click.option('--rate', type=float, default=None, help='Maximum storage deletes per second (0 for no limit)')
+    @click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it')
+    def gc_images(older_than, limit, workers, rate, dry_run):
+        """Delete stored images that are no longer used by any space or avatar.
+        
+        Runs batches until the tombstones run out; a dry run only reports
+        the first batch.
+        """
+        from app.utils.image_gc import collect_garbage
+        totals = {}
+        while True:
+            report = collect_garbage(older_than, limit, workers, rate, dry_run)
+            click.echo(json.dumps(report, indent=2))
+            for key in ('tombstones', 'objects_deleted', 'bytes_reclaimed'):
+                totals[key] = totals.get(key, 0) + report[key]
+            if dry_run or report['tombstones'] < (limit or current_app.config['IMAGE_GC_BATCH_SIZE']):
+                break
+        click.echo(f"Total: {totals['objects_deleted']} objects, {totals['bytes_reclaimed']} bytes reclaimed")
+    
+    @app.cli.command('seed-synthetic')
+    @click.option('--scale', type=click.Choice(['small', 'medium', 'large']), default='small',
+                  help='Preset sizes; large is 100k users, 50k spaces and 5M bookings')
+    @click.option('--users', type=int, default=None, help='Override the preset number of users')
+    @click.option('--spaces', type=int, default=None, help='Override the preset number of spaces')
+    @click.option('--bookings', type=int, default=None, help='Override the preset number of bookings')
+    @click.option('--seed', type=int, default=0, help='Same seed and --as-of, same data')
+    @click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Date the data is generated around (defaults to today)')
+    @click.option('--batch-size', type=int, default=10000, help='Rows sent per COPY or INSERT batch')
+    def seed_synthetic(scale, users, spaces, bookings, seed, as_of, batch_size):
+        """Fill the database with generated users, spaces and bookings for benchmarking.
+        
+        Rows are added next to any existing data. Every generated user's
+        password is 'synthetic123'.
+        """
+        from app.utils.synthetic_data import SCALES, SyntheticDataset
+        sizes = dict(SCALES[scale])
+        for name, value in (('users', users), ('spaces', spaces), ('bookings', bookings)):
+            if value is not None:
+                sizes[name] = value
+        
+        def progress(table, rows, seconds):
+            click.echo(f'{table:16} {rows:>10,} rows in {seconds:7.1f}s ({rows / max(seconds, 1e-9):,.0f}/s)')
+        
+        started = time.perf_counter()
+        try:
+            SyntheticDataset(seed=seed, as_of=as_of, batch_size=batch_size, **sizes).load(progress)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        click.echo(f'Done in {time.perf_counter() - started:.1f}s')
+    
+    @app.cli.command('slow-queries')
+    @click.option('--top', type=int, default=20, help='Statement shapes to show')
+    @click.option('--log', 'log_path', default=None, help='Slow query log to read (defaults to SLOW_QUERY_LOG)')
+    @click.option('--plans', is_flag=True, help='Show a captured EXPLAIN plan for each shape')
+    def slow_queries(top, log_path, plans):
+        """Summarize the slow query log: the worst statement shapes by total time."""
+        from app.utils.slow_queries import summarize
+        worst = summarize(log_path or current_app.config['SLOW_QUERY_LOG'], top)
+        if not worst:
+            click.echo('No slow queries logged')
+            return
+        for rank, shape in enumerate(worst, 1):
+            click.echo(
+                f"{rank}. total {shape['total_ms']:.1f} ms, {shape['count']} calls, "
+                f"mean {shape['mean_ms']:.1f} ms, max {shape['max_ms']:.1f} ms"
+            )
+            click.echo(f"   {shape['fingerprint'][:500]}")
+            routes = sorted(shape['routes'].items(), key=lambda item: item[1], reverse=True)
+            click.echo('   from ' + ', '.join(f'{route} ({count})' for route, count in routes[:5]))
+            if plans and shape['plan']:
+                plan = shape['plan'] if isinstance(shape['plan'], list) else [shape['plan']]
+                for line in plan:
+                    click.echo(f'     {line}')
+    
+    @app.cli.command('startup-report')
+    @click.option('--path', default='/api/spaces', help='Request timed as the first one')
+    @click.option('--method', default='GET', help='HTTP method of that request')
+    @click.option('--runs', type=int, default=3, help='Cold starts to time; the median is shown')
+    @click.option('--top', type=int, default=15, help='Packages to list by import time')
+    def startup_report(path, method, runs, top):
+        """Time a cold start: importing the app, create_app() and the first request."""
+        import os
+        from app.utils.startup_report import startup_report
+        report = startup_report(os.path.dirname(current_app.root_path), method.upper(), path, runs)
+        phases = report['phases']
+        click.echo(f"Cold start, median of {runs} runs ({method.upper()} {path} -> {report['status']}):")
+        click.echo(f"  import app     {phases['import_ms']:8.1f} ms")
+        click.echo(f"  create_app()   {phases['create_app_ms']:8.1f} ms")
+        click.echo(f"  first request  {phases['first_request_ms']:8.1f} ms")
+        click.echo(f"  total          {phases['total_ms']:8.1f} ms")
+        click.echo('')
+        click.echo('Import time by package (python -X importtime, self time):')
+        for package in report['packages'][:top]:
+            via = f"  via {package['imported_by']}" if package['imported_by'] else ''
+            click.echo(f"  {package['package']:24} {package['self_ms']:8.1f} ms  {package['modules']:4} modules{via}")
+    
+    @app.cli.command('build-openapi')
+    @click.option('--output', default=None, help='File to write (defaults to OPENAPI_SPEC_PATH)')
+    def build_openapi(output):
+        """Build the OpenAPI spec from the route docstrings into the file /apispec.json serves."""
+        from app.utils.openapi import build_spec, dump_spec
+        spec = build_spec(current_app)
+        path = output or current_app.config['OPENAPI_SPEC_PATH']
+        with open(path, 'wb') as f:
+            f.write(dump_spec(spec))
+        operations = sum(len(methods) for methods in spec['paths'].values())
+        click.echo(f"Wrote {operations} operations on {len(spec['paths'])} paths to {path}")
+    
+    @app.cli.command('check-openapi')
+    def check_openapi():
+        """Fail if the saved OpenAPI spec no longer matches the routes (run it in CI)."""
+        from app.utils.openapi import build_spec, diff_spec
+        path = current_app.config['OPENAPI_SPEC_PATH']
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            raise click.ClickException(f'{path} not found; run `flask build-openapi`')
+        problems = diff_spec(build_spec(current_app), saved)
+        for problem in problems:
+            click.echo(f'  {problem}')
+        if problems:
+            raise click.ClickException(f'{path} is out of date; run `flask build-openapi`')
+        click.echo(f'{path} matches the routes')
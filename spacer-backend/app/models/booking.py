@@ -5,7 +5,7 @@ class Booking(db.Model):
     __tablename__ = 'bookings'
     
     id = db.Column(db.Integer, primary_key=True)
-    space_id = db.Column(db.Integer, db.ForeignKey('spaces.id'), nullable=False)
+    space_id = db.Column(db.Integer, db.ForeignKey('spaces.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
@@ -17,7 +17,7 @@ class Booking(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    payment = db.relationship('Payment', backref='booking', uselist=False, cascade='all, delete-orphan')
+    payment = db.relationship('Payment', backref='booking', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
     
     def calculate_duration_hours(self):
         duration = self.end_time - self.start_time
@@ -41,13 +41,18 @@ class Booking(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        # Reconciliation scans for stale pending payments
+        db.Index('ix_payments_status_created_at', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id', ondelete='CASCADE'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)  # mpesa, card, etc.
     transaction_id = db.Column(db.String(100), unique=True)
     status = db.Column(db.String(20), default='pending')  # pending, completed, failed
+    result_description = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -59,6 +64,18 @@ class Payment(db.Model):
             'payment_method': self.payment_method,
             'transaction_id': self.transaction_id,
             'status': self.status,
+            'result_description': self.result_description,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        } 
\ No newline at end of file
+        }
+
+class MpesaCallback(db.Model):
+    """Raw STK callback as received from Safaricom, applied later by a worker."""
+    __tablename__ = 'mpesa_callbacks'
+    
+    checkout_request_id = db.Column(db.String(100), primary_key=True)
+    result_code = db.Column(db.Integer)
+    payload = db.Column(db.JSON, nullable=False)
+    outcome = db.Column(db.String(20))  # applied, duplicate, unmatched
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, index=True)
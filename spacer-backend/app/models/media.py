@@ -0,0 +1,35 @@
+from app import db
+from datetime import datetime
+
+class StoredImage(db.Model):
+    """An uploaded image, stored once per storage backend and keyed by content hash."""
+    __tablename__ = 'stored_images'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)  # sha256 of the original upload
+    backend = db.Column(db.String(20), primary_key=True)
+    # {'thumbnail': {'jpeg': url, 'webp': url}, 'card': {...}, 'full': {...}}
+    variants = db.Column(db.JSON, nullable=False)
+    placeholder = db.Column(db.String(64))  # BlurHash
+    # The full JPEG URL, which is what SpaceImage.image_url and User.avatar_url hold
+    url = db.Column(db.String(255), index=True)
+    # Storage keys of every variant, for deletion
+    keys = db.Column(db.JSON, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ImageTombstone(db.Model):
+    """An image URL that stopped being used and may be deleted from storage.
+
+    Stored images are shared by content hash, so a tombstone is only a
+    candidate: the garbage collector deletes the objects once nothing
+    references the URL any more.
+    """
+    __tablename__ = 'image_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(255), nullable=False)
+    # Original upload kept for processing, if any
+    source_key = db.Column(db.String(255))
+    reason = db.Column(db.String(30), nullable=False)  # space_deleted, images_replaced, avatar_replaced, user_deleted
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
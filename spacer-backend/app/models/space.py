@@ -51,10 +51,10 @@ class Space(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    images = db.relationship('SpaceImage', backref='space', lazy=True, cascade='all, delete-orphan')
-    bookings = db.relationship('Booking', backref='space', lazy=True, cascade='all, delete-orphan')
+    images = db.relationship('SpaceImage', backref='space', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    bookings = db.relationship('Booking', backref='space', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     amenities = db.relationship('SpaceAmenity', backref='space', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
-    reviews = db.relationship('SpaceReview', backref='space', lazy=True, cascade='all, delete-orphan')
+    reviews = db.relationship('SpaceReview', backref='space', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def to_dict(self):
         try:
@@ -107,14 +107,32 @@ class SpaceImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     space_id = db.Column(db.Integer, db.ForeignKey('spaces.id', ondelete='CASCADE'), nullable=False)
     image_url = db.Column(db.String(255), nullable=False)
+    # {'thumbnail': {'jpeg': url, 'webp': url}, 'card': {...}, 'full': {...}}
+    variants = db.Column(db.JSON)
+    # BlurHash shown while the image loads; set once the image is ready
+    placeholder = db.Column(db.String(64))
+    # processing -> ready | failed; variants are only set once ready
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    processing_error = db.Column(db.String(255))
+    # Storage key of the original upload the variants were generated from
+    source_key = db.Column(db.String(255))
     is_primary = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    def variant_url(self, name, image_format='jpeg'):
+        """URL of a generated variant, falling back to the original image."""
+        return ((self.variants or {}).get(name) or {}).get(image_format) or self.image_url
+    
     def to_dict(self):
         return {
             'id': self.id,
             'space_id': self.space_id,
             'image_url': self.image_url,
+            'thumbnail_url': self.variant_url('thumbnail'),
+            'variants': self.variants,
+            'placeholder': self.placeholder,
+            'status': self.status,
+            'processing_error': self.processing_error,
             'is_primary': self.is_primary,
             'created_at': self.created_at.isoformat()
         }
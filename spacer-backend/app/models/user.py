@@ -14,11 +14,14 @@ class User(db.Model):
     last_name = db.Column(db.String(50), nullable=False)
     _role = db.Column('role', db.String(20), nullable=False, default='client')
     is_verified = db.Column(db.Boolean, default=False)
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     phone = db.Column(db.String(20))
     bio = db.Column(db.Text)
     avatar_url = db.Column(db.String(255))
+    # Same shape as SpaceImage.variants
+    avatar_variants = db.Column(db.JSON)
     
     # Relationships
     spaces = db.relationship('Space', backref='owner', lazy=True)
@@ -69,7 +72,9 @@ class User(db.Model):
             'phone': self.phone,
             'bio': self.bio,
             'avatar_url': self.avatar_url,
+            'avatar_variants': self.avatar_variants,
             'is_verified': self.is_verified,
+            'is_active': self.is_active,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         } 
\ No newline at end of file
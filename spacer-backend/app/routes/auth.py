@@ -1,12 +1,23 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from app.models.user import User
-from app import db
+from app import db, jwt
 from app.utils.email import send_verification_email
 from app.utils.validators import validate_email, validate_password
 
 auth_bp = Blueprint('auth', __name__)
 
+@jwt.user_lookup_loader
+def load_active_user(jwt_header, jwt_payload):
+    """Reject access and refresh tokens of deactivated or deleted users, so deactivation takes effect at once."""
+    # Kept for the request, so the route's own User.query.get() is answered from the session
+    user = db.session.get(User, jwt_payload['sub'])
+    return user if user is not None and user.is_active else None
+
+@jwt.user_lookup_error_loader
+def inactive_user_response(jwt_header, jwt_payload):
+    return jsonify({'error': 'Account has been deactivated'}), 401
+
 @auth_bp.route('', methods=['GET'])
 @auth_bp.route('/', methods=['GET'])
 def auth_index():
@@ -168,6 +179,9 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid email or password'}), 401
     
+    if not user.is_active:
+        return jsonify({'error': 'Account has been deactivated'}), 403
+    
     access_token = create_access_token(identity=user.id)
     refresh_token = create_refresh_token(identity=user.id)
     
@@ -1,4 +1,5 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.utils.home import get_home_cache
 
 main_bp = Blueprint('main', __name__)
 
@@ -10,6 +11,61 @@ def index():
         'endpoints': {
             'auth': '/api/auth',
             'spaces': '/api/spaces',
-            'bookings': '/api/bookings'
+            'bookings': '/api/bookings',
+            'home': '/api/home'
         }
-    }) 
\ No newline at end of file
+    })
+
+@main_bp.route('/api/home', methods=['GET'])
+def home():
+    """
+    Landing page data in one request
+    ---
+    tags:
+      - Home
+    description: >
+      Featured spaces, the number of available spaces per city and the
+      testimonials. The document is cached and rebuilt in the background
+      shortly before it expires; it is never older than HOME_CACHE_TTL
+      (a minute by default).
+    responses:
+      200:
+        description: Landing page document
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                featured_spaces:
+                  type: array
+                  items:
+                    $ref: '#/components/schemas/Space'
+                cities:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      city:
+                        type: string
+                        example: Nairobi
+                      count:
+                        type: integer
+                        example: 12
+                testimonials:
+                  type: array
+                  items:
+                    type: object
+                generated_at:
+                  type: string
+                  format: date-time
+      304:
+        description: Not modified
+    """
+    body, etag, age = get_home_cache().get()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['HOME_CACHE_MAX_AGE']
+    response.headers['Age'] = str(int(age))
+    return response.make_conditional(request)
+
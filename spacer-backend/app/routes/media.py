@@ -0,0 +1,42 @@
+from flask import Blueprint, current_app, send_from_directory, request, jsonify
+from itsdangerous import BadSignature, SignatureExpired
+from app.utils.storage import get_storage, upload_serializer
+
+media_bp = Blueprint('media', __name__)
+
+@media_bp.route('/media/<path:key>', methods=['GET'])
+def get_media(key):
+    """Serve images stored by the local storage backend.
+
+    Keys are content addressed, so a URL's bytes never change and clients
+    and proxies may cache them forever.
+    """
+    response = send_from_directory(
+        current_app.config['IMAGE_STORAGE_LOCAL_ROOT'],
+        key,
+        max_age=current_app.config['MEDIA_CACHE_MAX_AGE']
+    )
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['MEDIA_CACHE_MAX_AGE']}, immutable"
+    return response
+
+@media_bp.route('/media/uploads/<token>', methods=['PUT'])
+def put_upload(token):
+    """Receive a direct upload signed by LocalStorage.create_upload_target.
+
+    Only used with the local storage backend, where it stands in for a
+    cloud provider's signed upload URL.
+    """
+    try:
+        upload = upload_serializer('local-upload').loads(
+            token, max_age=current_app.config['DIRECT_UPLOAD_EXPIRES']
+        )
+    except SignatureExpired:
+        return jsonify({'error': 'Upload URL has expired'}), 403
+    except BadSignature:
+        return jsonify({'error': 'Invalid upload URL'}), 403
+    
+    if request.content_length is None or request.content_length > upload['max_bytes']:
+        return jsonify({'error': 'Upload is missing a Content-Length or is too large'}), 413
+    
+    get_storage().save(upload['key'], request.get_data(cache=False))
+    return '', 204
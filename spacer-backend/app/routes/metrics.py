@@ -0,0 +1,29 @@
+import hmac
+from flask import Blueprint, Response, current_app, request, jsonify
+from app.utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics
+    ---
+    tags:
+      - Monitoring
+    description: >
+      Request, database pool, outbound call and cache metrics in the
+      Prometheus text format, summed over all worker processes. Requires
+      "Authorization: Bearer <METRICS_AUTH_TOKEN>" when that is configured.
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Metrics in the Prometheus text format
+      401:
+        description: Missing or wrong token
+    """
+    token = current_app.config['METRICS_AUTH_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,9 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.booking import Booking, Payment
 from app.models.user import User
 from app import db
-from app.utils.mpesa import MpesaAPI
+from app.utils.mpesa import get_mpesa_api
+from app.utils.payment_events import payment_events
+from app.utils.mpesa_callbacks import record_callback, schedule_callback_processing
+from app.utils import tasks
+import time
+from datetime import datetime
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -36,9 +41,12 @@ def initiate_mpesa_payment(booking_id):
               description: Phone number in format 254XXXXXXXXX (12 digits)
               example: 254712345678
               pattern: ^254[0-9]{9}$
+    description: >
+      The STK push is sent in the background. Poll
+      GET /api/payments/{payment_id}/status?wait=30 for the outcome.
     responses:
-      200:
-        description: Payment initiated successfully
+      202:
+        description: Payment initiation queued
         content:
           application/json:
             schema:
@@ -46,11 +54,13 @@ def initiate_mpesa_payment(booking_id):
               properties:
                 message:
                   type: string
-                  example: Payment initiated successfully
-                checkout_request_id:
+                  example: Payment initiation queued
+                payment_id:
+                  type: integer
+                  example: 1
+                status_url:
                   type: string
-                  example: ws_CO_123456789
-                  description: M-Pesa checkout request ID for tracking
+                  example: /api/payments/1/status
       400:
         description: Invalid input
         content:
@@ -67,16 +77,8 @@ def initiate_mpesa_payment(booking_id):
         description: Forbidden - user not authorized to pay for this booking
       404:
         description: Booking not found
-      422:
-        description: Payment processing error
-        content:
-          application/json:
-            schema:
-              type: object
-              properties:
-                error:
-                  type: string
-                  example: M-Pesa service unavailable
+      409:
+        description: A payment for this booking is already in progress or completed
     """
     current_user_id = get_jwt_identity()
     
@@ -98,33 +100,130 @@ def initiate_mpesa_payment(booking_id):
     
     phone_number = data['phone_number']
     
-    # Initialize M-Pesa API
-    mpesa = MpesaAPI()
-    
-    # Initiate STK push
-    success, result = mpesa.initiate_stk_push(
-        phone_number=phone_number,
-        amount=booking.total_price,
-        booking_id=booking.id
-    )
-    
-    if success:
-        # Create payment record
+    # One payment per booking: retry a failed attempt in place, refuse duplicates
+    payment = booking.payment
+    if payment and payment.status != 'failed':
+        return jsonify({'error': 'Payment already in progress', 'payment_id': payment.id}), 409
+    if payment:
+        payment.status = 'pending'
+        payment.transaction_id = None
+        payment.result_description = None
+        # A new attempt: the reconciler judges staleness by created_at
+        payment.created_at = datetime.utcnow()
+    else:
         payment = Payment(
             booking_id=booking.id,
             amount=booking.total_price,
-            payment_method='mpesa',
-            transaction_id=result  # result contains CheckoutRequestID
+            payment_method='mpesa'
         )
         db.session.add(payment)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Payment initiated successfully',
-            'checkout_request_id': result
-        }), 200
+    db.session.commit()
+    
+    tasks.submit(send_stk_push, payment.id, phone_number)
+    
+    return jsonify({
+        'message': 'Payment initiation queued',
+        'payment_id': payment.id,
+        'status_url': url_for('payments.get_payment_status', payment_id=payment.id)
+    }), 202
+
+def send_stk_push(payment_id, phone_number):
+    """Background job: ask Safaricom to prompt the customer and record the outcome."""
+    payment = Payment.query.get(payment_id)
+    if not payment or payment.status != 'pending':
+        return
+    
+    success, result = get_mpesa_api().initiate_stk_push(
+        phone_number=phone_number,
+        amount=payment.amount,
+        booking_id=payment.booking_id
+    )
+    
+    if success:
+        payment.transaction_id = result  # result contains CheckoutRequestID
     else:
-        return jsonify({'error': result}), 400
+        payment.status = 'failed'
+        payment.result_description = result
+    db.session.commit()
+    payment_events.notify(payment_id)
+    
+    if success:
+        # The callback may have beaten us to storing the CheckoutRequestID
+        schedule_callback_processing()
+
+@payments_bp.route('/<int:payment_id>/status', methods=['GET'])
+@jwt_required()
+def get_payment_status(payment_id):
+    """
+    Get payment status, optionally long-polling until it leaves pending
+    ---
+    tags:
+      - Payments
+    security:
+      - BearerAuth: []
+    parameters:
+      - name: payment_id
+        in: path
+        type: integer
+        required: true
+        description: Payment ID returned by the initiate endpoint
+      - name: wait
+        in: query
+        type: integer
+        required: false
+        description: Seconds to hold the request open while the payment is pending (capped at 30)
+        example: 30
+    responses:
+      200:
+        description: Current payment status
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                payment:
+                  $ref: '#/components/schemas/Payment'
+                booking_status:
+                  type: string
+                  example: confirmed
+                payment_status:
+                  type: string
+                  example: paid
+      401:
+        description: Unauthorized
+      403:
+        description: Forbidden - user not authorized to view this payment
+      404:
+        description: Payment not found
+    """
+    current_user_id = get_jwt_identity()
+    payment = Payment.query.get_or_404(payment_id)
+    
+    if payment.booking.user_id != current_user_id and User.query.get(current_user_id).role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    wait = max(0, min(request.args.get('wait', 0, type=int), current_app.config['PAYMENT_STATUS_MAX_WAIT']))
+    poll_interval = current_app.config['PAYMENT_STATUS_POLL_INTERVAL']
+    deadline = time.monotonic() + wait
+    
+    while payment.status == 'pending':
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        version = payment_events.version(payment_id)
+        # Release the pooled connection while we sleep; this also expires
+        # the payment so the next access re-reads it.
+        db.session.rollback()
+        if payment.status != 'pending':
+            break
+        payment_events.wait(payment_id, version, min(remaining, poll_interval))
+        db.session.rollback()
+    
+    return jsonify({
+        'payment': payment.to_dict(),
+        'booking_status': payment.booking.status,
+        'payment_status': payment.booking.payment_status
+    }), 200
 
 @payments_bp.route('/mpesa-callback', methods=['POST'])
 def mpesa_callback():
@@ -172,46 +271,46 @@ def mpesa_callback():
                                 Value:
                                   type: number
                                   example: 1000.00
+    description: >
+      The raw callback is stored keyed by CheckoutRequestID and acknowledged
+      immediately; duplicates are ignored and the booking is updated by a
+      background worker.
     responses:
       200:
-        description: Callback processed successfully
+        description: Callback accepted
         content:
           application/json:
             schema:
               type: object
               properties:
+                ResultCode:
+                  type: integer
+                  example: 0
+                ResultDesc:
+                  type: string
+                  example: Accepted
                 message:
                   type: string
-                  example: Callback processed successfully
+                  example: Callback received
       400:
         description: Invalid callback data
     """
-    data = request.get_json()
+    data = request.get_json(silent=True)
     
     try:
-        # Extract relevant information from callback data
-        result_code = data['Body']['stkCallback']['ResultCode']
-        checkout_request_id = data['Body']['stkCallback']['CheckoutRequestID']
-        
-        # Find payment by checkout_request_id
-        payment = Payment.query.filter_by(transaction_id=checkout_request_id).first()
-        if not payment:
-            return jsonify({'error': 'Payment not found'}), 404
-        
-        if result_code == 0:
-            # Payment successful
-            payment.status = 'completed'
-            payment.booking.status = 'confirmed'
-            payment.booking.payment_status = 'paid'
-        else:
-            # Payment failed
-            payment.status = 'failed'
-            payment.booking.status = 'pending'
-            payment.booking.payment_status = 'pending'
-        
-        db.session.commit()
-        return jsonify({'message': 'Callback processed successfully'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        stk_callback = data['Body']['stkCallback']
+        stk_callback['CheckoutRequestID']
+        int(stk_callback['ResultCode'])
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'error': 'Invalid callback data'}), 400
+    
+    # Persist and acknowledge; a background worker applies the result.
+    # Safaricom retries of a callback we already have are dropped here.
+    if record_callback(data):
+        schedule_callback_processing()
+    
+    return jsonify({
+        'ResultCode': 0,
+        'ResultDesc': 'Accepted',
+        'message': 'Callback received'
+    }), 200
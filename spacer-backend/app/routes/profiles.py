@@ -0,0 +1,47 @@
+import os
+import re
+from flask import Blueprint, current_app, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.user import User
+from app.utils.profiler import profile_path
+
+profiles_bp = Blueprint('profiles', __name__)
+
+@profiles_bp.route('/<profile_id>', methods=['GET'])
+@jwt_required()
+def get_profile(profile_id):
+    """
+    Download a request profile (Admin only)
+    ---
+    tags:
+      - Monitoring
+    security:
+      - BearerAuth: []
+    description: >
+      Profiles are recorded by sending "X-Profile: 1" (or ?_profile=1) with
+      an admin token; the response carries the id in X-Profile-Id. Open the
+      file at https://www.speedscope.app.
+    parameters:
+      - in: path
+        name: profile_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: Speedscope JSON document
+      403:
+        description: Forbidden - user is not admin
+      404:
+        description: Profile not found
+    """
+    if User.query.get(get_jwt_identity()).role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if not re.fullmatch(r'[0-9a-f]{32}', profile_id) or not os.path.exists(profile_path(profile_id)):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(
+        profile_path(profile_id),
+        mimetype='application/json',
+        as_attachment=True,
+        download_name=f'{profile_id}.speedscope.json'
+    )
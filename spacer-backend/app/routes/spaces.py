@@ -1,15 +1,25 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.space import Space, SpaceImage, SpaceAmenity
 from app.models.user import User
 from app import db
-from app.utils.validators import validate_space_data
-from app.utils.cloudinary import upload_image
-from datetime import datetime
-from sqlalchemy.orm import joinedload
+from app.utils.validators import validate_space_data, validate_id_list
+from app.utils.image_pipeline import store_raw_uploads, schedule_space_image_processing
+from app.utils.storage import get_storage, upload_serializer, raw_upload_key
+from app.utils.image_gc import tombstone_space_images
+from itsdangerous import BadSignature, SignatureExpired
+from datetime import datetime, timedelta
+from sqlalchemy.orm import selectinload
 
 spaces_bp = Blueprint('spaces', __name__)
 
+# Content types accepted for direct uploads, and the extension stored with them
+DIRECT_UPLOAD_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp'
+}
+
 @spaces_bp.route('', methods=['GET'])
 @spaces_bp.route('/', methods=['GET'])
 def get_spaces():
@@ -78,7 +88,11 @@ def get_spaces():
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
     
-    query = Space.query.options(joinedload(Space.images))
+    query = Space.query.options(
+        selectinload(Space.images),
+        selectinload(Space.amenities),
+        selectinload(Space.reviews)
+    )
     
     # Handle status filter
     if status == 'available':
@@ -95,10 +109,6 @@ def get_spaces():
     
     spaces = query.paginate(page=page, per_page=per_page)
     
-    # Debug log for images URLs
-    for space in spaces.items:
-        print(f"Space ID: {space.id}, Images: {[img.image_url for img in space.images]}")
-    
     response = jsonify({
         'spaces': [space.to_dict() for space in spaces.items],
         'total': spaces.total,
@@ -199,7 +209,11 @@ def create_space():
                   format: binary
     responses:
       201:
-        description: Space created successfully
+        description: >
+          Space created. Images start in the "processing" status and become
+          "ready" or "failed" once their variants are generated; poll
+          GET /api/spaces/{id} for updates. Files that could not be stored
+          are listed in image_errors.
         content:
           application/json:
             schema:
@@ -240,20 +254,68 @@ def create_space():
             amenity = SpaceAmenity(name=amenity_name, space_id=space.id)
             db.session.add(amenity)
     
-    if 'images' in request.files:
-        images = request.files.getlist('images')
-        for i, image in enumerate(images):
-            if image:
-                image_url = upload_image(image)
-                space_image = SpaceImage(
-                    space_id=space.id,
-                    image_url=image_url,
-                    is_primary=(i == 0)
-                )
-                db.session.add(space_image)
+    # Commit before storing the uploads so the transaction isn't held open
+    # for them, and so a bad image can't cost the owner the whole listing
+    db.session.commit()
     
+    new_images, image_errors = _add_space_images(space)
+    image_ids = [image.id for image in new_images if image.status == 'processing']
     db.session.commit()
-    return jsonify(space.to_dict()), 201
+    schedule_space_image_processing(image_ids)
+    return _space_response(space, image_errors, 201)
+
+def _add_space_images(space, replace=False):
+    """Store the request's ``images`` files and add them to the space.
+
+    Images whose content is already stored are added ``ready``; the rest
+    are added as ``processing`` and get their variants in the background:
+    the caller commits and then schedules those. With ``replace`` the
+    existing images are removed, but only if at least one new image was stored.
+
+    Returns the new ``SpaceImage`` rows and a list of per-image errors.
+    """
+    if not request.files or 'images' not in request.files:
+        return [], []
+    
+    images = [image for image in request.files.getlist('images') if image]
+    results = store_raw_uploads(space.id, images)
+    errors = [
+        {'index': i, 'filename': image.filename, 'error': error}
+        for i, (image, (_, _, _, error)) in enumerate(zip(images, results))
+        if error
+    ]
+    stored = [(key, url, known) for key, url, known, error in results if not error]
+    if not stored:
+        return [], errors
+    
+    if replace:
+        tombstone_space_images(SpaceImage.space_id == space.id, 'images_replaced')
+        SpaceImage.query.filter_by(space_id=space.id).delete()
+    has_primary = not replace and db.session.query(
+        SpaceImage.query.filter_by(space_id=space.id, is_primary=True).exists()
+    ).scalar()
+    new_images = []
+    for i, (key, url, known) in enumerate(stored):
+        variants, placeholder = known or (None, None)
+        space_image = SpaceImage(
+            space_id=space.id,
+            image_url=url,
+            source_key=key,
+            variants=variants,
+            placeholder=placeholder,
+            status='ready' if known else 'processing',
+            is_primary=(i == 0 and not has_primary)
+        )
+        db.session.add(space_image)
+        new_images.append(space_image)
+    db.session.flush()
+    return new_images, errors
+
+def _space_response(space, image_errors, status_code):
+    result = space.to_dict()
+    if image_errors:
+        result['image_errors'] = image_errors
+    return jsonify(result), status_code
 
 @spaces_bp.route('/<int:space_id>', methods=['PUT'])
 @jwt_required()
@@ -287,29 +349,18 @@ def update_space(space_id):
         except ValueError:
             return jsonify({'error': 'Invalid capacity format'}), 400
     
-    if request.files and 'images' in request.files:
-        SpaceImage.query.filter_by(space_id=space.id).delete()
-        
-        images = request.files.getlist('images')
-        for i, image in enumerate(images):
-            if image:
-                try:
-                    image_url = upload_image(image)
-                    space_image = SpaceImage(
-                        space_id=space.id,
-                        image_url=image_url,
-                        is_primary=(i == 0)
-                    )
-                    db.session.add(space_image)
-                except Exception as e:
-                    return jsonify({'error': f'Failed to upload image: {str(e)}'}), 422
-    
     try:
         db.session.commit()
-        return jsonify(space.to_dict()), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to update space: {str(e)}'}), 422
+    
+    # Image failures are reported per image and never undo the update above
+    new_images, image_errors = _add_space_images(space, replace=True)
+    image_ids = [image.id for image in new_images if image.status == 'processing']
+    db.session.commit()
+    schedule_space_image_processing(image_ids)
+    return _space_response(space, image_errors, 200)
 
 @spaces_bp.route('/<int:space_id>', methods=['DELETE'])
 @jwt_required()
@@ -320,6 +371,278 @@ def delete_space(space_id):
     if space.owner_id != current_user_id and User.query.get(current_user_id).role != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
+    tombstone_space_images(SpaceImage.space_id == space.id, 'space_deleted')
     db.session.delete(space)
     db.session.commit()
     return jsonify({'message': 'Space deleted successfully'}), 200
+
+@spaces_bp.route('/bulk-delete', methods=['POST'])
+@jwt_required()
+def bulk_delete_spaces():
+    """
+    Delete several spaces in one statement
+    ---
+    tags:
+      - Spaces
+    security:
+      - BearerAuth: []
+    description: >
+      Images, amenities, reviews, bookings and payments are removed by the
+      database ON DELETE CASCADE rules instead of being loaded one by one.
+      Owners may only delete their own spaces; admins may delete any space.
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - space_ids
+          properties:
+            space_ids:
+              type: array
+              items:
+                type: integer
+              example: [1, 2, 3]
+    responses:
+      200:
+        description: Per-id results
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                        example: 1
+                      status:
+                        type: string
+                        enum: [deleted, not_found, forbidden]
+                deleted:
+                  type: integer
+                  example: 3
+      400:
+        description: Invalid input
+      401:
+        description: Unauthorized
+    """
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    data = request.get_json() or {}
+    space_ids = data.get('space_ids')
+    is_valid, error_message = validate_id_list(space_ids, current_app.config['BULK_MAX_IDS'])
+    if not is_valid:
+        return jsonify({'error': error_message}), 400
+    
+    owners = dict(
+        db.session.query(Space.id, Space.owner_id).filter(Space.id.in_(space_ids)).all()
+    )
+    statuses = {}
+    target_ids = []
+    for space_id in dict.fromkeys(space_ids):
+        if space_id not in owners:
+            statuses[space_id] = 'not_found'
+        elif owners[space_id] != current_user_id and user.role != 'admin':
+            statuses[space_id] = 'forbidden'
+        else:
+            statuses[space_id] = 'deleted'
+            target_ids.append(space_id)
+    
+    if target_ids:
+        tombstone_space_images(SpaceImage.space_id.in_(target_ids), 'space_deleted')
+        Space.query.filter(Space.id.in_(target_ids)).delete(synchronize_session=False)
+        db.session.commit()
+    
+    results = [{'id': space_id, 'status': status} for space_id, status in statuses.items()]
+    return jsonify({'results': results, 'deleted': len(target_ids)}), 200
+
+def _get_editable_space(space_id):
+    """Return ``(space, None)`` if the current user may edit it, else ``(None, error response)``."""
+    current_user_id = get_jwt_identity()
+    space = Space.query.get_or_404(space_id)
+    if space.owner_id != current_user_id and User.query.get(current_user_id).role != 'admin':
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return space, None
+
+@spaces_bp.route('/<int:space_id>/images/upload-url', methods=['POST'])
+@jwt_required()
+def create_image_upload_url(space_id):
+    """
+    Get a signed target for uploading a space image directly to storage
+    ---
+    tags:
+      - Spaces
+    security:
+      - BearerAuth: []
+    description: >
+      The client sends the file to the returned target instead of the API,
+      then calls /images/finalize with the upload_id. For POST targets the
+      fields go in a multipart form with the image in the "file" field; for
+      PUT targets the image is the request body.
+    parameters:
+      - in: path
+        name: space_id
+        type: integer
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - content_type
+          properties:
+            content_type:
+              type: string
+              enum: [image/jpeg, image/png, image/webp]
+    responses:
+      201:
+        description: Upload target created
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                upload_id:
+                  type: string
+                method:
+                  type: string
+                  enum: [POST, PUT]
+                url:
+                  type: string
+                fields:
+                  type: object
+                headers:
+                  type: object
+                max_bytes:
+                  type: integer
+                expires_at:
+                  type: string
+                  format: date-time
+      400:
+        description: Unsupported content type
+      403:
+        description: Not the owner of the space
+      404:
+        description: Space not found
+    """
+    space, error_response = _get_editable_space(space_id)
+    if error_response:
+        return error_response
+    
+    data = request.get_json() or {}
+    extension = DIRECT_UPLOAD_TYPES.get(data.get('content_type'))
+    if not extension:
+        return jsonify({'error': f"content_type must be one of: {', '.join(DIRECT_UPLOAD_TYPES)}"}), 400
+    
+    key = raw_upload_key(space.id, extension)
+    max_bytes = current_app.config['MAX_IMAGE_UPLOAD_BYTES']
+    expires_in = current_app.config['DIRECT_UPLOAD_EXPIRES']
+    target = get_storage().create_upload_target(key, max_bytes, expires_in)
+    upload_id = upload_serializer('space-image-upload').dumps({'space_id': space.id, 'key': key})
+    
+    return jsonify({
+        'upload_id': upload_id,
+        **target,
+        'max_bytes': max_bytes,
+        'expires_at': (datetime.utcnow() + timedelta(seconds=expires_in)).isoformat()
+    }), 201
+
+@spaces_bp.route('/<int:space_id>/images/finalize', methods=['POST'])
+@jwt_required()
+def finalize_image_upload(space_id):
+    """
+    Register a directly uploaded image with its space
+    ---
+    tags:
+      - Spaces
+    security:
+      - BearerAuth: []
+    parameters:
+      - in: path
+        name: space_id
+        type: integer
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - upload_id
+          properties:
+            upload_id:
+              type: string
+            is_primary:
+              type: boolean
+    responses:
+      201:
+        description: Image added to the space; its variants are generated in the background
+      400:
+        description: Invalid or expired upload_id
+      403:
+        description: Not the owner of the space
+      404:
+        description: Space not found
+      409:
+        description: Nothing has been uploaded for this upload_id yet
+      413:
+        description: The uploaded file is too large
+    """
+    space, error_response = _get_editable_space(space_id)
+    if error_response:
+        return error_response
+    
+    data = request.get_json() or {}
+    try:
+        # Allow a little longer than the target itself so a slow upload
+        # that started in time can still be finalized
+        upload = upload_serializer('space-image-upload').loads(
+            data.get('upload_id', ''), max_age=2 * current_app.config['DIRECT_UPLOAD_EXPIRES']
+        )
+    except SignatureExpired:
+        return jsonify({'error': 'upload_id has expired'}), 400
+    except BadSignature:
+        return jsonify({'error': 'Invalid upload_id'}), 400
+    if upload['space_id'] != space.id:
+        return jsonify({'error': 'upload_id belongs to a different space'}), 400
+    
+    existing = SpaceImage.query.filter_by(space_id=space.id, source_key=upload['key']).first()
+    if existing:
+        return jsonify(existing.to_dict()), 200
+    
+    storage = get_storage()
+    stored = storage.stat(upload['key'])
+    if not stored:
+        return jsonify({'error': 'No file has been uploaded for this upload_id'}), 409
+    if stored['size'] > current_app.config['MAX_IMAGE_UPLOAD_BYTES']:
+        try:
+            storage.delete(upload['key'])
+        except Exception as e:
+            current_app.logger.warning(f"Could not delete oversized upload {upload['key']}: {e}")
+        return jsonify({'error': 'Image is too large'}), 413
+    
+    has_images = db.session.query(SpaceImage.query.filter_by(space_id=space.id).exists()).scalar()
+    is_primary = bool(data.get('is_primary')) or not has_images
+    if is_primary:
+        SpaceImage.query.filter_by(space_id=space.id).update({'is_primary': False})
+    space_image = SpaceImage(
+        space_id=space.id,
+        image_url=stored['url'],
+        source_key=upload['key'],
+        status='processing',
+        is_primary=is_primary
+    )
+    db.session.add(space_image)
+    db.session.flush()
+    image_id = space_image.id
+    db.session.commit()
+    schedule_space_image_processing([image_id])
+    return jsonify(space_image.to_dict()), 201
+
@@ -1,9 +1,13 @@
-from flask import Blueprint, request, jsonify
+import jwt
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
+from app.models.booking import Booking
 from app import db
-from app.utils.validators import validate_email, validate_password
-from app.utils.cloudinary import upload_image
+from sqlalchemy.orm import joinedload
+from app.utils.validators import validate_email, validate_password, validate_id_list
+from app.utils.image_pipeline import process_images
+from app.utils.image_gc import tombstone_url
 
 users_bp = Blueprint('users', __name__)
 
@@ -261,10 +265,195 @@ def delete_user(user_id):
     if user_id == current_user_id:
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
+    tombstone_url(user.avatar_url, 'user_deleted')
     db.session.delete(user)
     db.session.commit()
     return jsonify({'message': 'User deleted successfully'}), 200
 
+@users_bp.route('/bulk/role', methods=['POST'])
+@jwt_required()
+def bulk_update_role():
+    """
+    Change the role of several users in one statement (Admin only)
+    ---
+    tags:
+      - Users
+    security:
+      - BearerAuth: []
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - user_ids
+            - role
+          properties:
+            user_ids:
+              type: array
+              items:
+                type: integer
+              example: [2, 3, 4]
+            role:
+              type: string
+              enum: [admin, owner, client]
+              example: owner
+    responses:
+      200:
+        description: Per-id results
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                        example: 2
+                      status:
+                        type: string
+                        enum: [updated, not_found, skipped_self]
+                updated:
+                  type: integer
+                  example: 3
+      400:
+        description: Invalid input
+      401:
+        description: Unauthorized
+      403:
+        description: Forbidden - user is not admin
+    """
+    current_user_id = get_jwt_identity()
+    current_user = User.query.get(current_user_id)
+    
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    user_ids = data.get('user_ids')
+    is_valid, error_message = validate_id_list(user_ids, current_app.config['BULK_MAX_IDS'])
+    if not is_valid:
+        return jsonify({'error': error_message}), 400
+    
+    role = str(data.get('role', '')).lower()
+    if role not in User.VALID_ROLES:
+        return jsonify({'error': f'Invalid role. Must be one of: {", ".join(User.VALID_ROLES)}'}), 400
+    
+    # Admins cannot demote themselves through the bulk path
+    statuses, target_ids = _resolve_bulk_user_ids(user_ids, current_user_id)
+    if target_ids:
+        User.query.filter(User.id.in_(target_ids)).update(
+            {User._role: role}, synchronize_session=False
+        )
+        db.session.commit()
+    
+    return jsonify(_bulk_results(user_ids, statuses, 'updated')), 200
+
+@users_bp.route('/bulk/deactivate', methods=['POST'])
+@jwt_required()
+def bulk_deactivate_users():
+    """
+    Deactivate several user accounts in one statement (Admin only)
+    ---
+    tags:
+      - Users
+    security:
+      - BearerAuth: []
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - user_ids
+          properties:
+            user_ids:
+              type: array
+              items:
+                type: integer
+              example: [2, 3, 4]
+    responses:
+      200:
+        description: Per-id results
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                        example: 2
+                      status:
+                        type: string
+                        enum: [deactivated, not_found, skipped_self]
+                deactivated:
+                  type: integer
+                  example: 3
+      400:
+        description: Invalid input
+      401:
+        description: Unauthorized
+      403:
+        description: Forbidden - user is not admin
+    """
+    current_user_id = get_jwt_identity()
+    current_user = User.query.get(current_user_id)
+    
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    user_ids = data.get('user_ids')
+    is_valid, error_message = validate_id_list(user_ids, current_app.config['BULK_MAX_IDS'])
+    if not is_valid:
+        return jsonify({'error': error_message}), 400
+    
+    statuses, target_ids = _resolve_bulk_user_ids(user_ids, current_user_id)
+    if target_ids:
+        User.query.filter(User.id.in_(target_ids)).update(
+            {User.is_active: False}, synchronize_session=False
+        )
+        db.session.commit()
+    
+    return jsonify(_bulk_results(user_ids, statuses, 'deactivated')), 200
+
+def _resolve_bulk_user_ids(user_ids, current_user_id):
+    """Split requested ids into per-id statuses and the ids the bulk statement should touch."""
+    existing_ids = {
+        row.id for row in db.session.query(User.id).filter(User.id.in_(user_ids))
+    }
+    statuses = {}
+    target_ids = []
+    for user_id in dict.fromkeys(user_ids):
+        if user_id not in existing_ids:
+            statuses[user_id] = 'not_found'
+        elif user_id == current_user_id:
+            statuses[user_id] = 'skipped_self'
+        else:
+            target_ids.append(user_id)
+    return statuses, target_ids
+
+def _bulk_results(ids, statuses, success_status):
+    results = [
+        {'id': record_id, 'status': statuses.get(record_id, success_status)}
+        for record_id in dict.fromkeys(ids)
+    ]
+    return {
+        'results': results,
+        success_status: sum(1 for result in results if result['status'] == success_status)
+    }
+
 @users_bp.route('/verify/<token>', methods=['GET'])
 def verify_user(token):
     """
@@ -412,11 +601,13 @@ def user_profile():
         if 'bio' in data:
             user.bio = data['bio']
         if file:
-            try:
-                image_url = upload_image(file, folder='avatars')
-                user.avatar_url = image_url
-            except Exception as e:
-                return jsonify({'error': f'Failed to upload avatar: {str(e)}'}), 500
+            [(variants, _, error)] = process_images([file], folder='avatars')
+            if error:
+                return jsonify({'error': f'Failed to upload avatar: {error}'}), 500
+            if user.avatar_url != variants['full']['jpeg']:
+                tombstone_url(user.avatar_url, 'avatar_replaced')
+            user.avatar_url = variants['full']['jpeg']
+            user.avatar_variants = variants
         db.session.commit()
         return jsonify(user.to_dict()), 200
 
@@ -460,9 +651,10 @@ def user_activities():
         description: Unauthorized
     """
     current_user_id = get_jwt_identity()
-    user = User.query.get_or_404(current_user_id)
+    User.query.get_or_404(current_user_id)
+    bookings = Booking.query.options(joinedload(Booking.space)).filter_by(user_id=current_user_id).all()
     activities = []
-    for b in user.bookings:
+    for b in bookings:
         activities.append({
             'id': b.id,
             'type': 'booking',
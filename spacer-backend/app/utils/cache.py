@@ -0,0 +1,71 @@
+import hashlib
+import threading
+import time
+from flask import current_app
+from app.utils import tasks
+from app.utils.metrics import metrics
+
+class RefreshAheadCache:
+    """A JSON document rebuilt in the background before it expires.
+    
+    ``build`` returns the document. Once the document is older than
+    ``ttl - refresh_ahead`` the next request schedules a rebuild on the
+    background pool and keeps serving the current copy, so under steady
+    traffic requests never pay for a rebuild. If a rebuild fails the old
+    copy stays in place and the next request retries. A document is never
+    served once it is ``ttl`` old: the first request after a quiet spell
+    (or the very first one) rebuilds it and concurrent requests wait for
+    that one build.
+    """
+    
+    def __init__(self, name, build, ttl, refresh_ahead):
+        self.name = name
+        self.build = build
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self._entry = None  # (body, etag, built_at)
+        self._build_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+    
+    def _encode(self):
+        body = current_app.json.dumps(self.build()).encode() + b'\n'
+        return body, hashlib.sha1(body).hexdigest(), time.monotonic()
+    
+    def _refresh(self):
+        try:
+            self._entry = self._encode()
+        finally:
+            self._refreshing = False
+    
+    def get(self):
+        """Return ``(body, etag, age_seconds)``."""
+        entry = self._entry
+        result = 'hit'
+        if entry is None or time.monotonic() - entry[2] >= self.ttl:
+            # Cold or expired: concurrent requests share one build
+            with self._build_lock:
+                if self._entry is entry:
+                    self._entry = self._encode()
+                    result = 'miss'
+                entry = self._entry
+        metrics.inc('cache_requests_total', (('cache', self.name), ('result', result)))
+        
+        body, etag, built_at = entry
+        age = time.monotonic() - built_at
+        if age >= self.ttl - self.refresh_ahead:
+            with self._refresh_lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                try:
+                    tasks.submit(self._refresh)
+                except Exception:
+                    self._refreshing = False
+                    raise
+        return body, etag, age
+    
+    def warm(self):
+        """Build the document now, e.g. when a worker starts."""
+        with self._build_lock:
+            self._entry = self._encode()
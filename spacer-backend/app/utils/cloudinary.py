@@ -1,31 +1,63 @@
-import cloudinary
-import cloudinary.uploader
+import math
+import time
 from flask import current_app
-from PIL import Image
+from app.utils.metrics import metrics
 import io
 
+# The Cloudinary SDK and Pillow are imported inside the functions that use
+# them, so a worker only loads them once it handles an image.
+
 def configure_cloudinary():
     """Configure Cloudinary with credentials from config."""
+    import cloudinary
     cloudinary.config(
         cloud_name=current_app.config['CLOUDINARY_CLOUD_NAME'],
         api_key=current_app.config['CLOUDINARY_API_KEY'],
         api_secret=current_app.config['CLOUDINARY_API_SECRET']
     )
 
-def resize_image(image_file, max_size=(800, 800)):
-    """Resize image while maintaining aspect ratio."""
+class ImageTooLargeError(ValueError):
+    """Raised before decoding an image whose pixel count exceeds the limit."""
+
+def _fit_size(size, max_size):
+    width, height = size
+    if width <= max_size[0] and height <= max_size[1]:
+        return size
+    ratio = min(max_size[0] / width, max_size[1] / height)
+    return (max(int(width * ratio), 1), max(int(height * ratio), 1))
+
+def open_image(image_file, max_size, max_pixels=None):
+    """Open an image that will be shrunk to fit ``max_size``, decoding as little as possible.
+    
+    The pixel limit is checked against the header before anything is
+    decoded, and JPEGs are decoded straight at the smallest 1/2, 1/4 or 1/8
+    scale that is still at least ``max_size``.
+    """
+    from PIL import Image
     img = Image.open(image_file)
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError(f'Image is {width}x{height} pixels; the limit is {max_pixels} pixels')
+    
+    img.draft('RGB', _fit_size(img.size, max_size))
     
     # Convert to RGB if necessary
-    if img.mode in ('RGBA', 'P'):
+    if img.mode != 'RGB':
         img = img.convert('RGB')
-    
-    # Calculate new dimensions
-    width, height = img.size
-    if width > max_size[0] or height > max_size[1]:
-        ratio = min(max_size[0] / width, max_size[1] / height)
-        new_size = (int(width * ratio), int(height * ratio))
-        img = img.resize(new_size, Image.LANCZOS)
+    return img
+
+def _downscale(img, max_size):
+    from PIL import Image
+    new_size = _fit_size(img.size, max_size)
+    if new_size == img.size:
+        return img
+    # reducing_gap lets Pillow box-reduce by an integer factor before the
+    # LANCZOS pass, which is much cheaper on large images
+    return img.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+
+def resize_image(image_file, max_size=(800, 800), max_pixels=None):
+    """Resize image while maintaining aspect ratio."""
+    img = _downscale(open_image(image_file, max_size, max_pixels), max_size)
     
     # Save to bytes
     output = io.BytesIO()
@@ -33,36 +65,190 @@ def resize_image(image_file, max_size=(800, 800)):
     output.seek(0)
     return output
 
-def upload_image(image_file, folder='spacer'):
-    """Upload image to Cloudinary with resizing."""
+# Sizes generated for every uploaded image: thumbnails for list views, cards
+# for grids and the full image for detail pages
+IMAGE_VARIANTS = {
+    'full': (800, 800),
+    'card': (480, 480),
+    'thumbnail': (160, 160)
+}
+
+IMAGE_FORMATS = {
+    'jpeg': {'format': 'JPEG', 'quality': 85},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4}
+}
+
+def generate_variants(image_file, variants=IMAGE_VARIANTS, formats=IMAGE_FORMATS, max_pixels=None):
+    """Decode an image once and encode every size in every format.
+    
+    Sizes are produced largest first, each downscaled from the previous one,
+    so the expensive resample only ever runs on the full-resolution pixels
+    once. The BlurHash placeholder is computed from the smallest size.
+    Returns ``({variant: {format: bytes}}, blurhash)``.
+    """
+    ordered = sorted(variants.items(), key=lambda item: item[1], reverse=True)
+    img = open_image(image_file, ordered[0][1], max_pixels)
+    
+    encoded = {}
+    for name, max_size in ordered:
+        img = _downscale(img, max_size)
+        
+        encoded[name] = {}
+        for image_format, options in formats.items():
+            output = io.BytesIO()
+            img.save(output, **options)
+            encoded[name][image_format] = output.getvalue()
+    return encoded, blurhash(img)
+
+# BlurHash (https://blurha.sh): a ~28 character string that clients decode
+# into a blurred preview while the real image loads
+BLURHASH_SAMPLE_SIZE = (32, 32)
+BLURHASH_COMPONENTS = (4, 3)
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+def _base83(value, length):
+    return ''.join(_BASE83[value // 83 ** (length - i - 1) % 83] for i in range(length))
+
+def _srgb_to_linear(value):
+    value /= 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+def blurhash(img, components=BLURHASH_COMPONENTS):
+    """Encode an RGB image as a BlurHash string.
+    
+    The image is first box-reduced to at most 32x32, which is all the
+    detail a handful of components can carry, so this costs a few
+    milliseconds on an already downsized variant.
+    """
+    from PIL import Image
+    x_components, y_components = components
+    small = img.resize(_fit_size(img.size, BLURHASH_SAMPLE_SIZE), Image.BOX)
+    width, height = small.size
+    linear = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in small.getdata()]
+    
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+    
+    dc, ac = factors[0], factors[1:]
+    result = _base83(x_components - 1 + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(c) for f in ac for c in f) * 166 - 0.5)))
+        max_ac = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_ac = 0, 1
+    result += _base83(quantised_max, 1)
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    
+    def quantise(value):
+        scaled = math.copysign(abs(value / max_ac) ** 0.5, value)
+        return max(0, min(18, int(math.floor(scaled * 9 + 9.5))))
+    
+    for r, g, b in ac:
+        result += _base83(quantise(r) * 19 * 19 + quantise(g) * 19 + quantise(b), 2)
+    return result
+
+def upload_resized_image(resized_image, folder='spacer', image_format=None, public_id=None):
+    """Upload an already resized image to Cloudinary.
+    
+    With ``image_format`` the file is stored as-is in that format, which is
+    what pre-generated variants want; otherwise Cloudinary picks the format.
+    A fixed ``public_id`` makes repeated uploads of the same content land on
+    the same asset.
+    """
+    import cloudinary.uploader
     try:
         configure_cloudinary()
         
-        # Resize image
-        resized_image = resize_image(image_file)
+        if image_format:
+            options = {'format': image_format, 'transformation': [{'quality': 'auto'}]}
+        else:
+            options = {'transformation': [{'quality': 'auto'}, {'fetch_format': 'auto'}]}
+        if public_id:
+            options.update(public_id=public_id, overwrite=False, unique_filename=False)
         
-        # Upload to Cloudinary
-        result = cloudinary.uploader.upload(
-            resized_image,
-            folder=folder,
-            resource_type='image',
-            transformation=[
-                {'quality': 'auto'},
-                {'fetch_format': 'auto'}
-            ]
-        )
+        with metrics.time_outbound('cloudinary'):
+            result = cloudinary.uploader.upload(
+                resized_image,
+                folder=folder,
+                resource_type='image',
+                **options
+            )
         
         return result['secure_url']
     except Exception as e:
         current_app.logger.error(f"Failed to upload image to Cloudinary: {str(e)}")
         raise
 
+def upload_image(image_file, folder='spacer'):
+    """Upload image to Cloudinary with resizing."""
+    return upload_resized_image(resize_image(image_file), folder=folder)
+
 def delete_image(public_id):
-    """Delete image from Cloudinary."""
+    """Delete image from Cloudinary.
+    
+    Returns False if there was no such image; any other failure raises.
+    """
+    import cloudinary.uploader
     try:
         configure_cloudinary()
-        result = cloudinary.uploader.destroy(public_id)
+        with metrics.time_outbound('cloudinary'):
+            result = cloudinary.uploader.destroy(public_id)
+        if result.get('result') not in ('ok', 'not found'):
+            raise RuntimeError(f"Cloudinary did not delete {public_id}: {result.get('result')}")
         return result['result'] == 'ok'
     except Exception as e:
         current_app.logger.error(f"Failed to delete image from Cloudinary: {str(e)}")
-        return False 
\ No newline at end of file
+        raise
+
+def signed_upload_params(public_id):
+    """Form fields that let a client upload straight to Cloudinary as ``public_id``.
+    
+    Cloudinary accepts a signed upload for one hour after its timestamp.
+    """
+    import cloudinary.utils
+    configure_cloudinary()
+    params = {'public_id': public_id, 'timestamp': int(time.time())}
+    params['signature'] = cloudinary.utils.api_sign_request(params, current_app.config['CLOUDINARY_API_SECRET'])
+    params['api_key'] = current_app.config['CLOUDINARY_API_KEY']
+    upload_url = f"https://api.cloudinary.com/v1_1/{current_app.config['CLOUDINARY_CLOUD_NAME']}/image/upload"
+    return upload_url, params
+
+def delivery_url(public_id, image_format=None):
+    """Public URL of an uploaded image, built locally without an API call."""
+    import cloudinary.utils
+    configure_cloudinary()
+    url, _ = cloudinary.utils.cloudinary_url(
+        public_id, format=image_format or None, resource_type='image', type='upload', secure=True
+    )
+    return url
+
+def get_image_info(public_id):
+    """Return ``{'url', 'size'}`` for an uploaded image, or None if it doesn't exist."""
+    import cloudinary.api
+    try:
+        configure_cloudinary()
+        with metrics.time_outbound('cloudinary'):
+            result = cloudinary.api.resource(public_id)
+        return {'url': result['secure_url'], 'size': result['bytes']}
+    except cloudinary.exceptions.NotFound:
+        return None
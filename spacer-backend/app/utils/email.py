@@ -1,13 +1,16 @@
 import os
-from sib_api_v3_sdk import ApiClient, Configuration, TransactionalEmailsApi
-from sib_api_v3_sdk.models import SendSmtpEmail, SendSmtpEmailTo
 from flask import current_app
+from app.utils.metrics import metrics
 import jwt
 from datetime import datetime, timedelta
 
 def get_email_client():
+    # The Sendinblue SDK takes ~100 ms to import; load it on the first email
+    from sib_api_v3_sdk import ApiClient, Configuration, TransactionalEmailsApi
     configuration = Configuration()
     configuration.api_key['api-key'] = current_app.config['SENDINBLUE_API_KEY']
+    if current_app.config['SENDINBLUE_API_HOST']:
+        configuration.host = current_app.config['SENDINBLUE_API_HOST']
     api_client = ApiClient(configuration)
     return TransactionalEmailsApi(api_client)
 
@@ -19,6 +22,7 @@ def generate_verification_token(user):
     return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
 
 def send_verification_email(user):
+    from sib_api_v3_sdk import SendSmtpEmail, SendSmtpEmailTo
     try:
         api_instance = get_email_client()
         
@@ -42,13 +46,15 @@ def send_verification_email(user):
         )
         
         # Send email
-        api_instance.send_transac_email(email)
+        with metrics.time_outbound('sendinblue'):
+            api_instance.send_transac_email(email)
         return True
     except Exception as e:
         current_app.logger.error(f"Failed to send verification email: {str(e)}")
         return False
 
 def send_booking_confirmation_email(booking):
+    from sib_api_v3_sdk import SendSmtpEmail, SendSmtpEmailTo
     try:
         api_instance = get_email_client()
         user = booking.user
@@ -73,7 +79,8 @@ def send_booking_confirmation_email(booking):
             """
         )
         
-        api_instance.send_transac_email(email)
+        with metrics.time_outbound('sendinblue'):
+            api_instance.send_transac_email(email)
         return True
     except Exception as e:
         current_app.logger.error(f"Failed to send booking confirmation email: {str(e)}")
@@ -0,0 +1,71 @@
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models.space import Space, SpaceReview
+from app.models.testimonial import Testimonial
+from app.utils.cache import RefreshAheadCache
+
+def build_home_document():
+    """Everything the landing page shows, in one document.
+    
+    Featured spaces are the available spaces with the best average review
+    rating (then the most reviews, then the newest); city counts come from
+    a single GROUP BY over available spaces.
+    """
+    limit = current_app.config['HOME_FEATURED_LIMIT']
+    average_rating = func.avg(SpaceReview.rating)
+    review_count = func.count(SpaceReview.id)
+    ranked = db.session.query(Space.id, average_rating, review_count).outerjoin(
+        SpaceReview, SpaceReview.space_id == Space.id
+    ).filter(
+        Space.is_available == True
+    ).group_by(Space.id).order_by(
+        func.coalesce(average_rating, 0).desc(),
+        review_count.desc(),
+        Space.created_at.desc()
+    ).limit(limit).all()
+    
+    spaces = {
+        space.id: space
+        for space in Space.query.options(
+            selectinload(Space.images),
+            selectinload(Space.amenities),
+            selectinload(Space.reviews)
+        ).filter(Space.id.in_([row[0] for row in ranked]))
+    }
+    featured = []
+    for space_id, rating, reviews in ranked:
+        space_data = spaces[space_id].to_dict()
+        space_data['average_rating'] = round(float(rating), 2) if rating is not None else None
+        space_data['review_count'] = reviews
+        featured.append(space_data)
+    
+    city_counts = db.session.query(Space.city, func.count(Space.id)).filter(
+        Space.is_available == True
+    ).group_by(Space.city).order_by(func.count(Space.id).desc(), Space.city).all()
+    
+    testimonials = Testimonial.query.order_by(Testimonial.id).all()
+    
+    document = {
+        'featured_spaces': featured,
+        'cities': [{'city': city, 'count': count} for city, count in city_counts],
+        'testimonials': [testimonial.to_dict() for testimonial in testimonials],
+        'generated_at': datetime.utcnow().isoformat()
+    }
+    # Background rebuilds run on a pool thread; don't hold its connection
+    db.session.rollback()
+    return document
+
+def get_home_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('home_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('home_cache', RefreshAheadCache(
+            'home',
+            build_home_document,
+            ttl=app.config['HOME_CACHE_TTL'],
+            refresh_ahead=app.config['HOME_CACHE_REFRESH_AHEAD']
+        ))
+    return cache
@@ -0,0 +1,170 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.media import ImageTombstone, StoredImage
+from app.models.space import SpaceImage
+from app.models.user import User
+from app.utils.storage import get_storage
+
+def tombstone_space_images(criterion, reason):
+    """Record the images matching ``criterion`` for collection, in one INSERT ... SELECT.
+    
+    Call before deleting the rows (directly or through a cascade), in the
+    same transaction.
+    """
+    rows = db.select(
+        SpaceImage.image_url,
+        # Originals of ready images were already removed by the pipeline
+        db.case((SpaceImage.status != 'ready', SpaceImage.source_key)),
+        db.literal(reason),
+        db.literal(datetime.utcnow(), db.DateTime)
+    ).where(criterion)
+    db.session.execute(
+        ImageTombstone.__table__.insert().from_select(['url', 'source_key', 'reason', 'created_at'], rows)
+    )
+
+def tombstone_url(url, reason):
+    """Record a single image URL, e.g. a replaced avatar, for collection."""
+    if url:
+        db.session.add(ImageTombstone(url=url, reason=reason))
+
+class _RateLimiter:
+    """Spaces calls from any number of threads at least ``1 / rate`` seconds apart."""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(slot - now)
+
+def collect_garbage(older_than_minutes=None, limit=None, max_workers=None, deletes_per_second=None, dry_run=False):
+    """Delete the stored objects behind one batch of tombstones.
+    
+    Tombstones younger than the grace period are left alone, so uploads
+    that are being deduplicated against an image right now can still
+    commit their reference. A tombstoned URL that is referenced again by a
+    space image or avatar is simply dropped. Stored image rows are removed
+    before their objects so new uploads stop reusing them; objects that
+    fail to delete get a fresh tombstone for the next run.
+    
+    Returns a report with the bytes reclaimed (or reclaimable, with
+    ``dry_run``). Sizes are only known for content-addressed images.
+    """
+    config = current_app.config
+    older_than_minutes = config['IMAGE_GC_GRACE_MINUTES'] if older_than_minutes is None else older_than_minutes
+    limit = limit or config['IMAGE_GC_BATCH_SIZE']
+    max_workers = max_workers or config['IMAGE_GC_MAX_WORKERS']
+    deletes_per_second = config['IMAGE_GC_DELETES_PER_SECOND'] if deletes_per_second is None else deletes_per_second
+    cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+    storage = get_storage()
+    
+    tombstones = ImageTombstone.query.filter(
+        ImageTombstone.created_at < cutoff
+    ).order_by(ImageTombstone.id).limit(limit).all()
+    urls = {tombstone.url for tombstone in tombstones}
+    source_keys = {tombstone.source_key for tombstone in tombstones if tombstone.source_key}
+    
+    referenced = {
+        url for (url,) in db.session.query(SpaceImage.image_url).filter(SpaceImage.image_url.in_(urls))
+    }
+    referenced.update(
+        url for (url,) in db.session.query(User.avatar_url).filter(User.avatar_url.in_(urls))
+    )
+    live_sources = {
+        key for (key,) in db.session.query(SpaceImage.source_key).filter(SpaceImage.source_key.in_(source_keys))
+    }
+    stored = {
+        image.url: image
+        for image in StoredImage.query.filter(
+            StoredImage.backend == storage.name,
+            StoredImage.url.in_(urls - referenced)
+        )
+    }
+    
+    # key -> tombstoned URL it was found through
+    keys = {}
+    for tombstone in tombstones:
+        if tombstone.url in referenced:
+            continue
+        image = stored.get(tombstone.url)
+        if image is not None:
+            keys.update((key, tombstone.url) for key in image.keys)
+        else:
+            # Uploaded before content addressing, or an unprocessed original
+            key = storage.key_for_url(tombstone.url)
+            if key:
+                keys.setdefault(key, tombstone.url)
+        if tombstone.source_key and tombstone.source_key not in live_sources:
+            keys.setdefault(tombstone.source_key, tombstone.url)
+    # (size, keys) per image, read before the rows are deleted
+    sizes = [(image.size_bytes, set(image.keys)) for image in stored.values()]
+    
+    report = {
+        'tombstones': len(tombstones),
+        'dry_run': dry_run,
+        'still_referenced': len(referenced),
+        'stored_images_removed': len(stored),
+        'objects_deleted': 0,
+        'bytes_reclaimed': 0,
+        'errors': []
+    }
+    if dry_run:
+        report['objects_deleted'] = len(keys)
+        report['bytes_reclaimed'] = sum(size for size, _ in sizes)
+        db.session.rollback()
+        return report
+    
+    if stored:
+        StoredImage.query.filter(
+            StoredImage.backend == storage.name,
+            StoredImage.content_hash.in_([image.content_hash for image in stored.values()])
+        ).delete(synchronize_session=False)
+    ImageTombstone.query.filter(
+        ImageTombstone.id.in_([tombstone.id for tombstone in tombstones])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    
+    if keys:
+        app = current_app._get_current_object()
+        limiter = _RateLimiter(deletes_per_second)
+        
+        def delete(key):
+            limiter.wait()
+            with app.app_context():
+                try:
+                    storage.delete(key)
+                    return key, None
+                except Exception as e:
+                    return key, str(e)
+        
+        failed = set()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(keys)),
+                                thread_name_prefix='spacer-gc') as pool:
+            for key, error in pool.map(delete, keys):
+                if error:
+                    failed.add(key)
+                    report['errors'].append({'key': key, 'error': error})
+                    db.session.add(ImageTombstone(url=keys[key], source_key=key, reason='gc_retry'))
+                else:
+                    # Including objects that were already gone
+                    report['objects_deleted'] += 1
+        db.session.commit()
+        # Sizes are per image, so an image counts once all of its objects are gone
+        report['bytes_reclaimed'] = sum(size for size, image_keys in sizes if failed.isdisjoint(image_keys))
+    
+    current_app.logger.info(
+        f"Image GC: {report['objects_deleted']} objects deleted, "
+        f"{report['bytes_reclaimed']} bytes reclaimed, {len(report['errors'])} errors"
+    )
+    return report
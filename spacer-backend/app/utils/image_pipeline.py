@@ -0,0 +1,304 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.models.media import StoredImage
+from app.models.space import SpaceImage
+from app.utils import tasks
+from app.utils.cloudinary import generate_variants
+from app.utils.image_gc import tombstone_url
+from app.utils.metrics import metrics
+from app.utils.sql import insert_ignore
+from app.utils.storage import get_storage, variant_key, raw_upload_key, RAW_UPLOAD_EXTENSIONS, RAW_UPLOAD_EXTENSION_ALIASES
+
+# Pools are per process and rebuilt after a fork. Decoding and resizing is
+# CPU bound and runs in worker processes so it doesn't serialise on the GIL;
+# uploads are I/O bound and run on a bounded thread pool.
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+def _get_pools(config):
+    global _pools, _pools_pid
+    if _pools_pid != os.getpid():
+        with _pools_lock:
+            if _pools_pid != os.getpid():
+                process_workers = config['IMAGE_PROCESS_WORKERS']
+                _pools = {
+                    'resize': ProcessPoolExecutor(
+                        max_workers=process_workers,
+                        # Never fork a threaded web worker
+                        mp_context=multiprocessing.get_context('spawn')
+                    ) if process_workers else None,
+                    'upload': ThreadPoolExecutor(
+                        max_workers=config['IMAGE_UPLOAD_CONCURRENCY'],
+                        thread_name_prefix='spacer-upload'
+                    )
+                }
+                _pools_pid = os.getpid()
+    return _pools
+
+def _reset_pools():
+    global _pools_pid
+    with _pools_lock:
+        _pools_pid = None
+
+def _generate_variant_bytes(data, max_pixels):
+    """Process pool entry point: raw upload bytes in, encoded variants and BlurHash out."""
+    return generate_variants(io.BytesIO(data), max_pixels=max_pixels)
+
+def _resolved(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def _read_bounded(image_file, max_bytes):
+    """Read an upload, refusing files over ``max_bytes`` without reading them."""
+    stream = image_file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    if size > max_bytes:
+        raise ValueError(f'Image is {size / 1048576:.1f} MB; the limit is {max_bytes / 1048576:.1f} MB')
+    return stream.read()
+
+def _generate_all(app, resize_pool, payloads, max_pixels):
+    """Start variant generation for each payload; unreadable payloads pass their error through."""
+    if resize_pool is not None:
+        try:
+            return [
+                resize_pool.submit(_generate_variant_bytes, payload.result(), max_pixels)
+                if payload.exception() is None else payload
+                for payload in payloads
+            ]
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool: rebuild it on the next
+            # call and process this batch in the request thread instead
+            app.logger.error("Image resize pool is broken, resizing inline")
+            _reset_pools()
+    return [
+        _resolved(_generate_variant_bytes, payload.result(), max_pixels)
+        if payload.exception() is None else payload
+        for payload in payloads
+    ]
+
+def _read_and_hash(image_files, max_bytes):
+    """Read each upload; returns the payloads (futures holding bytes or the read error) and their SHA-256."""
+    payloads = [_resolved(_read_bounded, image_file, max_bytes) for image_file in image_files]
+    hashes = [
+        hashlib.sha256(payload.result()).hexdigest() if payload.exception() is None else None
+        for payload in payloads
+    ]
+    return payloads, hashes
+
+def _stored_variants(storage, hashes):
+    """``{content_hash: (variants, placeholder)}`` for the hashes already stored in ``storage``."""
+    return {
+        image.content_hash: (image.variants, image.placeholder)
+        for image in StoredImage.query.filter(
+            StoredImage.backend == storage.name,
+            StoredImage.content_hash.in_({h for h in hashes if h})
+        )
+    }
+
+def process_images(image_files, folder='spacer'):
+    """Generate and store the size/format variants of several images concurrently.
+
+    Uploads are keyed by the SHA-256 of their bytes: an image that is
+    already stored (in any listing or avatar) skips both the resize and the
+    transfer and reuses the stored variants.
+
+    Returns one ``(variant_urls, placeholder, error)`` tuple per input
+    file, in input order, so callers can keep using the position (e.g. for
+    ``is_primary``) and report failures per image. ``variant_urls`` maps
+    variant name to format to URL, e.g. ``variant_urls['thumbnail']['webp']``;
+    ``placeholder`` is the image's BlurHash. New images are recorded in the
+    current session; the caller commits.
+    """
+    app = current_app._get_current_object()
+    pools = _get_pools(app.config)
+    storage = get_storage()
+    max_bytes = app.config['MAX_IMAGE_UPLOAD_BYTES']
+    max_pixels = app.config['MAX_IMAGE_PIXELS']
+    payloads, hashes = _read_and_hash(image_files, max_bytes)
+    stored = _stored_variants(storage, hashes)
+    
+    # Process each new hash once, even if it appears twice in this request
+    pending = {}
+    for payload, content_hash in zip(payloads, hashes):
+        if content_hash and content_hash not in stored and content_hash not in pending:
+            pending[content_hash] = payload
+    reused = sum(1 for content_hash in hashes if content_hash in stored)
+    metrics.inc('cache_requests_total', (('cache', 'stored_images'), ('result', 'hit')), reused)
+    metrics.inc('cache_requests_total', (('cache', 'stored_images'), ('result', 'miss')), len(pending))
+    generated = dict(zip(pending, _generate_all(app, pools['resize'], list(pending.values()), max_pixels)))
+    
+    def upload(variants_future, key, name, image_format):
+        data = variants_future.result()[0][name][image_format]
+        with app.app_context():
+            return storage.save(key, data), len(data)
+    
+    # Fan out one upload per variant and format as soon as each image's
+    # variants are ready
+    uploads = {}
+    for content_hash, variants_future in generated.items():
+        uploads[content_hash] = {}
+        for name in app.config['IMAGE_VARIANT_NAMES']:
+            for image_format in app.config['IMAGE_VARIANT_FORMATS']:
+                key = variant_key(folder, content_hash, name, image_format)
+                future = pools['upload'].submit(upload, variants_future, key, name, image_format)
+                uploads[content_hash][(name, image_format)] = (key, future)
+    
+    errors = {}
+    for content_hash, image_uploads in uploads.items():
+        try:
+            variant_urls, keys, size_bytes = {}, [], 0
+            for (name, image_format), (key, future) in image_uploads.items():
+                url, size = future.result()
+                variant_urls.setdefault(name, {})[image_format] = url
+                keys.append(key)
+                size_bytes += size
+            placeholder = generated[content_hash].result()[1]
+        except Exception as e:
+            errors[content_hash] = str(e)
+            continue
+        values = {
+            'content_hash': content_hash,
+            'backend': storage.name,
+            'variants': variant_urls,
+            'placeholder': placeholder,
+            'url': variant_urls['full']['jpeg'],
+            'keys': keys,
+            'size_bytes': size_bytes
+        }
+        insert_ignore(StoredImage, values, ['content_hash', 'backend'])
+        stored[content_hash] = (variant_urls, placeholder)
+    
+    results = []
+    for payload, content_hash in zip(payloads, hashes):
+        if content_hash is None:
+            results.append((None, None, str(payload.exception())))
+        elif content_hash in errors:
+            results.append((None, None, errors[content_hash]))
+        else:
+            results.append((*stored[content_hash], None))
+    return results
+
+def _upload_extension(image_file):
+    """The upload's image format from its filename, or None to let the storage backend detect it."""
+    extension = os.path.splitext(image_file.filename or '')[1].lstrip('.').lower()
+    extension = RAW_UPLOAD_EXTENSION_ALIASES.get(extension, extension)
+    return extension if extension in RAW_UPLOAD_EXTENSIONS else None
+
+def store_raw_uploads(space_id, image_files):
+    """Save original uploads as-is so they can be processed later.
+
+    Uploads are hashed first: content that is already stored is not
+    transferred again and comes back with its variants, ready to use.
+
+    Returns one ``(key, url, stored, error)`` tuple per file, in input
+    order. For known content ``stored`` is ``(variant_urls, placeholder)``,
+    ``url`` the full JPEG and ``key`` None; for new content ``stored`` is
+    None and ``key`` is where the original was saved.
+    """
+    app = current_app._get_current_object()
+    pools = _get_pools(app.config)
+    storage = get_storage()
+    payloads, hashes = _read_and_hash(image_files, app.config['MAX_IMAGE_UPLOAD_BYTES'])
+    stored = _stored_variants(storage, hashes)
+    metrics.inc(
+        'cache_requests_total', (('cache', 'stored_images'), ('result', 'hit')),
+        sum(1 for content_hash in hashes if content_hash in stored)
+    )
+    
+    def save(key, data):
+        with app.app_context():
+            return storage.save(key, data)
+    
+    saves = {}
+    for i, (image_file, payload, content_hash) in enumerate(zip(image_files, payloads, hashes)):
+        if content_hash and content_hash not in stored:
+            key = raw_upload_key(space_id, _upload_extension(image_file))
+            saves[i] = (key, pools['upload'].submit(save, key, payload.result()))
+    
+    results = []
+    for i, (payload, content_hash) in enumerate(zip(payloads, hashes)):
+        if content_hash is None:
+            results.append((None, None, None, str(payload.exception())))
+        elif content_hash in stored:
+            variant_urls, placeholder = stored[content_hash]
+            results.append((None, variant_urls['full']['jpeg'], stored[content_hash], None))
+        else:
+            key, future = saves[i]
+            try:
+                results.append((key, future.result(), None, None))
+            except Exception as e:
+                results.append((key, None, None, str(e)))
+    return results
+
+def process_space_images(image_ids):
+    """Generate variants for ``processing`` space images and mark them ready or failed.
+
+    Each image is settled on its own, so one bad upload never affects the
+    others or the space. Originals are deleted once their variants exist.
+    An image deleted meanwhile (e.g. its space's images were replaced) is
+    left deleted: its new variants are tombstoned for garbage collection.
+    """
+    storage = get_storage()
+    images = SpaceImage.query.filter(
+        SpaceImage.id.in_(image_ids),
+        SpaceImage.status == 'processing'
+    ).all()
+    
+    def settle(image, **values):
+        # Guarded UPDATE rather than a flush of the loaded row, which raises
+        # StaleDataError if the row has been deleted since it was loaded
+        return SpaceImage.query.filter(
+            SpaceImage.id == image.id,
+            SpaceImage.status == 'processing'
+        ).update(values, synchronize_session=False) == 1
+    
+    files, readable = [], []
+    for image in images:
+        try:
+            files.append(FileStorage(stream=io.BytesIO(storage.read(image.source_key))))
+            readable.append(image)
+        except Exception as e:
+            settle(image, status='failed', processing_error=f'Original upload is unavailable: {e}'[:255])
+    
+    processed, ready = [], 0
+    for image, (variants, placeholder, error) in zip(readable, process_images(files)):
+        if error:
+            settle(image, status='failed', processing_error=error[:255])
+            continue
+        full_url = variants['full']['jpeg']
+        if settle(image, image_url=full_url, variants=variants, placeholder=placeholder,
+                  status='ready', processing_error=None):
+            ready += 1
+        else:
+            # Collected once nothing else uses the same content
+            tombstone_url(full_url, 'images_replaced')
+        processed.append(image.source_key)
+    db.session.commit()
+    
+    for key in processed:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            current_app.logger.warning(f'Could not delete original upload {key}: {e}')
+    return ready
+
+def schedule_space_image_processing(image_ids):
+    """Process committed ``processing`` images on the background pool."""
+    if image_ids:
+        return tasks.submit(process_space_images, list(image_ids))
+
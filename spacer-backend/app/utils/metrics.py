@@ -0,0 +1,256 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, request
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route and status', None),
+    'http_request_duration_seconds': (
+        'histogram', 'HTTP request latency',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    ),
+    'http_response_size_bytes': (
+        'histogram', 'HTTP response body size',
+        (100, 1000, 10000, 100000, 1000000, 10000000)
+    ),
+    'outbound_request_duration_seconds': (
+        'histogram', 'Latency of calls to external services',
+        (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    ),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss)', None),
+    'db_pool_checked_out': ('gauge', 'Database connections currently checked out', None),
+    'db_pool_overflow': ('gauge', 'Database connections open beyond the pool size', None),
+    'db_pool_size': ('gauge', 'Configured database pool size', None),
+}
+
+class Metrics:
+    """Counters, histograms and gauges for this process.
+    
+    Every thread writes to its own shard, so recording never takes a lock
+    (one lock is taken the first time a thread records anything). Shards
+    are summed when the metrics are read.
+    
+    For preforking servers set ``directory``: each process periodically
+    writes its totals to ``<directory>/<pid>.json`` and the scrape sums
+    every file, so /metrics is complete whichever worker answers it.
+    Counters and histograms of exited workers are kept; their gauges are
+    dropped.
+    """
+    
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._gauges = {}
+        self._flushed_at = 0.0
+        # A forked worker starts from zero instead of re-reporting its parent's counts
+        os.register_at_fork(after_in_child=self._reset)
+    
+    def _reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._gauges = {}
+        self._flushed_at = 0.0
+    
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+    
+    def inc(self, name, labels=(), amount=1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+    
+    def observe(self, name, labels, value):
+        shard = self._shard()
+        key = (name, labels)
+        buckets = METRICS[name][2]
+        counts = shard.get(key)
+        if counts is None:
+            # One count per bucket, then +Inf, then the sum
+            counts = shard[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(buckets)] += 1
+        counts[-1] += value
+    
+    def set_gauge(self, name, labels, value):
+        self._gauges[(name, labels)] = value
+    
+    @contextmanager
+    def time_outbound(self, service):
+        """Record the latency of a call to an external service, labelled ok or error."""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.observe(
+                'outbound_request_duration_seconds',
+                (('service', service), ('outcome', outcome)),
+                time.perf_counter() - started
+            )
+    
+    def collect(self):
+        """This process's totals as ``{(name, labels): value}``."""
+        totals = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in list(shard.items()):
+                _merge(totals, key, value)
+        totals.update(self._gauges)
+        return totals
+    
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """Write this process's totals to its file in ``directory``."""
+        if not self.directory:
+            return
+        self._flushed_at = time.monotonic()
+        records = [[name, list(labels), value] for (name, labels), value in self.collect().items()]
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'pid': os.getpid(), 'metrics': records}, f)
+        os.replace(tmp_path, os.path.join(self.directory, f'{os.getpid()}.json'))
+    
+    def clear_directory(self):
+        """Delete the files of earlier server runs, so their counts are not added to this run's."""
+        if not self.directory:
+            return
+        for path in glob.glob(os.path.join(self.directory, '*.json')) + glob.glob(os.path.join(self.directory, '*.tmp')):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def collect_all(self):
+        """Totals across every process that wrote to ``directory``, or this process alone."""
+        if not self.directory:
+            return self.collect()
+        self.flush()
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(data['pid'])
+            for name, labels, value in data['metrics']:
+                if METRICS[name][0] == 'gauge':
+                    if not alive:
+                        continue
+                    labels = [*labels, ['pid', str(data['pid'])]]
+                _merge(totals, (name, tuple(tuple(label) for label in labels)), value)
+        return totals
+    
+    def render(self):
+        """Prometheus text exposition format."""
+        totals = self.collect_all()
+        by_name = {}
+        for (name, labels), value in totals.items():
+            by_name.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, (metric_type, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in sorted(by_name.get(name, ())):
+                if metric_type != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels((*labels, ('le', str(bound))))} {cumulative}")
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+def _merge(totals, key, value):
+    if isinstance(value, list):
+        current = totals.get(key)
+        totals[key] = [a + b for a, b in zip(current, value)] if current else list(value)
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = (f'{key}="{_escape_label(value)}"' for key, value in labels)
+    return '{' + ','.join(pairs) + '}'
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# One registry per process; METRICS_DIR is read when the app is created
+metrics = Metrics()
+
+def init_metrics(app):
+    """Record latency, size and status for every request, labelled by blueprint and route."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics.directory = app.config['METRICS_DIR']
+    metrics.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+    
+    from app.extensions import db
+    
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started_at = time.perf_counter()
+    
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started_at', None)
+        if started is None:
+            return response
+        # The rule, not the path, so /api/spaces/1 and /api/spaces/2 share a series
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        labels = (('blueprint', request.blueprint or ''), ('route', route), ('method', request.method))
+        metrics.inc('http_requests_total', (*labels, ('status', str(response.status_code))))
+        metrics.observe('http_request_duration_seconds', labels, time.perf_counter() - started)
+        size = response.calculate_content_length()
+        if size is not None:
+            metrics.observe('http_response_size_bytes', labels, size)
+        
+        pool = db.engine.pool
+        if hasattr(pool, 'checkedout'):
+            metrics.set_gauge('db_pool_checked_out', (), pool.checkedout())
+            # QueuePool reports unopened pool slots as negative overflow
+            metrics.set_gauge('db_pool_overflow', (), max(pool.overflow(), 0))
+            metrics.set_gauge('db_pool_size', (), pool.size())
+        metrics.maybe_flush()
+        return response
+
@@ -1,40 +1,105 @@
-import requests
 import base64
+import threading
+import time
 from datetime import datetime
 from flask import current_app
-import json
+from app.utils.metrics import metrics
 
 class MpesaAPI:
-    def __init__(self):
-        self.consumer_key = current_app.config['MPESA_CONSUMER_KEY']
-        self.consumer_secret = current_app.config['MPESA_CONSUMER_SECRET']
-        self.business_shortcode = current_app.config['MPESA_BUSINESS_SHORTCODE']
-        self.passkey = current_app.config['MPESA_PASSKEY']
-        self.callback_url = f"{current_app.config['BACKEND_URL']}/api/payments/mpesa-callback"
+    """Long-lived Daraja client.
+    
+    Holds a pooled ``requests.Session`` and caches the OAuth token until shortly
+    before it expires, so a warm STK push costs a single HTTP call. Use
+    ``get_mpesa_api()`` to get the per-app instance instead of constructing one
+    per request.
+    """
+    
+    # Daraja answers a query for a push the customer has not acted on yet
+    # with an HTTP error carrying this code
+    STK_QUERY_PENDING_CODES = ('500.001.1001',)
+    
+    def __init__(self, consumer_key, consumer_secret, business_shortcode, passkey, callback_url,
+                 base_url='https://sandbox.safaricom.co.ke', connect_timeout=3.05, read_timeout=10,
+                 pool_size=10, token_refresh_margin=60):
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.business_shortcode = business_shortcode
+        self.passkey = passkey
+        self.callback_url = callback_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.token_refresh_margin = token_refresh_margin
         
         # API endpoints
-        self.auth_url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
-        self.stk_push_url = "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest"
+        base_url = base_url.rstrip('/')
+        self.auth_url = f"{base_url}/oauth/v1/generate?grant_type=client_credentials"
+        self.stk_push_url = f"{base_url}/mpesa/stkpush/v1/processrequest"
+        self.stk_query_url = f"{base_url}/mpesa/stkpushquery/v1/query"
+        
+        # Imported here so workers that never take a payment don't load requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            consumer_key=config['MPESA_CONSUMER_KEY'],
+            consumer_secret=config['MPESA_CONSUMER_SECRET'],
+            business_shortcode=config['MPESA_BUSINESS_SHORTCODE'],
+            passkey=config['MPESA_PASSKEY'],
+            callback_url=f"{config['BACKEND_URL']}/api/payments/mpesa-callback",
+            base_url=config['MPESA_BASE_URL'],
+            connect_timeout=config['MPESA_CONNECT_TIMEOUT'],
+            read_timeout=config['MPESA_READ_TIMEOUT'],
+            pool_size=config['MPESA_POOL_SIZE'],
+            token_refresh_margin=config['MPESA_TOKEN_REFRESH_MARGIN']
+        )
     
     def get_auth_token(self):
-        """Get OAuth token from Safaricom."""
-        try:
-            auth_string = base64.b64encode(
-                f"{self.consumer_key}:{self.consumer_secret}".encode('utf-8')
-            ).decode('utf-8')
-            
-            headers = {
-                "Authorization": f"Basic {auth_string}"
-            }
-            
-            response = requests.get(self.auth_url, headers=headers)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result.get('access_token')
-        except Exception as e:
-            current_app.logger.error(f"Error getting Mpesa auth token: {str(e)}")
-            return None
+        """Return a cached OAuth token, fetching a new one shortly before expiry."""
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        
+        with self._token_lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            try:
+                auth_string = base64.b64encode(
+                    f"{self.consumer_key}:{self.consumer_secret}".encode('utf-8')
+                ).decode('utf-8')
+                
+                headers = {
+                    "Authorization": f"Basic {auth_string}"
+                }
+                
+                with metrics.time_outbound('mpesa'):
+                    response = self.session.get(self.auth_url, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+                
+                result = response.json()
+                token = result.get('access_token')
+                if not token:
+                    return None
+                expires_in = int(result.get('expires_in', 3599))
+                self._token = token
+                self._token_expires_at = time.monotonic() + max(expires_in - self.token_refresh_margin, 0)
+                return token
+            except Exception as e:
+                current_app.logger.error(f"Error getting Mpesa auth token: {str(e)}")
+                return None
+    
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0.0
     
     def generate_password(self):
         """Generate password for STK push."""
@@ -42,13 +107,40 @@ class MpesaAPI:
         password_string = f"{self.business_shortcode}{self.passkey}{timestamp}"
         return base64.b64encode(password_string.encode('utf-8')).decode('utf-8'), timestamp
     
-    def initiate_stk_push(self, phone_number, amount, booking_id):
-        """Initiate STK push to customer's phone."""
-        try:
+    def _post(self, url, payload, allowed_error_codes=()):
+        """POST with the cached token, refreshing it once if Daraja rejects it.
+        
+        Error responses whose ``errorCode`` is in ``allowed_error_codes`` are
+        returned as data instead of raising.
+        """
+        for attempt in range(2):
             access_token = self.get_auth_token()
             if not access_token:
-                return False, "Could not get authentication token"
+                return None
             
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
+            with metrics.time_outbound('mpesa'):
+                response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            if response.status_code == 401 and attempt == 0:
+                self.invalidate_token()
+                continue
+            if not response.ok and allowed_error_codes:
+                try:
+                    result = response.json()
+                except ValueError:
+                    result = {}
+                if result.get('errorCode') in allowed_error_codes:
+                    return result
+            response.raise_for_status()
+            return response.json()
+    
+    def initiate_stk_push(self, phone_number, amount, booking_id):
+        """Initiate STK push to customer's phone."""
+        import requests
+        try:
             password, timestamp = self.generate_password()
             
             # Format phone number (remove leading 0 or +254)
@@ -57,11 +149,6 @@ class MpesaAPI:
             elif phone_number.startswith('0'):
                 phone_number = '254' + phone_number[1:]
             
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "BusinessShortCode": self.business_shortcode,
                 "Password": password,
@@ -76,10 +163,10 @@ class MpesaAPI:
                 "TransactionDesc": f"Payment for booking {booking_id}"
             }
             
-            response = requests.post(self.stk_push_url, json=payload, headers=headers)
-            response.raise_for_status()
+            result = self._post(self.stk_push_url, payload)
+            if result is None:
+                return False, "Could not get authentication token"
             
-            result = response.json()
             if result.get('ResponseCode') == "0":
                 return True, result.get('CheckoutRequestID')
             else:
@@ -90,4 +177,38 @@ class MpesaAPI:
             return False, "Failed to initiate payment. Please try again."
         except Exception as e:
             current_app.logger.error(f"Unexpected error in Mpesa payment: {str(e)}")
-            return False, "An unexpected error occurred. Please try again." 
\ No newline at end of file
+            return False, "An unexpected error occurred. Please try again."
+    
+    def query_stk_status(self, checkout_request_id):
+        """Ask Daraja for the outcome of an STK push.
+        
+        Returns ``(state, description)`` where state is ``completed``,
+        ``failed`` or ``pending``. Transport errors are raised so callers can
+        tell "still pending" apart from "could not ask".
+        """
+        password, timestamp = self.generate_password()
+        payload = {
+            "BusinessShortCode": self.business_shortcode,
+            "Password": password,
+            "Timestamp": timestamp,
+            "CheckoutRequestID": checkout_request_id
+        }
+        
+        result = self._post(self.stk_query_url, payload, allowed_error_codes=self.STK_QUERY_PENDING_CODES)
+        if result is None:
+            raise RuntimeError("Could not get authentication token")
+        if result.get('errorCode') in self.STK_QUERY_PENDING_CODES:
+            return 'pending', result.get('errorMessage', 'The transaction is being processed')
+        
+        description = result.get('ResultDesc') or result.get('ResponseDescription')
+        if str(result.get('ResultCode')) == '0':
+            return 'completed', description
+        return 'failed', description
+
+def get_mpesa_api():
+    """Return the app-wide M-Pesa client, creating it on first use."""
+    app = current_app._get_current_object()
+    client = app.extensions.get('mpesa')
+    if client is None:
+        client = app.extensions.setdefault('mpesa', MpesaAPI.from_config(app.config))
+    return client
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.booking import MpesaCallback, Payment
+from app.utils.payment_events import payment_events
+from app.utils.sql import insert_ignore
+from app.utils import tasks
+
+_schedule_lock = threading.Lock()
+_scheduled = False
+
+def record_callback(payload):
+    """Store a raw STK callback keyed by CheckoutRequestID.
+
+    Returns True when the callback is new and False for a retry of one we
+    already have. Duplicates cost a single INSERT ... ON CONFLICT DO NOTHING.
+    """
+    stk_callback = payload['Body']['stkCallback']
+    values = {
+        'checkout_request_id': stk_callback['CheckoutRequestID'],
+        'result_code': int(stk_callback['ResultCode']),
+        'payload': payload,
+        'received_at': datetime.utcnow()
+    }
+    
+    inserted = insert_ignore(MpesaCallback, values, ['checkout_request_id'])
+    db.session.commit()
+    return inserted
+
+def schedule_callback_processing():
+    """Queue a drain of unprocessed callbacks unless one is already queued."""
+    global _scheduled
+    with _schedule_lock:
+        if _scheduled:
+            return
+        _scheduled = True
+    tasks.submit(_drain_callbacks)
+
+def _drain_callbacks():
+    global _scheduled
+    # Clear the flag first so callbacks that land mid-drain queue another pass
+    with _schedule_lock:
+        _scheduled = False
+    process_pending_callbacks(current_app.config['MPESA_CALLBACK_BATCH_SIZE'])
+
+def process_pending_callbacks(batch_size=100):
+    """Apply stored callbacks to their payments in batches.
+
+    Transitions only happen while a payment is still pending, so processing
+    the same callback twice is harmless. Callbacks whose payment is not known
+    yet (the push job may not have stored the CheckoutRequestID) are retried
+    on later runs until MPESA_CALLBACK_MATCH_GRACE_SECONDS has passed.
+    """
+    grace = timedelta(seconds=current_app.config['MPESA_CALLBACK_MATCH_GRACE_SECONDS'])
+    processed = 0
+    cursor = ''
+    while True:
+        callbacks = MpesaCallback.query.filter(
+            MpesaCallback.processed_at.is_(None),
+            MpesaCallback.checkout_request_id > cursor
+        ).order_by(MpesaCallback.checkout_request_id).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not callbacks:
+            break
+        cursor = callbacks[-1].checkout_request_id
+        
+        payments = {
+            payment.transaction_id: payment
+            for payment in Payment.query.options(joinedload(Payment.booking)).filter(
+                Payment.transaction_id.in_([cb.checkout_request_id for cb in callbacks])
+            )
+        }
+        
+        now = datetime.utcnow()
+        changed_payment_ids = []
+        for callback in callbacks:
+            payment = payments.get(callback.checkout_request_id)
+            if payment is None:
+                if now - callback.received_at < grace:
+                    continue
+                callback.outcome = 'unmatched'
+            elif payment.status != 'pending':
+                callback.outcome = 'duplicate'
+            else:
+                _apply_result(payment, callback)
+                callback.outcome = 'applied'
+                changed_payment_ids.append(payment.id)
+            callback.processed_at = now
+            processed += 1
+        
+        db.session.commit()
+        for payment_id in changed_payment_ids:
+            payment_events.notify(payment_id)
+    return processed
+
+def _apply_result(payment, callback):
+    stk_callback = callback.payload['Body']['stkCallback']
+    payment.result_description = stk_callback.get('ResultDesc')
+    if callback.result_code == 0:
+        # Payment successful
+        payment.status = 'completed'
+        payment.booking.status = 'confirmed'
+        payment.booking.payment_status = 'paid'
+    else:
+        # Payment failed
+        payment.status = 'failed'
+        payment.booking.status = 'pending'
+        payment.booking.payment_status = 'pending'
@@ -0,0 +1,245 @@
+import copy
+import datetime
+import hashlib
+import json
+import re
+from flask import Response, current_app, jsonify, request
+
+# flasgger builds the spec by parsing the YAML in every route's docstring,
+# which is too slow to repeat in each worker. `flask build-openapi` does it
+# once and writes OPENAPI_SPEC_PATH; the app serves that file as it is.
+
+def swagger_config():
+    """flasgger's settings; a fresh dict each time, flasgger fills it in."""
+    return {
+        "headers": [],
+        "specs": [
+            {
+                "endpoint": 'apispec',
+                "route": '/apispec.json',
+                "rule_filter": lambda rule: True,  # all in
+                "model_filter": lambda tag: True,  # all in
+            }
+        ],
+        "static_url_path": "/flasgger_static",
+        "swagger_ui": True,
+        "specs_route": "/docs"
+    }
+
+SWAGGER_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "Spacer API",
+        "description": "API for managing space bookings",
+        "version": "1.0.0"
+    },
+    "securityDefinitions": {
+        "BearerAuth": {
+            "type": "apiKey",
+            "name": "Authorization",
+            "in": "header"
+        }
+    },
+    "components": {
+        "schemas": {
+            "User": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "example": 1},
+                    "email": {"type": "string", "example": "user@example.com"},
+                    "first_name": {"type": "string", "example": "John"},
+                    "last_name": {"type": "string", "example": "Doe"},
+                    "name": {"type": "string", "example": "John Doe"},
+                    "role": {"type": "string", "enum": ["admin", "owner", "client"], "example": "client"},
+                    "phone": {"type": "string", "example": "254712345678"},
+                    "bio": {"type": "string", "example": "Software developer"},
+                    "avatar_url": {"type": "string", "example": "https://example.com/avatar.jpg"},
+                    "is_verified": {"type": "boolean", "example": True},
+                    "created_at": {"type": "string", "format": "date-time"},
+                    "updated_at": {"type": "string", "format": "date-time"}
+                }
+            },
+            "Space": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "example": 1},
+                    "name": {"type": "string", "example": "Conference Room"},
+                    "description": {"type": "string", "example": "Spacious room for meetings"},
+                    "address": {"type": "string", "example": "123 Main St"},
+                    "city": {"type": "string", "example": "Nairobi"},
+                    "price_per_hour": {"type": "number", "example": 100.0},
+                    "capacity": {"type": "integer", "example": 20},
+                    "is_available": {"type": "boolean", "example": True},
+                    "owner_id": {"type": "integer", "example": 1},
+                    "images": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "integer", "example": 1},
+                                "image_url": {"type": "string", "example": "https://example.com/space.jpg"},
+                                "thumbnail_url": {"type": "string", "example": "https://example.com/space-thumb.jpg"},
+                                "variants": {
+                                    "type": "object",
+                                    "description": "URLs per size (thumbnail, card, full) and format (jpeg, webp)",
+                                    "example": {"thumbnail": {"jpeg": "https://example.com/t.jpg", "webp": "https://example.com/t.webp"}}
+                                },
+                                "placeholder": {"type": "string", "description": "BlurHash to render while the image loads", "example": "LQH-cB_3Xn-q~BozOsso9FNHXTM_"},
+                                "status": {"type": "string", "enum": ["processing", "ready", "failed"], "example": "ready"},
+                                "processing_error": {"type": "string", "nullable": True},
+                                "is_primary": {"type": "boolean", "example": True}
+                            }
+                        }
+                    },
+                    "created_at": {"type": "string", "format": "date-time"},
+                    "updated_at": {"type": "string", "format": "date-time"}
+                }
+            },
+            "Booking": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "example": 1},
+                    "space_id": {"type": "integer", "example": 1},
+                    "user_id": {"type": "integer", "example": 1},
+                    "start_time": {"type": "string", "format": "date-time"},
+                    "end_time": {"type": "string", "format": "date-time"},
+                    "total_price": {"type": "number", "example": 200.0},
+                    "purpose": {"type": "string", "example": "Team meeting"},
+                    "status": {"type": "string", "enum": ["pending", "confirmed", "cancelled", "completed"], "example": "pending"},
+                    "payment_status": {"type": "string", "enum": ["pending", "paid", "refunded"], "example": "pending"},
+                    "created_at": {"type": "string", "format": "date-time"},
+                    "updated_at": {"type": "string", "format": "date-time"}
+                }
+            },
+            "Payment": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "example": 1},
+                    "booking_id": {"type": "integer", "example": 1},
+                    "amount": {"type": "number", "example": 200.0},
+                    "payment_method": {"type": "string", "enum": ["mpesa", "card", "cash"], "example": "mpesa"},
+                    "transaction_id": {"type": "string", "example": "MPESA123456789"},
+                    "status": {"type": "string", "enum": ["pending", "completed", "failed", "refunded"], "example": "completed"},
+                    "created_at": {"type": "string", "format": "date-time"},
+                    "updated_at": {"type": "string", "format": "date-time"}
+                }
+            }
+        }
+    }
+}
+
+# Settings that leave blueprints out. The saved spec is built with all of
+# them in, so it doesn't depend on where it is built or checked; apps
+# without some of the routes serve only the operations they have.
+EVERY_ROUTE_CONFIG = {
+    'METRICS_ENABLED': True,
+    'PROFILING_ENABLED': True,
+    'IMAGE_STORAGE_BACKEND': 'local',
+    'SEED_TESTIMONIALS_ON_STARTUP': False
+}
+
+def build_spec(app):
+    """The spec as flasgger builds it from the route docstrings of ``app``, with every optional blueprint."""
+    from flasgger import Swagger
+    from app import create_app
+    app = create_app(type('SpecConfig', (), {**app.config, **EVERY_ROUTE_CONFIG}))
+    # Not registered on the app, so building adds no routes and caches nothing there
+    swag = Swagger(config=swagger_config(), template=copy.deepcopy(SWAGGER_TEMPLATE))
+    swag.app = app
+    with app.test_request_context():
+        spec = swag.get_apispecs('apispec')
+    # Through JSON, so it compares equal to a spec read back from the file. YAML
+    # reads unquoted example timestamps as datetimes; they are written as written
+    return json.loads(json.dumps(spec, default=_isoformat))
+
+def _isoformat(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} in the API spec is not JSON serializable')
+
+def dump_spec(spec):
+    """The file contents for ``spec``: sorted keys, so rebuilding without changes gives the same bytes."""
+    return (json.dumps(spec, indent=2, sort_keys=True) + '\n').encode('utf-8')
+
+def diff_spec(built, saved):
+    """What differs between a freshly built spec and the saved one, one line per operation."""
+    problems = []
+    built_paths, saved_paths = built.get('paths', {}), saved.get('paths', {})
+    for path in sorted(set(built_paths) | set(saved_paths)):
+        built_ops, saved_ops = built_paths.get(path, {}), saved_paths.get(path, {})
+        for method in sorted(set(built_ops) | set(saved_ops)):
+            operation = f'{method.upper()} {path}'
+            if method not in saved_ops:
+                problems.append(f'missing: {operation}')
+            elif method not in built_ops:
+                problems.append(f'no longer a route: {operation}')
+            elif built_ops[method] != saved_ops[method]:
+                problems.append(f'docstring changed: {operation}')
+    for key in sorted(set(built) | set(saved)):
+        if key != 'paths' and built.get(key) != saved.get(key):
+            problems.append(f'changed: {key}')
+    return problems
+
+def route_operations(app):
+    """``{(path, method)}`` for every route of ``app``, with paths written as in the spec."""
+    operations = set()
+    for rule in app.url_map.iter_rules():
+        path = re.sub(r'<(?:[^<>:]+:)?([^<>]+)>', r'{\1}', rule.rule)
+        operations.update((path, method.lower()) for method in rule.methods)
+    return operations
+
+def load_spec(path, app=None):
+    """``(body, etag)`` for the saved spec, or None if it hasn't been built.
+    
+    With ``app``, operations it has no route for (its optional blueprints
+    are off) are left out.
+    """
+    try:
+        with open(path, 'rb') as f:
+            body = f.read()
+    except FileNotFoundError:
+        return None
+    if app is not None:
+        spec = json.loads(body)
+        operations = route_operations(app)
+        paths = {}
+        for spec_path, methods in spec['paths'].items():
+            kept = {method: operation for method, operation in methods.items() if (spec_path, method) in operations}
+            if kept:
+                paths[spec_path] = kept
+        if paths != spec['paths']:
+            body = dump_spec({**spec, 'paths': paths})
+    return body, hashlib.sha1(body).hexdigest()
+
+def serve_spec():
+    """The prebuilt spec, with an ETag."""
+    spec = current_app.extensions['openapi_spec']
+    if spec is None:
+        return jsonify({'error': 'API spec has not been built; run `flask build-openapi`'}), 404
+    body, etag = spec
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['OPENAPI_CACHE_MAX_AGE']
+    return response.make_conditional(request)
+
+def init_openapi(app):
+    """Serve /apispec.json from OPENAPI_SPEC_PATH and, if SWAGGER_UI_ENABLED, the Swagger UI at /docs.
+    
+    Call it after the blueprints are registered: the file is read once
+    here and trimmed to the app's routes, so with a preloading server the
+    workers share it. With the UI off flasgger is not even imported. If the file
+    is missing, or in debug mode so docstring edits show up straight
+    away, the UI's spec is built by flasgger as before.
+    """
+    spec = app.extensions['openapi_spec'] = load_spec(app.config['OPENAPI_SPEC_PATH'], app)
+    if not app.config['SWAGGER_UI_ENABLED']:
+        if spec is None:
+            app.logger.warning(f"{app.config['OPENAPI_SPEC_PATH']} not found; run `flask build-openapi` to serve /apispec.json")
+        app.add_url_rule('/apispec.json', 'apispec', serve_spec)
+        return
+    
+    from flasgger import Swagger
+    Swagger(app, config=swagger_config(), template=copy.deepcopy(SWAGGER_TEMPLATE))
+    if spec is not None and not app.debug:
+        app.view_functions['flasgger.apispec'] = serve_spec
@@ -0,0 +1,35 @@
+import threading
+from collections import OrderedDict
+
+class PaymentEvents:
+    """In-process wake-ups for clients long-polling a payment's status.
+
+    Every state change bumps a per-payment version and wakes waiters. Only
+    waiters in the same process are woken, so callers should still re-read the
+    database on a short interval to pick up changes made by other workers.
+    """
+
+    def __init__(self, max_tracked=10000):
+        self._condition = threading.Condition()
+        self._versions = OrderedDict()
+        self._max_tracked = max_tracked
+    
+    def version(self, payment_id):
+        with self._condition:
+            return self._versions.get(payment_id, 0)
+    
+    def notify(self, payment_id):
+        with self._condition:
+            self._versions[payment_id] = self._versions.pop(payment_id, 0) + 1
+            while len(self._versions) > self._max_tracked:
+                self._versions.popitem(last=False)
+            self._condition.notify_all()
+    
+    def wait(self, payment_id, since_version, timeout):
+        """Block until ``payment_id`` changes after ``since_version`` or ``timeout`` elapses."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._versions.get(payment_id, 0) != since_version, timeout
+            )
+
+payment_events = PaymentEvents()
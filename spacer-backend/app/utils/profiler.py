@@ -0,0 +1,130 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_ARG = '_profile'
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread.
+    
+    The profiled thread runs unmodified (no tracing hooks), so the cost is
+    the sampler thread waking up every ``interval`` seconds. The sampler
+    needs the GIL, so a CPU-bound request is sampled at most once per
+    ``sys.getswitchinterval()`` (5 ms by default).
+    """
+    
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []
+        self._frame_ids = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='spacer-profiler', daemon=True)
+    
+    def start(self):
+        self._started_at = time.perf_counter()
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started_at
+    
+    def _frame_id(self, code):
+        # co_qualname (Class.method) is Python 3.11+; older versions only have the bare name
+        key = (getattr(code, 'co_qualname', code.co_name), code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+        return frame_id
+    
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+    
+    def to_speedscope(self, name):
+        """The samples as a speedscope (https://www.speedscope.app) document."""
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'spacer',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(self.weights),
+                'samples': self.samples,
+                'weights': self.weights
+            }]
+        }
+
+def profile_path(profile_id):
+    return os.path.join(current_app.config['PROFILE_DIR'], f'{profile_id}.speedscope.json')
+
+def _profiling_requested():
+    return request.headers.get(PROFILE_HEADER) == '1' or request.args.get(PROFILE_QUERY_ARG) == '1'
+
+def _is_admin():
+    from app.models.user import User
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return False
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id) if user_id else None
+    return user is not None and user.role == 'admin'
+
+def init_profiling(app):
+    """Profile single requests on demand: admins send ``X-Profile: 1`` or ``?_profile=1``.
+    
+    The profile is written to PROFILE_DIR and its id returned in the
+    ``X-Profile-Id`` header. Requests without the flag only pay for one
+    header and query string lookup.
+    """
+    if not app.config['PROFILING_ENABLED']:
+        return
+    
+    @app.before_request
+    def start_profiler():
+        if not _profiling_requested() or not _is_admin():
+            return
+        profiler = SamplingProfiler(threading.get_ident(), app.config['PROFILE_SAMPLE_INTERVAL'])
+        profiler.start()
+        g.profiler = profiler
+    
+    @app.after_request
+    def save_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        profile_id = uuid.uuid4().hex
+        name = f'{request.method} {request.full_path.rstrip("?")} ({profiler.duration * 1000:.1f} ms)'
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        with open(profile_path(profile_id), 'w') as f:
+            json.dump(profiler.to_speedscope(name), f)
+        response.headers['X-Profile-Id'] = profile_id
+        return response
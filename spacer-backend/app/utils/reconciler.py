@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.booking import Booking, Payment
+from app.utils.mpesa import get_mpesa_api
+from app.utils.payment_events import payment_events
+
+NEVER_SENT_DESCRIPTION = 'STK push was never sent'
+
+def reconcile_pending_payments(older_than_minutes=None, limit=None, max_workers=None, dry_run=False):
+    """Settle M-Pesa payments that are still pending because no callback arrived.
+
+    Stale pending payments are selected through ix_payments_status_created_at,
+    queried against the STK query API through a bounded pool, and the results
+    are written back with one UPDATE per outcome. Returns a report of what
+    changed (or would change, with ``dry_run``).
+    """
+    config = current_app.config
+    older_than_minutes = older_than_minutes or config['RECONCILE_PENDING_AFTER_MINUTES']
+    limit = limit or config['RECONCILE_BATCH_SIZE']
+    max_workers = max_workers or config['RECONCILE_MAX_WORKERS']
+    cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+    
+    stale = db.session.query(Payment.id, Payment.booking_id, Payment.transaction_id).filter(
+        Payment.status == 'pending',
+        Payment.created_at < cutoff,
+        Payment.payment_method == 'mpesa'
+    ).order_by(Payment.created_at).limit(limit).all()
+    # Don't hold a connection open while we wait on Safaricom
+    db.session.rollback()
+    
+    report = {
+        'checked': len(stale),
+        'dry_run': dry_run,
+        'completed': [],
+        'failed': [],
+        'still_pending': [],
+        'errors': []
+    }
+    
+    to_query = []
+    for row in stale:
+        if row.transaction_id:
+            to_query.append(row)
+        else:
+            report['failed'].append(_entry(row, NEVER_SENT_DESCRIPTION))
+    
+    if to_query:
+        app = current_app._get_current_object()
+        mpesa = get_mpesa_api()
+        
+        def query(row):
+            with app.app_context():
+                try:
+                    return row, mpesa.query_stk_status(row.transaction_id), None
+                except Exception as e:
+                    return row, None, str(e)
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(to_query)),
+                                thread_name_prefix='spacer-reconcile') as pool:
+            for row, outcome, error in pool.map(query, to_query):
+                if error:
+                    report['errors'].append(_entry(row, error))
+                    continue
+                state, description = outcome
+                key = 'still_pending' if state == 'pending' else state
+                report[key].append(_entry(row, description))
+    
+    if not dry_run:
+        _apply(report, cutoff)
+    return report
+
+def _entry(row, description):
+    return {
+        'payment_id': row.id,
+        'booking_id': row.booking_id,
+        'transaction_id': row.transaction_id,
+        'result_description': description
+    }
+
+def _claim(payment_ids, *criteria):
+    """Lock the payments among ``payment_ids`` that are still pending; returns ``{payment_id: booking_id}``.
+
+    A cancellation or callback may have settled a payment while its STK
+    query was running. Only the rows returned here are changed, and the
+    lock stops them being settled again before this run commits.
+    """
+    rows = db.session.query(Payment.id, Payment.booking_id).filter(
+        Payment.id.in_(payment_ids),
+        Payment.status == 'pending',
+        *criteria
+    ).with_for_update().all()
+    return dict(rows)
+
+def _apply(report, cutoff):
+    changed_payment_ids = []
+    
+    completed = _claim([entry['payment_id'] for entry in report['completed']])
+    if completed:
+        Payment.query.filter(Payment.id.in_(completed)).update(
+            {Payment.status: 'completed', Payment.result_description: 'Reconciled: paid'},
+            synchronize_session=False
+        )
+        Booking.query.filter(Booking.id.in_(completed.values()), Booking.status == 'pending').update(
+            {Booking.status: 'confirmed', Booking.payment_status: 'paid'},
+            synchronize_session=False
+        )
+        changed_payment_ids.extend(completed)
+    
+    # Failure descriptions vary, so group them to keep one UPDATE per description
+    failed_by_description = {}
+    for entry in report['failed']:
+        failed_by_description.setdefault(entry['result_description'], []).append(entry['payment_id'])
+    for description, payment_ids in failed_by_description.items():
+        criteria = ()
+        if description == NEVER_SENT_DESCRIPTION:
+            # Unless the push was sent, or the payment retried, since it was selected
+            criteria = (Payment.transaction_id.is_(None), Payment.updated_at < cutoff)
+        failed = _claim(payment_ids, *criteria)
+        if not failed:
+            continue
+        Payment.query.filter(Payment.id.in_(failed)).update(
+            {Payment.status: 'failed', Payment.result_description: (description or '')[:255]},
+            synchronize_session=False
+        )
+        changed_payment_ids.extend(failed)
+    
+    db.session.commit()
+    for payment_id in changed_payment_ids:
+        payment_events.notify(payment_id)
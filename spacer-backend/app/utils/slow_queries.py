@@ -0,0 +1,176 @@
+import datetime
+import decimal
+import glob
+import json
+import logging
+import os
+import random
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from app.utils import tasks
+from app.utils.sql_instrumentation import fingerprint, listen_for_queries
+
+logger = logging.getLogger('spacer.slow_queries')
+
+def redact(value):
+    """Keep the shape of a bind parameter but never its text."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (decimal.Decimal, datetime.date, datetime.time)):
+        return str(value)
+    if isinstance(value, str):
+        return f'<str len={len(value)}>'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<bytes len={len(value)}>'
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    return f'<{type(value).__name__}>'
+
+class SlowQueryRecorder:
+    """Writes statements slower than ``threshold`` seconds to the slow query log.
+    
+    A ``explain_rate`` fraction of slow SELECTs also gets its plan captured.
+    That runs on the background pool, on a connection of its own, so the
+    request that was already slow doesn't wait for it; the entry is written
+    once the plan is in. On PostgreSQL the plan comes from EXPLAIN ANALYZE
+    only when the database is a hot standby, since ANALYZE runs the query
+    again; the primary gets a plain EXPLAIN.
+    """
+    
+    def __init__(self, threshold, explain_rate):
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+    
+    def record(self, conn, statement, parameters, executemany, duration):
+        entry = {
+            'at': datetime.datetime.utcnow().isoformat(),
+            'duration_ms': round(duration * 1000, 2),
+            'route': f'{request.method} {request.endpoint}' if has_request_context() else 'background',
+            'fingerprint': fingerprint(statement),
+            'parameters': None if executemany else redact(parameters)
+        }
+        is_select = statement.lstrip().upper().startswith(('SELECT', 'WITH'))
+        if is_select and not executemany and random.random() < self.explain_rate:
+            tasks.submit(self._log_with_plan, conn.engine, entry, statement, parameters)
+        else:
+            _log(entry)
+    
+    def _log_with_plan(self, engine, entry, statement, parameters):
+        entry['plan'] = self._explain(engine, statement, parameters)
+        _log(entry)
+    
+    def _explain(self, engine, statement, parameters):
+        try:
+            with engine.connect() as conn:
+                # The DBAPI cursor bypasses the engine's hooks, so EXPLAIN
+                # ANALYZE of a slow query is not itself logged as slow
+                cursor = conn.connection.dbapi_connection.cursor()
+                try:
+                    if engine.dialect.name == 'sqlite':
+                        cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                        return [row[-1] for row in cursor.fetchall()]
+                    if engine.dialect.name != 'postgresql':
+                        return None
+                    if 'is_replica' not in conn.info:
+                        cursor.execute('SELECT pg_is_in_recovery()')
+                        conn.info['is_replica'] = cursor.fetchone()[0]
+                    options = 'ANALYZE, BUFFERS' if conn.info['is_replica'] else 'COSTS'
+                    cursor.execute(f'EXPLAIN ({options}) {statement}', parameters)
+                    return [row[0] for row in cursor.fetchall()]
+                finally:
+                    # Returning the connection to the pool rolls back whatever ANALYZE ran
+                    cursor.close()
+        except Exception as e:
+            return f'EXPLAIN failed: {e}'
+
+def _log(entry):
+    logger.warning(json.dumps(entry, default=str))
+
+class ProcessRotatingFileHandler(RotatingFileHandler):
+    """A RotatingFileHandler on ``<path>.<pid>``.
+    
+    Processes sharing one rotating file lose and mangle entries when one of
+    them rotates it under the others, so every process (including each
+    forked worker, which switches on its first entry) gets its own file.
+    """
+    
+    def __init__(self, path, **kwargs):
+        self.path = os.path.abspath(path)
+        self.pid = os.getpid()
+        super().__init__(f'{self.path}.{self.pid}', delay=True, **kwargs)
+    
+    def emit(self, record):
+        if self.pid != os.getpid():
+            self.acquire()
+            try:
+                if self.pid != os.getpid():
+                    if self.stream:
+                        self.stream.close()
+                        self.stream = None
+                    self.pid = os.getpid()
+                    self.baseFilename = f'{self.path}.{self.pid}'
+            finally:
+                self.release()
+        super().emit(record)
+
+def init_slow_query_log(app):
+    """Record statements slower than SLOW_QUERY_THRESHOLD_MS to rotating JSON-lines files, one per process."""
+    if not app.config['SLOW_QUERY_THRESHOLD_MS']:
+        return
+    
+    path = os.path.abspath(app.config['SLOW_QUERY_LOG'])
+    if not any(getattr(handler, 'path', None) == path for handler in logger.handlers):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = ProcessRotatingFileHandler(
+            path,
+            maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+            backupCount=app.config['SLOW_QUERY_LOG_BACKUPS']
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    
+    # Slow statements are timed by the SQL instrumentation hooks
+    listen_for_queries()
+    app.extensions['slow_queries'] = SlowQueryRecorder(
+        app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000,
+        app.config['SLOW_QUERY_EXPLAIN_RATE']
+    )
+
+def summarize(path, top=20):
+    """Group the entries of a slow query log (every process's file and their rotations) by statement shape.
+    
+    Returns the ``top`` shapes by total time, worst first.
+    """
+    shapes = {}
+    for log_path in sorted(glob.glob(f'{path}.*')) + [path]:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                shape = shapes.setdefault(entry['fingerprint'], {
+                    'fingerprint': entry['fingerprint'],
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'routes': {},
+                    'plan': None
+                })
+                shape['count'] += 1
+                shape['total_ms'] += entry['duration_ms']
+                shape['max_ms'] = max(shape['max_ms'], entry['duration_ms'])
+                shape['routes'][entry['route']] = shape['routes'].get(entry['route'], 0) + 1
+                if entry.get('plan'):
+                    shape['plan'] = entry['plan']
+    
+    worst = sorted(shapes.values(), key=lambda shape: shape['total_ms'], reverse=True)[:top]
+    for shape in worst:
+        shape['total_ms'] = round(shape['total_ms'], 2)
+        shape['mean_ms'] = round(shape['total_ms'] / shape['count'], 2)
+    return worst
@@ -0,0 +1,25 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+def insert_ignore(model, values, index_elements):
+    """INSERT a row unless one with the same key exists; returns True if inserted.
+
+    Uses ON CONFLICT DO NOTHING where the dialect supports it, so concurrent
+    duplicates cost one statement and never abort the surrounding
+    transaction. Other databases fall back to a savepoint.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(model.__table__).values(**values).on_conflict_do_nothing(
+            index_elements=index_elements
+        )
+        return db.session.execute(statement).rowcount == 1
+    
+    try:
+        with db.session.begin_nested():
+            db.session.add(model(**values))
+        return True
+    except IntegrityError:
+        return False
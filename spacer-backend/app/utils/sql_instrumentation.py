@@ -0,0 +1,126 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_IN_LIST = re.compile(r'\(\s*(?:\?|%\([^)]+\)s|:\w+)(?:\s*,\s*(?:\?|%\([^)]+\)s|:\w+))*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(statement):
+    """The shape of a statement: whitespace collapsed, IN lists and numbers folded."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _IN_LIST.sub('(?)', statement)
+    return _NUMBER.sub('N', statement)
+
+class QueryStats:
+    """Queries run in one request (or one ``query_budget`` block)."""
+    
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+    
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[fingerprint(statement)] += 1
+    
+    def repeated(self, threshold):
+        """Statement shapes that ran more than ``threshold`` times, most frequent first."""
+        return [(shape, count) for shape, count in self.statements.most_common() if count > threshold]
+
+# query_budget blocks active on this thread
+_collectors = threading.local()
+_listen_lock = threading.Lock()
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started_at'] = time.perf_counter()
+
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started_at', None)
+    if started is None:
+        # Started before the hooks were attached
+        return
+    duration = time.perf_counter() - started
+    for stats in getattr(_collectors, 'active', ()):
+        stats.record(statement, duration)
+    # Pool threads run in their own app context, without a request
+    if has_request_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.record(statement, duration)
+    if has_app_context():
+        recorder = current_app.extensions.get('slow_queries')
+        if recorder is not None and duration >= recorder.threshold:
+            recorder.record(conn, statement, parameters, executemany, duration)
+
+def listen_for_queries():
+    """Attach the timing hooks to every engine, once per process.
+    
+    Only called when something uses them (per-request stats, the slow
+    query log or a ``query_budget`` block), so with all of those off
+    queries run without any hook.
+    """
+    with _listen_lock:
+        if not event.contains(Engine, 'after_cursor_execute', _record_query):
+            event.listen(Engine, 'before_cursor_execute', _start_query_timer)
+            event.listen(Engine, 'after_cursor_execute', _record_query)
+
+@contextmanager
+def query_budget(max_queries=None):
+    """Count the queries run in the block on this thread.
+    
+    With ``max_queries``, fail the block with an AssertionError listing
+    the statements if more ran, e.g. in a test::
+        
+        with query_budget(3):
+            client.get('/api/home')
+    
+    Yields the ``QueryStats`` so callers can make their own assertions.
+    """
+    listen_for_queries()
+    stats = QueryStats()
+    active = getattr(_collectors, 'active', None)
+    if active is None:
+        active = _collectors.active = []
+    active.append(stats)
+    try:
+        yield stats
+    finally:
+        active.remove(stats)
+    if max_queries is not None and stats.count > max_queries:
+        shapes = '\n'.join(f'  {count}x {shape}' for shape, count in stats.statements.most_common())
+        raise AssertionError(f'{stats.count} queries ran, the budget is {max_queries}:\n{shapes}')
+
+def init_sql_instrumentation(app):
+    """Record per-request query counts and time, report them in Server-Timing and warn about N+1s."""
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+    listen_for_queries()
+    
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = QueryStats()
+        g.request_started_at = time.perf_counter()
+    
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        total = (time.perf_counter() - g.pop('request_started_at')) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}, app;dur={total:.2f}'
+        )
+        threshold = current_app.config['SQL_REPEATED_STATEMENT_THRESHOLD']
+        for shape, count in stats.repeated(threshold):
+            current_app.logger.warning(
+                f"Possible N+1 in {request.method} {request.endpoint}: {count} x {shape[:300]}"
+            )
+        return response
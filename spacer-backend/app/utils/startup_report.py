@@ -0,0 +1,95 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)\s*$')
+
+# Runs in a fresh interpreter, the way a new worker starts
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().open(sys.argv[2], method=sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - started) * 1000,
+    'status': response.status_code,
+}))
+'''
+
+def _run_probe(project_dir, method, path, importtime=False):
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', _PROBE, method, path]
+    result = subprocess.run(command, cwd=project_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'Startup probe failed:\n{result.stderr[-2000:]}')
+    # The app may print on startup; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def parse_importtime(output):
+    """``python -X importtime`` output as a list of imports, each linked to the module that imported it."""
+    entries = []
+    pending = []
+    for line in output.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        entry = {
+            'module': match.group(4),
+            'self_us': int(match.group(1)),
+            'cumulative_us': int(match.group(2)),
+            'depth': len(match.group(3)) // 2,
+            'parent': None
+        }
+        # A module is listed after everything it imported, which sits one level deeper
+        while pending and pending[-1]['depth'] > entry['depth']:
+            pending.pop()['parent'] = entry
+        pending.append(entry)
+        entries.append(entry)
+    return entries
+
+def imports_by_package(entries):
+    """Import time per top-level package, heaviest first, with the app module that first pulled it in."""
+    packages = {}
+    for entry in entries:
+        name = entry['module'].split('.')[0]
+        package = packages.get(name)
+        if package is None:
+            via = entry['parent']
+            while via is not None and via['module'].split('.')[0] not in ('app', 'config'):
+                via = via['parent']
+            package = packages[name] = {
+                'package': name,
+                'self_ms': 0.0,
+                'modules': 0,
+                'imported_by': via['module'] if via is not None and name not in ('app', 'config') else None
+            }
+        package['self_ms'] += entry['self_us'] / 1000
+        package['modules'] += 1
+    return sorted(packages.values(), key=lambda package: package['self_ms'], reverse=True)
+
+def startup_report(project_dir, method='GET', path='/api/spaces', runs=3):
+    """Time cold starts of the app in fresh interpreters.
+    
+    Phase timings are the median of ``runs`` plain starts; the per-package
+    breakdown comes from one more start under ``-X importtime``, which
+    slows imports down, so only compare its numbers with each other.
+    """
+    samples = [_run_probe(project_dir, method, path)[0] for _ in range(runs)]
+    _, importtime_output = _run_probe(project_dir, method, path, importtime=True)
+    phases = {
+        key: statistics.median(sample[key] for sample in samples)
+        for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+    }
+    return {
+        'phases': phases,
+        'status': samples[-1]['status'],
+        'packages': imports_by_package(parse_importtime(importtime_output))
+    }
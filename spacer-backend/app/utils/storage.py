@@ -0,0 +1,216 @@
+import io
+import os
+import re
+import tempfile
+import uuid
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer
+from app.utils.metrics import metrics
+from app.utils.cloudinary import upload_resized_image, delete_image, signed_upload_params, get_image_info, delivery_url
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'webp': 'image/webp'
+}
+
+# Formats an original upload keeps as its key's extension; anything else is
+# stored without one and the backend works out the format
+RAW_UPLOAD_EXTENSIONS = ('jpg', 'png', 'webp', 'gif', 'bmp', 'tiff', 'heic', 'heif', 'avif')
+RAW_UPLOAD_EXTENSION_ALIASES = {'jpeg': 'jpg', 'tif': 'tiff'}
+
+CLOUDINARY_URL_PATTERN = re.compile(r'^https?://res\.cloudinary\.com/[^/]+/image/upload/(?:v\d+/)?(.+)$')
+
+class StorageBackend:
+    """Where processed images live. Keys are relative paths such as
+    ``spacer/ab/<sha256>/card.webp``; backends map them to public URLs."""
+    
+    name = None
+    
+    def save(self, key, data):
+        """Store ``data`` under ``key`` and return its public URL."""
+        raise NotImplementedError
+    
+    def delete(self, key):
+        """Remove ``key``; returns True if something was deleted, False if it
+        was already gone. Raises if the object could not be deleted."""
+        raise NotImplementedError
+    
+    def read(self, key):
+        """Return the bytes stored under ``key``."""
+        raise NotImplementedError
+    
+    def key_for_url(self, url):
+        """Map a public URL back to its key, or None if it isn't one of ours."""
+        raise NotImplementedError
+    
+    def stat(self, key):
+        """Return ``{'url', 'size'}`` for a stored object, or None if it is missing."""
+        raise NotImplementedError
+    
+    def create_upload_target(self, key, max_bytes, expires_in):
+        """Describe how a client can upload ``key`` directly, without going through the API.
+        
+        Returns ``{'method', 'url', 'fields', 'headers'}``; the file goes in
+        the ``file`` form field for POST targets and as the body for PUT.
+        """
+        raise NotImplementedError
+
+class CloudinaryStorage(StorageBackend):
+    """Assets on Cloudinary, one public_id per key.
+    
+    Cloudinary keeps the format outside the public_id, so the key's
+    extension is folded into the id (``…/full.webp`` -> ``…/full-webp``):
+    otherwise both formats of a size would share, and overwrite, one asset.
+    Keys without an extension map to the same public_id.
+    """
+    
+    name = 'cloudinary'
+    
+    @staticmethod
+    def public_id(key):
+        """``(public_id, format)`` for a key; format is None without an extension."""
+        root, extension = os.path.splitext(key)
+        extension = extension.lstrip('.')
+        return (f'{root}-{extension}', extension) if extension else (root, None)
+    
+    def save(self, key, data):
+        public_id, image_format = self.public_id(key)
+        return upload_resized_image(
+            io.BytesIO(data),
+            folder=None,
+            # Without an extension Cloudinary detects the format
+            image_format=image_format,
+            public_id=public_id
+        )
+    
+    def delete(self, key):
+        return delete_image(self.public_id(key)[0])
+    
+    def read(self, key):
+        # The delivery URL is derived from the key: stat() would go through
+        # the Admin API, which is rate limited per hour
+        import requests
+        with metrics.time_outbound('cloudinary'):
+            response = requests.get(delivery_url(*self.public_id(key)), timeout=30)
+        if response.status_code == 404:
+            raise FileNotFoundError(key)
+        response.raise_for_status()
+        return response.content
+    
+    def key_for_url(self, url):
+        # https://res.cloudinary.com/<cloud>/image/upload/v<version>/<public_id>.<ext>
+        match = CLOUDINARY_URL_PATTERN.match(url or '')
+        if not match:
+            return None
+        root, extension = os.path.splitext(match.group(1))
+        suffix = f"-{extension.lstrip('.')}"
+        if extension and root.endswith(suffix):
+            return root[:-len(suffix)] + extension
+        # Uploaded before the format was part of the public_id: the key
+        # without an extension maps to the asset's own id
+        return root
+    
+    def stat(self, key):
+        return get_image_info(self.public_id(key)[0])
+    
+    def create_upload_target(self, key, max_bytes, expires_in):
+        # Cloudinary enforces its own expiry (one hour) and size limits;
+        # finalize re-checks the size
+        upload_url, fields = signed_upload_params(self.public_id(key)[0])
+        return {'method': 'POST', 'url': upload_url, 'fields': fields, 'headers': {}}
+
+class LocalStorage(StorageBackend):
+    """Files under ``root``, served by the media blueprint at ``base_url``."""
+    
+    name = 'local'
+    
+    def __init__(self, root, base_url):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+    
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'Invalid storage key: {key}')
+        return path
+    
+    def url(self, key):
+        return f'{self.base_url}/{key}'
+    
+    def save(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return self.url(key)
+    
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def read(self, key):
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+    
+    def key_for_url(self, url):
+        prefix = self.base_url + '/'
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+    
+    def stat(self, key):
+        try:
+            return {'url': self.url(key), 'size': os.path.getsize(self.path(key))}
+        except FileNotFoundError:
+            return None
+    
+    def create_upload_target(self, key, max_bytes, expires_in):
+        # Stand-in for a cloud provider's signed URL, handled by the media blueprint
+        token = upload_serializer('local-upload').dumps({'key': key, 'max_bytes': max_bytes})
+        return {
+            'method': 'PUT',
+            'url': f'{self.base_url}/uploads/{token}',
+            'fields': {},
+            'headers': {'Content-Type': 'application/octet-stream'}
+        }
+
+def create_storage(config):
+    backend = config['IMAGE_STORAGE_BACKEND']
+    if backend == 'cloudinary':
+        return CloudinaryStorage()
+    if backend == 'local':
+        return LocalStorage(
+            config['IMAGE_STORAGE_LOCAL_ROOT'],
+            config['IMAGE_STORAGE_LOCAL_URL'] or f"{config['BACKEND_URL']}/media"
+        )
+    raise ValueError(f'Unknown IMAGE_STORAGE_BACKEND: {backend}')
+
+def get_storage():
+    """Return the app's configured storage backend, creating it on first use."""
+    app = current_app._get_current_object()
+    storage = app.extensions.get('image_storage')
+    if storage is None:
+        storage = app.extensions.setdefault('image_storage', create_storage(app.config))
+    return storage
+
+def upload_serializer(salt):
+    """Signer for upload tokens; check expiry with ``loads(token, max_age=...)``."""
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=salt)
+
+def variant_key(folder, content_hash, name, image_format):
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return f'{folder}/{content_hash[:2]}/{content_hash}/{name}.{extension}'
+
+def raw_upload_key(space_id, extension=None):
+    """Key for an original, unprocessed space image upload."""
+    key = f'uploads/{space_id}/{uuid.uuid4().hex}'
+    return f'{key}.{extension}' if extension else key
+
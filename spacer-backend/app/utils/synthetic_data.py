@@ -0,0 +1,418 @@
+import csv
+import hashlib
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.user import User
+from app.models.space import Space, SpaceImage, SpaceAmenity, SpaceReview
+from app.models.booking import Booking, Payment
+
+# Password of every generated user
+SYNTHETIC_PASSWORD = 'synthetic123'
+
+SCALES = {
+    'small': {'users': 1_000, 'spaces': 500, 'bookings': 20_000},
+    'medium': {'users': 10_000, 'spaces': 5_000, 'bookings': 500_000},
+    'large': {'users': 100_000, 'spaces': 50_000, 'bookings': 5_000_000},
+}
+
+FIRST_NAMES = (
+    'Amina', 'Brian', 'Cynthia', 'David', 'Esther', 'Felix', 'Grace', 'Hassan', 'Irene', 'James',
+    'Kevin', 'Lucy', 'Mercy', 'Njeri', 'Otieno', 'Purity', 'Rashid', 'Sharon', 'Tom', 'Wanjiru'
+)
+LAST_NAMES = (
+    'Achieng', 'Barasa', 'Chege', 'Kamau', 'Kariuki', 'Kiprop', 'Mutua', 'Mwangi', 'Njoroge', 'Ochieng',
+    'Odhiambo', 'Omondi', 'Onyango', 'Otieno', 'Wafula', 'Wambui', 'Wanjala', 'Were'
+)
+# (city, share of spaces)
+CITIES = (('Nairobi', 50), ('Mombasa', 15), ('Kisumu', 10), ('Nakuru', 8), ('Eldoret', 7), ('Thika', 5), ('Malindi', 5))
+STREETS = ('Kenyatta Ave', 'Moi Ave', 'Ngong Rd', 'Waiyaki Way', 'Kimathi St', 'Mama Ngina St', 'Oginga Odinga St')
+SPACE_ADJECTIVES = ('Bright', 'Quiet', 'Modern', 'Cozy', 'Spacious', 'Rooftop', 'Garden', 'Industrial', 'Minimal')
+SPACE_TYPES = ('Meeting Room', 'Studio', 'Loft', 'Boardroom', 'Event Hall', 'Workshop', 'Office', 'Gallery')
+AMENITIES = (
+    'wifi', 'projector', 'whiteboard', 'parking', 'kitchen', 'air conditioning', 'sound system',
+    'tv screen', 'coffee', 'wheelchair access', 'backup power', 'security'
+)
+PURPOSES = ('Team meeting', 'Workshop', 'Photo shoot', 'Client pitch', 'Training', 'Birthday party', 'Interview')
+REVIEW_COMMENTS = {
+    1: 'Not as described.',
+    2: 'Noisy and the wifi kept dropping.',
+    3: 'Okay for the price.',
+    4: 'Good space, would book again.',
+    5: 'Perfect for our team, highly recommended!',
+}
+BOOKING_HOURS = (1, 1, 2, 2, 2, 3, 4, 8)
+BOOKINGS_PER_DAY = 2
+# A real BlurHash (a grey-blue room) so clients can decode it
+PLACEHOLDER = 'LEHV6nWB2yk8pyo0adR*.7kCMdnj'
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+def _zipf_counts(rng, total, capacities, exponent=0.8):
+    """Split ``total`` so a few buckets get a lot and most get a little, none more than its capacity."""
+    weights = [1 / (rank ** exponent) for rank in range(1, len(capacities) + 1)]
+    rng.shuffle(weights)
+    counts = [0] * len(capacities)
+    remaining = total
+    open_buckets = [i for i, capacity in enumerate(capacities) if capacity > 0]
+    while remaining and open_buckets:
+        scale = remaining / sum(weights[i] for i in open_buckets)
+        assigned = 0
+        for i in open_buckets:
+            share = min(int(weights[i] * scale), capacities[i] - counts[i])
+            counts[i] += share
+            assigned += share
+        if not assigned:
+            # What's left is smaller than one per bucket
+            for i in rng.sample(open_buckets, min(remaining, len(open_buckets))):
+                counts[i] += 1
+                assigned += 1
+        remaining -= assigned
+        open_buckets = [i for i in open_buckets if counts[i] < capacities[i]]
+    if remaining:
+        raise ValueError(f'{total} bookings is more than the spaces can hold; generate more spaces')
+    return counts
+
+def _business_hours(moment):
+    """The next half hour at or after ``moment`` when a booking may start (07:00 to 18:00)."""
+    moment = moment.replace(second=0, microsecond=0)
+    if moment.minute % 30:
+        moment += timedelta(minutes=30 - moment.minute % 30)
+    if moment.hour < 7:
+        return moment.replace(hour=7, minute=0)
+    if moment.hour >= 18 and moment.minute or moment.hour > 18:
+        return (moment + timedelta(days=1)).replace(hour=7, minute=0)
+    return moment
+
+class BulkWriter:
+    """Streams rows into one table, bypassing the ORM.
+    
+    PostgreSQL (psycopg2) gets ``COPY ... FROM STDIN`` in CSV form; other
+    databases get ``executemany``. Rows are tuples in ``columns`` order
+    holding Python values (datetimes, bools, dicts for JSON columns).
+    A writer with a ``parent`` flushes the parent first, so rows never
+    reach the database before the rows they reference.
+    """
+    
+    def __init__(self, connection, table, columns, batch_size, parent=None):
+        self.connection = connection
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+        self.parent = parent
+        self.dialect = connection.dialect.name
+        self.cursor = connection.connection.dbapi_connection.cursor()
+        self.use_copy = self.dialect == 'postgresql' and hasattr(self.cursor, 'copy_expert')
+        self.rows = []
+        self.count = 0
+    
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if not self.rows:
+            return
+        if self.parent is not None:
+            self.parent.flush()
+        column_list = ', '.join(self.columns)
+        if self.use_copy:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in self.rows:
+                writer.writerow([self._to_csv(value) for value in row])
+            buffer.seek(0)
+            self.cursor.copy_expert(f'COPY {self.table} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+        else:
+            marker = '?' if self.connection.dialect.paramstyle == 'qmark' else '%s'
+            placeholders = ', '.join([marker] * len(self.columns))
+            self.cursor.executemany(
+                f'INSERT INTO {self.table} ({column_list}) VALUES ({placeholders})',
+                [tuple(self._to_param(value) for value in row) for row in self.rows]
+            )
+        self.count += len(self.rows)
+        self.rows = []
+    
+    def close(self):
+        self.flush()
+        self.cursor.close()
+    
+    @staticmethod
+    def _to_csv(value):
+        if value is None:
+            return None  # an unquoted empty field, which COPY reads as NULL
+        if isinstance(value, datetime):
+            return value.isoformat(' ')
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+    
+    def _to_param(self, value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if self.dialect == 'sqlite':
+            if isinstance(value, datetime):
+                # The format SQLAlchemy's SQLite DateTime reads back
+                return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+            if isinstance(value, bool):
+                return int(value)
+        return value
+
+class SyntheticDataset:
+    """Deterministic, realistic-looking data for benchmarking.
+    
+    The same ``seed`` and ``as_of`` always give the same rows, apart from
+    the salt of the one password hash all users share. Every table draws
+    from its own random stream, so changing the number of bookings doesn't
+    change the users or spaces. Ids continue after the highest existing
+    id, so a dataset can be added to a database that already has data.
+    """
+    
+    def __init__(self, users, spaces, bookings, seed=0, as_of=None, batch_size=10_000):
+        self.users = users
+        self.spaces = spaces
+        self.bookings = bookings
+        self.seed = seed
+        self.as_of = as_of or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.batch_size = batch_size
+    
+    def _rng(self, table):
+        return random.Random(f'{self.seed}-{table}')
+    
+    def load(self, progress=None):
+        """Insert everything; returns ``{table: (rows, seconds)}``."""
+        report = {}
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'sqlite':
+                connection.exec_driver_sql('PRAGMA synchronous = OFF')
+            first_ids = {
+                model.__tablename__: (connection.execute(db.select(func.max(model.id))).scalar() or 0) + 1
+                for model in (User, Space, SpaceImage, SpaceAmenity, SpaceReview, Booking, Payment)
+            }
+            users = self._load_users(connection, first_ids, report, progress)
+            spaces = self._load_spaces(connection, first_ids, users, report, progress)
+            self._load_bookings(connection, first_ids, users, spaces, report, progress)
+            if connection.dialect.name == 'postgresql':
+                for table in first_ids:
+                    connection.exec_driver_sql(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                    )
+        return report
+    
+    def _write(self, connection, report, progress, table, columns, rows):
+        started = time.perf_counter()
+        writer = BulkWriter(connection, table, columns, self.batch_size)
+        for row in rows:
+            writer.add(row)
+        writer.close()
+        report[table] = (writer.count, time.perf_counter() - started)
+        if progress:
+            progress(table, *report[table])
+    
+    def _load_users(self, connection, first_ids, report, progress):
+        """Returns ``(owners, clients)`` as lists of ``(id, created_at)``."""
+        rng = self._rng('users')
+        # Hashing is deliberately slow, so everyone shares one hash
+        template_user = User()
+        template_user.set_password(SYNTHETIC_PASSWORD)
+        password_hash = template_user.password_hash
+        owners, clients = [], []
+        
+        def rows():
+            for user_id in range(first_ids['users'], first_ids['users'] + self.users):
+                first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                role = _weighted(rng, (('client', 880), ('owner', 119), ('admin', 1)))
+                created_at = self.as_of - timedelta(days=730 * rng.random() ** 0.7, seconds=rng.randrange(86400))
+                if role != 'admin':
+                    (owners if role == 'owner' else clients).append((user_id, created_at))
+                yield (
+                    user_id, f'{first_name}.{last_name}.{user_id}@example.com'.lower(), password_hash,
+                    first_name, last_name, role, rng.random() < 0.8, rng.random() < 0.98,
+                    created_at, created_at, f'2547{rng.randrange(10 ** 8):08d}'
+                )
+        
+        self._write(connection, report, progress, 'users', (
+            'id', 'email', 'password_hash', 'first_name', 'last_name', 'role', 'is_verified', 'is_active',
+            'created_at', 'updated_at', 'phone'
+        ), rows())
+        if self.spaces and not owners:
+            raise ValueError('Generate more users: spaces need at least one owner')
+        if self.bookings and not clients:
+            raise ValueError('Generate more users: bookings need at least one client')
+        return owners, clients
+    
+    def _load_spaces(self, connection, first_ids, users, report, progress):
+        """Returns ``[(id, price_per_hour, created_at)]``."""
+        rng = self._rng('spaces')
+        owners, _ = users
+        # Most owners list one or two spaces, a few list dozens
+        owner_weights = [1 / (rank ** 1.1) for rank in range(1, len(owners) + 1)]
+        spaces = []
+        
+        def rows():
+            for space_id in range(first_ids['spaces'], first_ids['spaces'] + self.spaces):
+                owner_id, owner_created_at = rng.choices(owners, owner_weights)[0]
+                kind = rng.choice(SPACE_TYPES)
+                capacity = max(2, int(rng.lognormvariate(2.5, 0.7)))
+                price = round(max(200, rng.lognormvariate(7, 0.6) * capacity ** 0.3), -1)
+                # Owners list most of their spaces soon after joining
+                created_at = owner_created_at + (self.as_of - owner_created_at) * rng.random() ** 3
+                spaces.append((space_id, price, created_at))
+                yield (
+                    space_id, f'{rng.choice(SPACE_ADJECTIVES)} {kind}',
+                    f'A {kind.lower()} for up to {capacity} people.',
+                    f'{rng.randint(1, 999)} {rng.choice(STREETS)}', _weighted(rng, CITIES),
+                    price, capacity, owner_id, rng.random() < 0.85, created_at, created_at
+                )
+        
+        self._write(connection, report, progress, 'spaces', (
+            'id', 'name', 'description', 'address', 'city', 'price_per_hour', 'capacity', 'owner_id',
+            'is_available', 'created_at', 'updated_at'
+        ), rows())
+        
+        rng = self._rng('space_images')
+        
+        def image_rows():
+            image_id = first_ids['space_images']
+            for space_id, _, created_at in spaces:
+                for position in range(rng.choice((1, 2, 3, 3, 4, 5, 6))):
+                    content_hash = hashlib.sha256(f'{self.seed}-{space_id}-{position}'.encode()).hexdigest()
+                    base = f'https://res.cloudinary.com/synthetic/image/upload/spacer/spaces/{content_hash[:2]}/{content_hash}'
+                    variants = {
+                        name: {'jpeg': f'{base}/{name}.jpg', 'webp': f'{base}/{name}.webp'}
+                        for name in ('thumbnail', 'card', 'full')
+                    }
+                    yield (
+                        image_id, space_id, variants['full']['jpeg'], variants, PLACEHOLDER, 'ready',
+                        position == 0, created_at
+                    )
+                    image_id += 1
+        
+        self._write(connection, report, progress, 'space_images', (
+            'id', 'space_id', 'image_url', 'variants', 'placeholder', 'status', 'is_primary', 'created_at'
+        ), image_rows())
+        
+        rng = self._rng('space_amenities')
+        
+        def amenity_rows():
+            amenity_id = first_ids['space_amenities']
+            for space_id, _, _ in spaces:
+                for name in rng.sample(AMENITIES, rng.randint(2, 8)):
+                    yield amenity_id, space_id, name
+                    amenity_id += 1
+        
+        self._write(connection, report, progress, 'space_amenities', ('id', 'space_id', 'name'), amenity_rows())
+        
+        rng = self._rng('space_reviews')
+        
+        def review_rows():
+            review_id = first_ids['space_reviews']
+            for space_id, _, created_at in spaces:
+                # Geometric: many spaces have no reviews, popular ones have plenty
+                while rng.random() < 0.75:
+                    rating = _weighted(rng, ((5, 45), (4, 30), (3, 13), (2, 7), (1, 5)))
+                    yield (
+                        review_id, space_id, f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[0]}.',
+                        rating, REVIEW_COMMENTS[rating], created_at + (self.as_of - created_at) * rng.random()
+                    )
+                    review_id += 1
+        
+        self._write(connection, report, progress, 'space_reviews', (
+            'id', 'space_id', 'user_name', 'rating', 'comment', 'created_at'
+        ), review_rows())
+        return spaces
+    
+    def _load_bookings(self, connection, first_ids, users, spaces, report, progress):
+        if not self.bookings:
+            return
+        if not spaces:
+            raise ValueError('Generate some spaces: bookings need somewhere to happen')
+        rng = self._rng('bookings')
+        _, clients = users
+        client_ids = [user_id for user_id, _ in clients]
+        # Regulars book far more often than one-off clients
+        client_weights = [1 / (rank ** 0.6) for rank in range(1, len(client_ids) + 1)]
+        cumulative_weights = []
+        total = 0
+        for weight in client_weights:
+            total += weight
+            cumulative_weights.append(total)
+        # Bookings fall between 18 months ago and 2 months ahead, at most
+        # BOOKINGS_PER_DAY a day per space
+        window_end = self.as_of + timedelta(days=60)
+        window_starts = [max(created_at, self.as_of - timedelta(days=540)) for _, _, created_at in spaces]
+        counts = _zipf_counts(rng, self.bookings, [
+            int((window_end - window_start).days * BOOKINGS_PER_DAY) for window_start in window_starts
+        ])
+        started = time.perf_counter()
+        bookings = BulkWriter(connection, 'bookings', (
+            'id', 'space_id', 'user_id', 'start_time', 'end_time', 'total_price', 'purpose', 'status',
+            'payment_status', 'created_at', 'updated_at'
+        ), self.batch_size)
+        payments = BulkWriter(connection, 'payments', (
+            'id', 'booking_id', 'amount', 'payment_method', 'transaction_id', 'status', 'result_description',
+            'created_at', 'updated_at'
+        ), self.batch_size, parent=bookings)
+        booking_id = first_ids['bookings']
+        payment_id = first_ids['payments']
+        for (space_id, price, _), window_start, count in zip(spaces, window_starts, counts):
+            if not count:
+                continue
+            # Bookings follow each other on the space's calendar; cancelled
+            # ones don't hold the slot, so they overlap with what comes next
+            window_day = window_start.replace(hour=0, minute=0, second=0, microsecond=0)
+            days = (window_end - window_day).days
+            cursor = window_start
+            for day in sorted(rng.randrange(days) for _ in range(count)):
+                opens = window_day + timedelta(days=day, hours=7)
+                start = _business_hours(max(cursor, opens) + timedelta(minutes=rng.expovariate(1 / 90)))
+                hours = rng.choice(BOOKING_HOURS)
+                end = start + timedelta(hours=hours)
+                created_at = min(start, self.as_of) - timedelta(hours=rng.expovariate(1 / 72))
+                status, payment_status = self._booking_status(rng, start, end)
+                if status != 'cancelled':
+                    cursor = end
+                total_price = price * hours
+                bookings.add((
+                    booking_id, space_id, rng.choices(client_ids, cum_weights=cumulative_weights)[0], start, end,
+                    total_price, rng.choice(PURPOSES), status, payment_status, created_at, created_at
+                ))
+                # Paid bookings have a completed M-Pesa payment; a few unpaid ones a failed attempt
+                if payment_status != 'pending':
+                    payment_status, description = 'completed', 'The service request is processed successfully.'
+                elif rng.random() < 0.05:
+                    payment_status, description = 'failed', 'Request cancelled by user'
+                else:
+                    payment_status = None
+                if payment_status:
+                    payments.add((
+                        payment_id, booking_id, total_price, 'mpesa', f'ws_CO_synthetic_{self.seed}_{booking_id}',
+                        payment_status, description, created_at, created_at
+                    ))
+                    payment_id += 1
+                booking_id += 1
+        
+        bookings.close()
+        payments.close()
+        elapsed = time.perf_counter() - started
+        for writer in (bookings, payments):
+            report[writer.table] = (writer.count, elapsed)
+            if progress:
+                progress(writer.table, *report[writer.table])
+    
+    def _booking_status(self, rng, start, end):
+        """``(status, payment_status)`` for a booking at this time relative to ``as_of``."""
+        if rng.random() < 0.08:
+            return 'cancelled', _weighted(rng, (('refunded', 40), ('pending', 60)))
+        if end <= self.as_of:
+            return 'completed', 'paid'
+        if start <= self.as_of or rng.random() < 0.7:
+            return 'confirmed', 'paid'
+        return 'pending', 'pending'
@@ -0,0 +1,68 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import current_app
+
+# One pool per process. It is created on first use and re-created after a
+# fork, so preforking servers never inherit a pool whose threads are gone.
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _get_executor(max_workers):
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spacer-bg')
+                _executor_pid = os.getpid()
+    return _executor
+
+def submit(fn, *args, **kwargs):
+    """Run ``fn`` in the background inside an application context.
+
+    With ``BACKGROUND_TASKS_EAGER`` set the job runs inline, which keeps tests
+    and one-off scripts deterministic.
+    """
+    app = current_app._get_current_object()
+    
+    def run():
+        with app.app_context():
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                app.logger.exception(f"Background task {fn.__name__} failed")
+                raise
+    
+    if app.config['BACKGROUND_TASKS_EAGER']:
+        future = Future()
+        try:
+            future.set_result(run())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    return _get_executor(app.config['BACKGROUND_WORKERS']).submit(run)
+
+def shutdown(wait=True):
+    """Stop the pool, optionally waiting for queued jobs to finish."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=wait)
+        _executor = None
+
+def drain():
+    """Wait for queued jobs, and any jobs they queue in turn, to finish.
+
+    Unlike ``shutdown`` jobs may keep submitting while this waits; the next
+    ``submit`` afterwards starts a fresh pool.
+    """
+    global _executor
+    while True:
+        with _executor_lock:
+            executor = _executor if _executor_pid == os.getpid() else None
+            _executor = None
+        if executor is None:
+            return
+        executor.shutdown(wait=True)
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import db
+from app.models.testimonial import Testimonial
+from app.utils.metrics import metrics
+
+# Sample testimonials data
+SAMPLE_TESTIMONIALS = [
+    {
+        'name': 'Sarah Johnson',
+        'role': 'Space Owner',
+        'content': 'This platform has made managing my creative studio so much easier. The booking system is seamless and the support team is always helpful!',
+        'rating': 5,
+        'image_url': 'https://randomuser.me/api/portraits/women/1.jpg'
+    },
+    {
+        'name': 'Michael Chen',
+        'role': 'Regular Client',
+        'content': 'I\'ve booked several meeting rooms through this platform. The spaces are always as described and the booking process is straightforward.',
+        'rating': 5,
+        'image_url': 'https://randomuser.me/api/portraits/men/2.jpg'
+    },
+    {
+        'name': 'Emily Rodriguez',
+        'role': 'Event Organizer',
+        'content': 'The variety of spaces available is impressive. I\'ve found perfect venues for both small meetings and larger events.',
+        'rating': 4,
+        'image_url': 'https://randomuser.me/api/portraits/women/3.jpg'
+    }
+]
+
+def seed_testimonials():
+    """Insert the sample testimonials that aren't there yet; returns how many were added.
+    
+    Samples are matched by name, so running it again (or from several
+    processes) doesn't create duplicates.
+    """
+    existing = {name for (name,) in db.session.query(Testimonial.name).filter(
+        Testimonial.name.in_([sample['name'] for sample in SAMPLE_TESTIMONIALS])
+    )}
+    added = 0
+    for testimonial_data in SAMPLE_TESTIMONIALS:
+        if testimonial_data['name'] not in existing:
+            db.session.add(Testimonial(**testimonial_data))
+            added += 1
+    db.session.commit()
+    return added
+
+class TestimonialsSnapshot:
+    """The testimonials list, JSON-encoded once and served from memory.
+    
+    Commits that touch a testimonial in this process invalidate it right
+    away. Changes made by other processes are picked up within ``ttl``
+    seconds through a cheap count/max(updated_at) fingerprint, so the
+    rows themselves are only reloaded when something changed.
+    """
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._body = None
+        self._etag = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+    
+    def invalidate(self):
+        with self._lock:
+            self._fingerprint = None
+            self._checked_at = 0.0
+    
+    def get(self):
+        """Return ``(body, etag)``, rebuilding the snapshot if it is stale."""
+        if self._body is not None and time.monotonic() - self._checked_at < self.ttl:
+            metrics.inc('cache_requests_total', (('cache', 'testimonials'), ('result', 'hit')))
+            return self._body, self._etag
+        
+        with self._lock:
+            now = time.monotonic()
+            if self._body is not None and now - self._checked_at < self.ttl:
+                return self._body, self._etag
+            
+            fingerprint = tuple(db.session.query(
+                func.count(Testimonial.id), func.max(Testimonial.updated_at)
+            ).one())
+            result = 'hit'
+            if self._body is None or fingerprint != self._fingerprint:
+                result = 'miss'
+                testimonials = Testimonial.query.order_by(Testimonial.id).all()
+                self._body = current_app.json.dumps([testimonial.to_dict() for testimonial in testimonials]).encode() + b'\n'
+                self._etag = hashlib.sha1(self._body).hexdigest()
+                self._fingerprint = fingerprint
+            self._checked_at = now
+            metrics.inc('cache_requests_total', (('cache', 'testimonials'), ('result', result)))
+            return self._body, self._etag
+
+def get_testimonials_snapshot():
+    app = current_app._get_current_object()
+    snapshot = app.extensions.get('testimonials_snapshot')
+    if snapshot is None:
+        snapshot = app.extensions.setdefault(
+            'testimonials_snapshot', TestimonialsSnapshot(app.config['TESTIMONIALS_SNAPSHOT_TTL'])
+        )
+    return snapshot
+
+@event.listens_for(Session, 'after_flush')
+def _track_testimonial_changes(session, flush_context):
+    if any(isinstance(obj, Testimonial) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['testimonials_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_testimonials_snapshot(session):
+    if session.info.pop('testimonials_changed', False) and has_app_context():
+        snapshot = current_app.extensions.get('testimonials_snapshot')
+        if snapshot is not None:
+            snapshot.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_testimonial_changes(session):
+    session.info.pop('testimonials_changed', None)
@@ -0,0 +1,17 @@
+import tempfile
+from flask import Request, current_app
+
+class SpooledUploadRequest(Request):
+    """Request that keeps only small multipart file parts in memory.
+
+    Parts larger than ``UPLOAD_SPOOL_THRESHOLD`` roll over to a temporary file
+    in ``UPLOAD_SPOOL_DIR``, so a burst of large photo uploads costs disk
+    rather than worker RSS.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(
+            max_size=current_app.config['UPLOAD_SPOOL_THRESHOLD'],
+            mode='rb+',
+            dir=current_app.config['UPLOAD_SPOOL_DIR']
+        )
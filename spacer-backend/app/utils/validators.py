@@ -70,4 +70,15 @@ def validate_space_data(data):
     except ValueError:
         return False, "Invalid capacity format"
     
-    return True, None 
\ No newline at end of file
+    return True, None
+
+def validate_id_list(ids, max_items=1000):
+    """Validate a list of record IDs for bulk operations."""
+    if not isinstance(ids, list) or not ids:
+        return False, "A non-empty list of ids is required"
+    if len(ids) > max_items:
+        return False, f"Cannot process more than {max_items} ids at once"
+    for value in ids:
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            return False, "Ids must be positive integers"
+    return True, None
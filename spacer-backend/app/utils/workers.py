@@ -0,0 +1,64 @@
+import gc
+import time
+from app.extensions import db
+
+# Hooks for preforking servers, called from gunicorn.conf.py. With
+# preload_app the master imports the app once and every worker is forked
+# from it, so modules and the prebuilt OpenAPI spec are shared copy-on-write.
+
+def prepare_master(app):
+    """Finish loading the app in the master, just before workers are forked."""
+    with app.app_context():
+        # Connections opened while loading (e.g. seeding testimonials) must not be shared with workers
+        for engine in db.engines.values():
+            engine.dispose()
+    # Keep the collector from touching, and so copying, the objects shared with workers
+    gc.freeze()
+
+def after_fork(app):
+    """Drop database connections inherited from the master, without closing the master's sockets."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def warm_up(app, connections=1):
+    """Prime the pools and caches a worker needs before it accepts requests.
+    
+    Opens up to ``connections`` database connections (capped at the pool
+    size) and builds the landing page and testimonials caches, so the first
+    requests don't pay for them. Returns the milliseconds it took, or None
+    if it failed: the failure is logged and the worker starts cold rather
+    than not at all.
+    """
+    from app.utils.home import get_home_cache
+    from app.utils.testimonials import get_testimonials_snapshot
+    from app.utils.storage import get_storage
+    from app.utils.mpesa import get_mpesa_api
+    
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            pool = db.engine.pool
+            if hasattr(pool, 'size'):
+                connections = min(connections, pool.size())
+            opened = []
+            try:
+                for _ in range(connections):
+                    connection = db.engine.connect()
+                    opened.append(connection)
+                    connection.execute(db.text('SELECT 1'))
+            finally:
+                # Back to the pool, still open
+                for connection in opened:
+                    connection.close()
+            
+            get_home_cache().warm()
+            get_testimonials_snapshot().get()
+            get_storage()
+            get_mpesa_api()
+        except Exception as e:
+            app.logger.warning(f"Worker warm-up failed, starting cold: {str(e)}")
+            return None
+        finally:
+            db.session.remove()
+    return (time.perf_counter() - started) * 1000
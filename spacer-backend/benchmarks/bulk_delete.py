@@ -0,0 +1,118 @@
+"""Compare deleting spaces one request at a time with the set-based bulk delete.
+
+Usage:
+    python -m benchmarks.bulk_delete --count 1000
+
+Runs against a throwaway SQLite file so it can be executed anywhere; pass
+``--database-url`` to point it at a scratch Postgres database instead.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from app import create_app, db
+from app.models.user import User
+from app.models.space import Space, SpaceImage, SpaceAmenity, SpaceReview
+from app.models.booking import Booking, Payment
+
+
+def build_config(database_url):
+    class BenchmarkConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    return BenchmarkConfig
+
+
+def seed_spaces(count):
+    owner = User(email='bench-owner@example.com', first_name='Bench', last_name='Owner', role='owner')
+    owner.set_password('benchmark123')
+    db.session.add(owner)
+    db.session.flush()
+
+    start = datetime.utcnow() + timedelta(days=1)
+    space_ids = []
+    for i in range(count):
+        space = Space(
+            name=f'Space {i}', description='Benchmark space', address=f'{i} Bench St',
+            city='Nairobi', price_per_hour=10.0, capacity=5, owner_id=owner.id
+        )
+        db.session.add(space)
+        db.session.flush()
+        space_ids.append(space.id)
+        db.session.add_all([
+            SpaceImage(space_id=space.id, image_url=f'https://example.com/{i}-a.jpg', is_primary=True),
+            SpaceImage(space_id=space.id, image_url=f'https://example.com/{i}-b.jpg'),
+            SpaceAmenity(space_id=space.id, name='WiFi'),
+            SpaceAmenity(space_id=space.id, name='Projector'),
+            SpaceReview(space_id=space.id, user_name='Reviewer', rating=5, comment='Great'),
+        ])
+        booking = Booking(
+            space_id=space.id, user_id=owner.id, start_time=start, end_time=start + timedelta(hours=2),
+            total_price=20.0, purpose='Benchmark'
+        )
+        db.session.add(booking)
+        db.session.flush()
+        db.session.add(Payment(booking_id=booking.id, amount=20.0, payment_method='mpesa'))
+    db.session.commit()
+    return space_ids
+
+
+def delete_per_row(space_ids):
+    """Mirror DELETE /api/spaces/<id>: load, delete and commit one space per call."""
+    for space_id in space_ids:
+        space = Space.query.get(space_id)
+        db.session.delete(space)
+        db.session.commit()
+
+
+def delete_bulk(space_ids):
+    """Mirror POST /api/spaces/bulk-delete: one ownership query and one DELETE."""
+    dict(db.session.query(Space.id, Space.owner_id).filter(Space.id.in_(space_ids)).all())
+    Space.query.filter(Space.id.in_(space_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run(database_url, count):
+    app = create_app(build_config(database_url))
+    timings = {}
+    with app.app_context():
+        for label, strategy in (('per_row', delete_per_row), ('bulk', delete_bulk)):
+            db.drop_all()
+            db.create_all()
+            space_ids = seed_spaces(count)
+            db.session.expunge_all()
+
+            started = time.perf_counter()
+            strategy(space_ids)
+            timings[label] = time.perf_counter() - started
+
+            leftovers = SpaceImage.query.count() + Booking.query.count() + Payment.query.count()
+            if Space.query.count() or leftovers:
+                raise RuntimeError(f'{label} delete left {leftovers} child rows behind')
+        db.drop_all()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000, help='Number of spaces to delete')
+    parser.add_argument('--database-url', help='Scratch database URL (defaults to a temporary SQLite file)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        timings = run(args.database_url, args.count)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            timings = run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.count)
+
+    for label, seconds in timings.items():
+        print(f'{label:>8}: {seconds:8.3f}s  ({seconds / args.count * 1000:.2f} ms/space)')
+    print(f'speedup: {timings["per_row"] / timings["bulk"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
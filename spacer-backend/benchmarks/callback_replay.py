@@ -0,0 +1,94 @@
+"""Measure the cost of Safaricom retrying the same STK callback many times.
+
+Usage:
+    python -m benchmarks.callback_replay --replays 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from app import create_app, db
+from app.models.user import User
+from app.models.space import Space
+from app.models.booking import Booking, Payment, MpesaCallback
+
+
+def build_config(database_url):
+    class BenchmarkConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+        BACKGROUND_TASKS_EAGER = True
+
+    return BenchmarkConfig
+
+
+def seed_payment():
+    user = User(email='bench-client@example.com', first_name='Bench', last_name='Client', role='client')
+    user.set_password('benchmark123')
+    db.session.add(user)
+    db.session.flush()
+    space = Space(name='Bench', description='Bench', address='1 Bench St', city='Nairobi',
+                  price_per_hour=10.0, capacity=5, owner_id=user.id)
+    db.session.add(space)
+    db.session.flush()
+    start = datetime.utcnow() + timedelta(days=1)
+    booking = Booking(space_id=space.id, user_id=user.id, start_time=start,
+                      end_time=start + timedelta(hours=1), total_price=10.0, purpose='Benchmark')
+    db.session.add(booking)
+    db.session.flush()
+    payment = Payment(booking_id=booking.id, amount=10.0, payment_method='mpesa', transaction_id='ws_CO_bench')
+    db.session.add(payment)
+    db.session.commit()
+
+
+def run(database_url, replays):
+    app = create_app(build_config(database_url))
+    payload = {'Body': {'stkCallback': {
+        'MerchantRequestID': 'bench', 'CheckoutRequestID': 'ws_CO_bench',
+        'ResultCode': 0, 'ResultDesc': 'The service request is processed successfully.'
+    }}}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_payment()
+
+    client = app.test_client()
+    started = time.perf_counter()
+    first = client.post('/api/payments/mpesa-callback', json=payload)
+    first_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(replays):
+        response = client.post('/api/payments/mpesa-callback', json=payload)
+        assert response.status_code == 200
+    replay_seconds = time.perf_counter() - started
+
+    with app.app_context():
+        assert first.status_code == 200
+        assert MpesaCallback.query.count() == 1
+        assert Payment.query.one().status == 'completed'
+        db.drop_all()
+    return first_seconds, replay_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replays', type=int, default=1000)
+    parser.add_argument('--database-url', help='Scratch database URL (defaults to a temporary SQLite file)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        first, replays = run(args.database_url, args.replays)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            first, replays = run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.replays)
+
+    print(f'first delivery: {first * 1000:8.2f} ms')
+    print(f'replays:        {replays / args.replays * 1000:8.2f} ms each ({args.replays} total, {replays:.2f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,655 @@
+"""Benchmark every API route in-process and compare the results with a baseline.
+
+Usage:
+    python -m benchmarks.endpoints                    # measure and print
+    python -m benchmarks.endpoints --save-baseline    # record benchmarks/baselines/endpoints.json
+    python -m benchmarks.endpoints --check            # exit 1 if any route regressed
+    python -m benchmarks.endpoints --only spaces. --iterations 50
+
+Requests go through the Flask test client against a temporary SQLite
+database (or ``--database-url``) filled by the synthetic data generator, with
+M-Pesa, Sendinblue and image storage stubbed out. Every route registered
+from ``app/routes`` needs a case below (or an entry in ``SKIPPED``), so a new
+route can't quietly go unmeasured.
+
+For each route the report gives median and p95 latency, the number of SQL
+queries per call and the peak memory allocated during one call. Routes are
+timed over several rounds and the median of the fastest round is kept, which
+evens out CPU speed drifting during the run. Allocations are taken before the
+timing rounds, each from the lowest of a few traced calls that directly follow
+an untraced one, so they don't depend on run order or iteration counts.
+Latency baselines only compare well on the machine that recorded them; query
+counts and allocations compare anywhere.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token, create_refresh_token
+from PIL import Image
+from sqlalchemy import event
+
+from config import Config
+from app import create_app, db
+from app.models.user import User
+from app.models.space import Space
+from app.models.booking import Booking, Payment
+from app.utils import tasks
+from app.utils.email import generate_verification_token
+from app.utils.sql_instrumentation import query_budget
+from app.utils.storage import get_storage
+from app.utils.synthetic_data import SyntheticDataset, SYNTHETIC_PASSWORD
+from app.utils.testimonials import seed_testimonials
+from tools import fake_daraja, fake_sendinblue
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'endpoints.json')
+
+# A fixed dataset, so query counts and response sizes are comparable between runs
+DATASET = {'users': 1000, 'spaces': 500, 'bookings': 20000, 'seed': 0, 'as_of': datetime(2026, 1, 1)}
+
+# Routes that can't be measured, with the reason
+SKIPPED = {
+    'GET auth.verify_email': 'not implemented: the view returns no response',
+}
+
+CASES = {}
+
+
+def case(key, iterations=None):
+    """Register the request builder for ``'METHOD blueprint.endpoint'``.
+    
+    The builder runs before every measured call (its time isn't counted) and
+    returns the test client arguments plus the expected status code.
+    """
+    def register(build):
+        CASES[key] = (build, iterations)
+        return build
+    return register
+
+
+def build_config(database_url, scratch_dir, daraja_url, sendinblue_url):
+    class BenchmarkConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+        MPESA_BASE_URL = daraja_url
+        MPESA_CONSUMER_KEY = 'benchmark'
+        MPESA_CONSUMER_SECRET = 'benchmark'
+        MPESA_BUSINESS_SHORTCODE = '174379'
+        MPESA_PASSKEY = 'benchmark'
+        SENDINBLUE_API_HOST = sendinblue_url
+        SENDINBLUE_API_KEY = 'benchmark'
+        IMAGE_STORAGE_BACKEND = 'local'
+        IMAGE_STORAGE_LOCAL_ROOT = os.path.join(scratch_dir, 'media')
+        PROFILE_DIR = os.path.join(scratch_dir, 'profiles')
+        SLOW_QUERY_THRESHOLD_MS = 0
+    
+    return BenchmarkConfig
+
+
+class Fixture:
+    """The seeded database plus helpers that create fresh rows for cases that change data."""
+    
+    def __init__(self, app):
+        self.app = app
+        self.client = app.test_client()
+        self.counter = 0
+        with app.app_context():
+            # The synthetic data has few or no admins, so bring our own
+            admin = User(
+                email='benchmark-admin@example.com', first_name='Bench', last_name='Admin',
+                role='admin', password_hash='x'
+            )
+            db.session.add(admin)
+            db.session.commit()
+            self.admin = admin.id
+            # The busiest owner and client make for the heaviest listings
+            self.owner = db.session.query(Space.owner_id).group_by(Space.owner_id).order_by(
+                db.func.count().desc(), Space.owner_id
+            ).first()[0]
+            self.client_user = db.session.query(Booking.user_id).group_by(Booking.user_id).order_by(
+                db.func.count().desc(), Booking.user_id
+            ).first()[0]
+            self.client_email = db.session.get(User, self.client_user).email
+            self.space = Space.query.filter_by(owner_id=self.owner).order_by(Space.id).first().id
+            self.booking = Booking.query.filter_by(user_id=self.client_user).order_by(Booking.id).first().id
+            self.payment = db.session.query(Payment.id).join(Booking).filter(
+                Booking.user_id == self.client_user
+            ).order_by(Payment.id).first()[0]
+            self.other_user = User.query.filter(User._role == 'client', User.id != self.client_user).first().id
+            self.tokens = {
+                'admin': create_access_token(identity=self.admin),
+                'owner': create_access_token(identity=self.owner),
+                'client': create_access_token(identity=self.client_user),
+                'refresh': create_refresh_token(identity=self.client_user),
+            }
+            self.media_key = 'benchmark/photo.jpg'
+            get_storage().save(self.media_key, self.jpeg())
+        self.profile_id = None
+    
+    def auth(self, role):
+        return {'Authorization': f'Bearer {self.tokens[role]}'}
+    
+    def unique(self):
+        self.counter += 1
+        return self.counter
+    
+    @staticmethod
+    def jpeg():
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), (90, 120, 160)).save(buffer, 'JPEG')
+        return buffer.getvalue()
+    
+    def make_space(self):
+        with self.app.app_context():
+            space = Space(
+                name=f'Benchmark space {self.unique()}', description='Benchmark', address='1 Bench St',
+                city='Nairobi', price_per_hour=500.0, capacity=10, owner_id=self.owner
+            )
+            db.session.add(space)
+            db.session.commit()
+            return space.id
+    
+    def make_booking(self, with_payment=None):
+        space_id = self.make_space()
+        with self.app.app_context():
+            start = datetime.utcnow().replace(microsecond=0) + timedelta(days=7)
+            booking = Booking(
+                space_id=space_id, user_id=self.client_user, start_time=start,
+                end_time=start + timedelta(hours=2), total_price=1000.0, purpose='Benchmark'
+            )
+            db.session.add(booking)
+            db.session.flush()
+            if with_payment:
+                db.session.add(Payment(
+                    booking_id=booking.id, amount=1000.0, payment_method='mpesa', transaction_id=with_payment
+                ))
+            db.session.commit()
+            return booking.id
+    
+    def make_users(self, count):
+        with self.app.app_context():
+            users = []
+            for _ in range(count):
+                user = User(
+                    email=f'benchmark-{self.unique()}@example.com', first_name='Bench', last_name='User',
+                    role='client', password_hash='x'
+                )
+                db.session.add(user)
+                users.append(user)
+            db.session.commit()
+            return [user.id for user in users]
+
+
+# auth
+
+@case('GET auth.auth_index')
+def auth_index(f):
+    return {'method': 'GET', 'path': '/api/auth'}, 200
+
+
+@case('POST auth.register', iterations=5)
+def register(f):
+    return {'method': 'POST', 'path': '/api/auth/register', 'json': {
+        'email': f'benchmark-register-{f.unique()}@example.com', 'password': 'Benchmark123!',
+        'first_name': 'Bench', 'last_name': 'Mark'
+    }}, 201
+
+
+@case('POST auth.login', iterations=5)
+def login(f):
+    return {'method': 'POST', 'path': '/api/auth/login', 'json': {
+        'email': f.client_email, 'password': SYNTHETIC_PASSWORD
+    }}, 200
+
+
+@case('POST auth.refresh')
+def refresh(f):
+    return {'method': 'POST', 'path': '/api/auth/refresh', 'headers': f.auth('refresh')}, 200
+
+
+@case('GET auth.get_current_user')
+def get_current_user(f):
+    return {'method': 'GET', 'path': '/api/auth/me', 'headers': f.auth('client')}, 200
+
+
+# bookings
+
+@case('GET bookings.get_bookings')
+def get_bookings(f):
+    return {'method': 'GET', 'path': '/api/bookings', 'headers': f.auth('client')}, 200
+
+
+@case('GET bookings.get_booking')
+def get_booking(f):
+    return {'method': 'GET', 'path': f'/api/bookings/{f.booking}', 'headers': f.auth('client')}, 200
+
+
+@case('GET bookings.get_user_bookings')
+def get_user_bookings(f):
+    return {'method': 'GET', 'path': '/api/bookings/user', 'headers': f.auth('client')}, 200
+
+
+@case('POST bookings.create_booking')
+def create_booking(f):
+    start = (datetime.utcnow() + timedelta(days=3)).replace(hour=10, minute=0, second=0, microsecond=0)
+    return {'method': 'POST', 'path': '/api/bookings/', 'headers': f.auth('client'), 'json': {
+        'space_id': f.make_space(), 'start_time': start.isoformat() + 'Z',
+        'end_time': (start + timedelta(hours=2)).isoformat() + 'Z', 'purpose': 'Benchmark'
+    }}, 201
+
+
+@case('POST bookings.cancel_booking')
+def cancel_booking(f):
+    return {'method': 'POST', 'path': f'/api/bookings/{f.make_booking()}/cancel', 'headers': f.auth('client')}, 200
+
+
+@case('POST bookings.process_payment')
+def process_payment(f):
+    return {'method': 'POST', 'path': f'/api/bookings/{f.make_booking()}/payment', 'headers': f.auth('client'),
+            'json': {'payment_method': 'card'}}, 201
+
+
+# main, metrics, profiles, testimonials
+
+@case('GET main.index')
+def index(f):
+    return {'method': 'GET', 'path': '/'}, 200
+
+
+@case('GET main.home')
+def home(f):
+    return {'method': 'GET', 'path': '/api/home'}, 200
+
+
+@case('GET metrics.get_metrics')
+def get_metrics(f):
+    return {'method': 'GET', 'path': '/metrics'}, 200
+
+
+@case('GET profiles.get_profile')
+def get_profile(f):
+    if f.profile_id is None:
+        response = f.client.get('/api/spaces', headers={**f.auth('admin'), 'X-Profile': '1'})
+        f.profile_id = response.headers['X-Profile-Id']
+    return {'method': 'GET', 'path': f'/api/profiles/{f.profile_id}', 'headers': f.auth('admin')}, 200
+
+
+@case('GET testimonials.get_testimonials')
+def get_testimonials(f):
+    return {'method': 'GET', 'path': '/api/testimonials'}, 200
+
+
+# payments
+
+@case('GET payments.get_payment_status')
+def get_payment_status(f):
+    return {'method': 'GET', 'path': f'/api/payments/{f.payment}/status', 'headers': f.auth('client')}, 200
+
+
+@case('POST payments.initiate_mpesa_payment')
+def initiate_mpesa_payment(f):
+    return {'method': 'POST', 'path': f'/api/payments/mpesa/initiate/{f.make_booking()}',
+            'headers': f.auth('client'), 'json': {'phone_number': '254712345678'}}, 202
+
+
+@case('POST payments.mpesa_callback')
+def mpesa_callback(f):
+    checkout_request_id = f'ws_CO_benchmark_{f.unique()}'
+    f.make_booking(with_payment=checkout_request_id)
+    return {'method': 'POST', 'path': '/api/payments/mpesa-callback', 'json': {'Body': {'stkCallback': {
+        'MerchantRequestID': 'benchmark', 'CheckoutRequestID': checkout_request_id,
+        'ResultCode': 0, 'ResultDesc': 'The service request is processed successfully.'
+    }}}}, 200
+
+
+# spaces
+
+@case('GET spaces.get_spaces')
+def get_spaces(f):
+    return {'method': 'GET', 'path': '/api/spaces', 'query_string': {'city': 'Nairobi'}}, 200
+
+
+@case('GET spaces.get_space')
+def get_space(f):
+    return {'method': 'GET', 'path': f'/api/spaces/{f.space}'}, 200
+
+
+@case('POST spaces.create_space')
+def create_space(f):
+    return {'method': 'POST', 'path': '/api/spaces/', 'headers': f.auth('owner'), 'data': {
+        'name': 'Benchmark space', 'description': 'Benchmark', 'address': '1 Bench St', 'city': 'Nairobi',
+        'price_per_hour': '500', 'capacity': '10', 'amenities': 'wifi,projector'
+    }}, 201
+
+
+@case('PUT spaces.update_space')
+def update_space(f):
+    return {'method': 'PUT', 'path': f'/api/spaces/{f.space}', 'headers': f.auth('owner'),
+            'data': {'price_per_hour': str(400 + f.unique() % 100)}}, 200
+
+
+@case('DELETE spaces.delete_space')
+def delete_space(f):
+    return {'method': 'DELETE', 'path': f'/api/spaces/{f.make_space()}', 'headers': f.auth('owner')}, 200
+
+
+@case('POST spaces.bulk_delete_spaces')
+def bulk_delete_spaces(f):
+    return {'method': 'POST', 'path': '/api/spaces/bulk-delete', 'headers': f.auth('admin'),
+            'json': {'space_ids': [f.make_space() for _ in range(10)]}}, 200
+
+
+@case('POST spaces.create_image_upload_url')
+def create_image_upload_url(f):
+    return {'method': 'POST', 'path': f'/api/spaces/{f.space}/images/upload-url', 'headers': f.auth('owner'),
+            'json': {'content_type': 'image/jpeg'}}, 201
+
+
+@case('POST spaces.finalize_image_upload')
+def finalize_image_upload(f):
+    space_id = f.make_space()
+    target = f.client.post(
+        f'/api/spaces/{space_id}/images/upload-url', headers=f.auth('owner'), json={'content_type': 'image/jpeg'}
+    ).get_json()
+    f.client.put(upload_path(target['url']), data=f.jpeg())
+    return {'method': 'POST', 'path': f'/api/spaces/{space_id}/images/finalize', 'headers': f.auth('owner'),
+            'json': {'upload_id': target['upload_id']}}, 201
+
+
+# media (local storage backend)
+
+def upload_path(url):
+    """The test client path of a LocalStorage upload URL."""
+    return '/media/uploads/' + url.rsplit('/', 1)[1]
+
+
+@case('GET media.get_media')
+def get_media(f):
+    return {'method': 'GET', 'path': f'/media/{f.media_key}'}, 200
+
+
+@case('PUT media.put_upload')
+def put_upload(f):
+    with f.app.app_context():
+        target = get_storage().create_upload_target(f'benchmark/upload-{f.unique()}.jpg', 1024 * 1024, 900)
+    return {'method': 'PUT', 'path': upload_path(target['url']), 'data': f.jpeg()}, 204
+
+
+# users
+
+@case('GET users.get_users')
+def get_users(f):
+    return {'method': 'GET', 'path': '/api/users/', 'headers': f.auth('admin')}, 200
+
+
+@case('GET users.get_user')
+def get_user(f):
+    return {'method': 'GET', 'path': f'/api/users/{f.other_user}', 'headers': f.auth('admin')}, 200
+
+
+@case('PUT users.update_user')
+def update_user(f):
+    return {'method': 'PUT', 'path': f'/api/users/{f.other_user}', 'headers': f.auth('admin'),
+            'json': {'first_name': f'Bench{f.unique()}'}}, 200
+
+
+@case('DELETE users.delete_user')
+def delete_user(f):
+    return {'method': 'DELETE', 'path': f'/api/users/{f.make_users(1)[0]}', 'headers': f.auth('admin')}, 200
+
+
+@case('POST users.bulk_update_role')
+def bulk_update_role(f):
+    return {'method': 'POST', 'path': '/api/users/bulk/role', 'headers': f.auth('admin'),
+            'json': {'user_ids': f.make_users(10), 'role': 'owner'}}, 200
+
+
+@case('POST users.bulk_deactivate_users')
+def bulk_deactivate_users(f):
+    return {'method': 'POST', 'path': '/api/users/bulk/deactivate', 'headers': f.auth('admin'),
+            'json': {'user_ids': f.make_users(10)}}, 200
+
+
+@case('GET users.verify_user')
+def verify_user(f):
+    with f.app.app_context():
+        token = generate_verification_token(db.session.get(User, f.other_user))
+    return {'method': 'GET', 'path': f'/api/users/verify/{token}'}, 200
+
+
+@case('GET users.user_profile')
+def get_user_profile(f):
+    return {'method': 'GET', 'path': '/api/users/profile', 'headers': f.auth('client')}, 200
+
+
+@case('PUT users.user_profile')
+def put_user_profile(f):
+    return {'method': 'PUT', 'path': '/api/users/profile', 'headers': f.auth('client'),
+            'json': {'bio': f'Benchmark bio {f.unique()}'}}, 200
+
+
+@case('GET users.user_activities')
+def user_activities(f):
+    return {'method': 'GET', 'path': '/api/users/activities', 'headers': f.auth('client')}, 200
+
+
+def routes(app):
+    """``'METHOD blueprint.endpoint'`` for every route defined in app/routes."""
+    keys = set()
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if not view.__module__.startswith('app.routes.'):
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            keys.add(f'{method} {rule.endpoint}')
+    return keys
+
+
+def call(fixture, build):
+    """Send one request built by ``build``; return its latency and query count."""
+    kwargs, expected = build(fixture)
+    with query_budget() as stats:
+        started = time.perf_counter()
+        response = fixture.client.open(**kwargs)
+        elapsed = time.perf_counter() - started
+    response.close()
+    if response.status_code != expected:
+        raise RuntimeError(f'expected {expected}, got {response.status_code}: {response.get_data(as_text=True)[:300]}')
+    return elapsed, stats.count
+
+
+def time_route(fixture, build, iterations):
+    """Latencies and query counts of ``iterations`` calls."""
+    timings, queries = [], []
+    # Like timeit, keep collector pauses out of the timings
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            elapsed, count = call(fixture, build)
+            timings.append(elapsed)
+            queries.append(count)
+    finally:
+        gc.enable()
+    return timings, queries
+
+
+def peak_allocation(fixture, build, runs):
+    """Peak bytes allocated while handling one call, the lowest of ``runs`` calls.
+    
+    Each traced call comes straight after an untraced one to the same
+    route, so caches, pools and lazy imports it needs are already set up
+    whatever ran before it, and the minimum drops one-off allocations.
+    """
+    peaks = []
+    for _ in range(runs):
+        call(fixture, build)
+        tasks.drain()
+        gc.collect()
+        kwargs, expected = build(fixture)
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            response = fixture.client.open(**kwargs)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            response.close()
+        finally:
+            tracemalloc.stop()
+        tasks.drain()
+    return min(peaks)
+
+
+def run(database_url, scratch_dir, iterations, rounds, only, memory_runs=3):
+    daraja = fake_daraja.start_in_thread()
+    sendinblue = fake_sendinblue.start_in_thread()
+    app = create_app(build_config(database_url, scratch_dir, daraja.base_url, sendinblue.base_url))
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # Time the app rather than the disk: commits otherwise wait for fsync
+            event.listen(db.engine, 'connect', lambda connection, record: connection.execute('PRAGMA synchronous = OFF'))
+            db.engine.dispose()
+        db.drop_all()
+        db.create_all()
+        SyntheticDataset(**DATASET).load()
+        seed_testimonials()
+    
+    missing = sorted(routes(app) - set(CASES) - set(SKIPPED))
+    if missing:
+        raise SystemExit(f"No benchmark case for: {', '.join(missing)}")
+    
+    keys = [key for key in sorted(CASES) if not only or any(pattern in key for pattern in only)]
+    fixture = Fixture(app)
+    timings = {key: [] for key in keys}
+    medians = {key: [] for key in keys}
+    queries = {key: [] for key in keys}
+    try:
+        for key in keys:
+            # Warm caches and lazy imports so the first call doesn't skew the numbers
+            call(fixture, CASES[key][0])
+        # Before the timing rounds, so the rows those add (bookings, activities
+        # and so on) don't make allocations depend on --iterations and --rounds
+        peaks = {key: peak_allocation(fixture, CASES[key][0], memory_runs) for key in keys}
+        # CPU speed on shared hosts drifts from one second to the next, so
+        # every route is timed in a few rounds spread over the whole run and
+        # judged by its fastest round
+        for _ in range(rounds):
+            for key in keys:
+                build, case_iterations = CASES[key]
+                round_timings, round_queries = time_route(fixture, build, case_iterations or iterations)
+                timings[key].extend(round_timings)
+                medians[key].append(statistics.median(round_timings))
+                queries[key].extend(round_queries)
+                # Let image processing and emails queued by this route finish before timing the next
+                tasks.drain()
+        results = {}
+        for key in keys:
+            samples = sorted(timings[key])
+            results[key] = {
+                'iterations': len(samples),
+                'p50_ms': round(min(medians[key]) * 1000, 3),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+                'queries': max(queries[key]),
+                'peak_alloc_kb': round(peaks[key] / 1024, 1),
+            }
+            print(f"{key:45} {results[key]['p50_ms']:9.2f} ms  {results[key]['queries']:3} queries  "
+                  f"{results[key]['peak_alloc_kb']:9.1f} KB", file=sys.stderr)
+    finally:
+        tasks.drain()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+    return results
+
+
+def compare(baseline, results, tolerance, min_delta_ms, min_delta_kb):
+    """Regressions of ``results`` against ``baseline``, as readable strings."""
+    regressions = []
+    for key, current in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{key}: {previous['queries']} -> {current['queries']} queries")
+        latency_delta = current['p50_ms'] - previous['p50_ms']
+        if latency_delta > min_delta_ms and current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p50 {previous['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms")
+        memory_delta = current['peak_alloc_kb'] - previous['peak_alloc_kb']
+        if memory_delta > min_delta_kb and current['peak_alloc_kb'] > previous['peak_alloc_kb'] * (1 + tolerance):
+            regressions.append(f"{key}: peak allocation {previous['peak_alloc_kb']} -> {current['peak_alloc_kb']} KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=10, help='Measured calls per route and round')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over all routes; latency is the fastest round')
+    parser.add_argument('--memory-runs', type=int, default=3, help='Traced calls per route; peak allocation is the lowest')
+    parser.add_argument('--only', action='append', help='Only routes whose key contains this (repeatable)')
+    parser.add_argument('--database-url', help='Scratch database URL (defaults to a temporary SQLite file)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--check', action='store_true', help='Exit 1 if a route regressed against --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative growth of latency and allocations (queries may not grow at all)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore latency changes smaller than this')
+    parser.add_argument('--min-delta-kb', type=float, default=16.0, help='Ignore allocation changes smaller than this')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(
+            args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}", tmp, args.iterations, args.rounds, args.only,
+            args.memory_runs
+        )
+    
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': (args.database_url or 'sqlite').split(':', 1)[0],
+        'dataset': {**DATASET, 'as_of': DATASET['as_of'].date().isoformat()},
+        'routes': results,
+    }
+    output = json.dumps(document, indent=2, sort_keys=True) + '\n'
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    if args.save_baseline:
+        if args.only and os.path.exists(args.baseline):
+            # Refresh just the selected routes
+            with open(args.baseline) as f:
+                document['routes'] = {**json.load(f)['routes'], **results}
+            output = json.dumps(document, indent=2, sort_keys=True) + '\n'
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            f.write(output)
+        print(f'Baseline written to {args.baseline}')
+    if not args.check:
+        if not args.output and not args.save_baseline:
+            print(output, end='')
+        return
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)['routes']
+    regressions = compare(baseline, results, args.tolerance, args.min_delta_ms, args.min_delta_kb)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    new_routes = sorted(set(results) - set(baseline))
+    if new_routes:
+        print(f"Not in the baseline yet: {', '.join(new_routes)}")
+    if regressions:
+        sys.exit(1)
+    print(f'{len(results)} routes within tolerance of the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Peak RSS of processing one large photo upload, before and after bounded decoding.
+
+Usage:
+    python -m benchmarks.image_memory --megapixels 50
+
+Each strategy runs in a fresh interpreter so peak RSS (ru_maxrss) is not
+polluted by earlier runs. ``legacy`` reproduces the original resize_image
+(full decode, then LANCZOS); ``bounded`` is generate_variants with draft
+decoding and the pixel limit.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def make_photo(path, megapixels):
+    from PIL import Image
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # A gradient tile stretched up keeps generation fast while still giving
+    # the encoder real detail to chew on
+    tile = Image.merge('RGB', [
+        Image.linear_gradient('L').resize((512, 384)),
+        Image.radial_gradient('L').resize((512, 384)),
+        Image.linear_gradient('L').rotate(90).resize((512, 384)),
+    ])
+    tile.resize((width, height)).save(path, format='JPEG', quality=90)
+    return width, height
+
+
+def legacy(data):
+    from PIL import Image
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ('RGBA', 'P'):
+        img = img.convert('RGB')
+    width, height = img.size
+    ratio = min(800 / width, 800 / height)
+    img = img.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS)
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=85)
+
+
+def bounded(data):
+    from app.utils.cloudinary import generate_variants
+    generate_variants(io.BytesIO(data), max_pixels=60_000_000)
+
+
+STRATEGIES = {'legacy': legacy, 'bounded': bounded}
+
+
+def child(strategy, path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Import before taking the baseline so only the decode is measured
+    if strategy == 'bounded':
+        import app.utils.cloudinary  # noqa: F401
+    from PIL import Image  # noqa: F401
+    baseline = _peak_rss_mb()
+    started = time.perf_counter()
+    STRATEGIES[strategy](data)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({'baseline_mb': baseline, 'peak_mb': _peak_rss_mb(), 'seconds': elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=50)
+    parser.add_argument('--child', nargs=2, metavar=('STRATEGY', 'PATH'), help=argparse.SUPPRESS)
+    parser.add_argument('--make', metavar='PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+    if args.make:
+        return print(json.dumps(make_photo(args.make, args.megapixels)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'photo.jpg')
+        # Linux keeps ru_maxrss across fork/exec, so the big photo is made in
+        # its own process to keep this one (and its children) small
+        width, height = json.loads(subprocess.run(
+            [sys.executable, '-m', 'benchmarks.image_memory', '--megapixels', str(args.megapixels), '--make', path],
+            check=True, capture_output=True, text=True
+        ).stdout)
+        print(f'input: {width}x{height} JPEG, {os.path.getsize(path) / 1048576:.1f} MB')
+        for strategy in STRATEGIES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.image_memory', '--child', strategy, path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{strategy:>8}: peak RSS {result['peak_mb']:7.1f} MB "
+                  f"(+{result['peak_mb'] - result['baseline_mb']:.1f} MB over baseline), "
+                  f"{result['seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -26,8 +26,78 @@ class Config:
     CLOUDINARY_API_KEY = os.environ.get('CLOUDINARY_API_KEY')
     CLOUDINARY_API_SECRET = os.environ.get('CLOUDINARY_API_SECRET')
     
+    # Image pipeline: resize processes per web worker (0 = resize in the upload
+    # threads) and concurrent uploads per web worker
+    IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS', str(min(os.cpu_count() or 1, 4))))
+    IMAGE_UPLOAD_CONCURRENCY = int(os.environ.get('IMAGE_UPLOAD_CONCURRENCY', '8'))
+    # Upload limits. MAX_CONTENT_LENGTH caps the whole request (413 above it);
+    # the others are checked per image before it is decoded.
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', str(64 * 1024 * 1024)))
+    MAX_IMAGE_UPLOAD_BYTES = int(os.environ.get('MAX_IMAGE_UPLOAD_BYTES', str(15 * 1024 * 1024)))
+    MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', str(60_000_000)))
+    # Multipart file parts larger than this are spooled to UPLOAD_SPOOL_DIR
+    UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', str(256 * 1024)))
+    UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR')  # None = system temp dir
+    # Image storage: 'cloudinary', or 'local' to keep files on disk and serve
+    # them from /media (offline development and tests)
+    IMAGE_STORAGE_BACKEND = os.environ.get('IMAGE_STORAGE_BACKEND', 'cloudinary')
+    IMAGE_STORAGE_LOCAL_ROOT = os.environ.get('IMAGE_STORAGE_LOCAL_ROOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'media'))
+    IMAGE_STORAGE_LOCAL_URL = os.environ.get('IMAGE_STORAGE_LOCAL_URL')  # defaults to BACKEND_URL + /media
+    MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600
+    # Lifetime of signed direct-upload targets
+    DIRECT_UPLOAD_EXPIRES = int(os.environ.get('DIRECT_UPLOAD_EXPIRES', '900'))
+    # Admins can profile a single request with "X-Profile: 1"; profiles are speedscope files in PROFILE_DIR
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'true').lower() in ['true', 'on', '1']
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'profiles'))
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.005'))
+    # /metrics; with several worker processes set METRICS_DIR to a directory
+    # they share (emptied when the server starts) so the totals add up.
+    # gunicorn.conf.py defaults it to instance/metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+    METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+    # Per-request query counts and DB time in the Server-Timing header, plus a
+    # warning when one statement shape repeats more than the threshold (likely N+1)
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', 'true').lower() in ['true', 'on', '1']
+    SQL_REPEATED_STATEMENT_THRESHOLD = int(os.environ.get('SQL_REPEATED_STATEMENT_THRESHOLD', '10'))
+    # Statements slower than the threshold (0 disables) go to rotating JSON-lines logs, one per process
+    # (SLOW_QUERY_LOG.<pid>); a sample
+    # of slow SELECTs also gets EXPLAIN (EXPLAIN ANALYZE only when connected to a read replica)
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+    SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', '0.1'))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'slow_queries.log'))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', '5'))
+    # /apispec.json is served from this file, built from the route docstrings by
+    # `flask build-openapi`; the Swagger UI at /docs can be turned off in production
+    OPENAPI_SPEC_PATH = os.environ.get('OPENAPI_SPEC_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'openapi.json'))
+    OPENAPI_CACHE_MAX_AGE = int(os.environ.get('OPENAPI_CACHE_MAX_AGE', '300'))
+    SWAGGER_UI_ENABLED = os.environ.get('SWAGGER_UI_ENABLED', 'true').lower() in ['true', 'on', '1']
+    # Testimonials are served from an in-process snapshot re-validated every TTL seconds
+    TESTIMONIALS_SNAPSHOT_TTL = int(os.environ.get('TESTIMONIALS_SNAPSHOT_TTL', '30'))
+    TESTIMONIALS_CACHE_MAX_AGE = int(os.environ.get('TESTIMONIALS_CACHE_MAX_AGE', '60'))
+    # GET /api/home is rebuilt in the background HOME_CACHE_REFRESH_AHEAD seconds
+    # before its TTL runs out; a request after that rebuilds it before answering
+    HOME_CACHE_TTL = int(os.environ.get('HOME_CACHE_TTL', '60'))
+    HOME_CACHE_REFRESH_AHEAD = int(os.environ.get('HOME_CACHE_REFRESH_AHEAD', '15'))
+    HOME_CACHE_MAX_AGE = int(os.environ.get('HOME_CACHE_MAX_AGE', '30'))
+    HOME_FEATURED_LIMIT = int(os.environ.get('HOME_FEATURED_LIMIT', '8'))
+    # Insert the sample testimonials when the app starts (otherwise: flask seed-testimonials)
+    SEED_TESTIMONIALS_ON_STARTUP = os.environ.get('SEED_TESTIMONIALS_ON_STARTUP', 'false').lower() in ['true', 'on', '1']
+    # Image garbage collection (flask gc-images); 0 deletes per second means unlimited
+    IMAGE_GC_GRACE_MINUTES = int(os.environ.get('IMAGE_GC_GRACE_MINUTES', '60'))
+    IMAGE_GC_BATCH_SIZE = int(os.environ.get('IMAGE_GC_BATCH_SIZE', '500'))
+    IMAGE_GC_MAX_WORKERS = int(os.environ.get('IMAGE_GC_MAX_WORKERS', '4'))
+    IMAGE_GC_DELETES_PER_SECOND = float(os.environ.get('IMAGE_GC_DELETES_PER_SECOND', '10'))
+    # Variants uploaded per image; see IMAGE_VARIANTS in app/utils/cloudinary.py
+    IMAGE_VARIANT_NAMES = ('thumbnail', 'card', 'full')
+    IMAGE_VARIANT_FORMATS = ('jpeg', 'webp')
+    
     # Sendinblue
     SENDINBLUE_API_KEY = os.environ.get('SENDINBLUE_API_KEY')
+    # Point at tools/fake_sendinblue.py for local runs; unset uses the SDK's default host
+    SENDINBLUE_API_HOST = os.environ.get('SENDINBLUE_API_HOST')
     
     # M-Pesa configuration
     MPESA_CONSUMER_KEY = os.environ.get('MPESA_CONSUMER_KEY')
@@ -35,10 +105,34 @@ class Config:
     MPESA_BUSINESS_SHORTCODE = os.environ.get('MPESA_BUSINESS_SHORTCODE')
     MPESA_PASSKEY = os.environ.get('MPESA_PASSKEY')
     BACKEND_URL = os.environ.get('BACKEND_URL', 'http://localhost:5001')
+    MPESA_BASE_URL = os.environ.get('MPESA_BASE_URL', 'https://sandbox.safaricom.co.ke')
+    MPESA_CONNECT_TIMEOUT = float(os.environ.get('MPESA_CONNECT_TIMEOUT', '3.05'))
+    MPESA_READ_TIMEOUT = float(os.environ.get('MPESA_READ_TIMEOUT', '10'))
+    MPESA_POOL_SIZE = int(os.environ.get('MPESA_POOL_SIZE', '10'))
+    # Refresh the OAuth token this many seconds before Daraja says it expires
+    MPESA_TOKEN_REFRESH_MARGIN = int(os.environ.get('MPESA_TOKEN_REFRESH_MARGIN', '60'))
+    # Upper bound for GET /api/payments/<id>/status?wait=
+    PAYMENT_STATUS_MAX_WAIT = int(os.environ.get('PAYMENT_STATUS_MAX_WAIT', '30'))
+    # Long-pollers re-read the database this often to see changes made by other workers
+    PAYMENT_STATUS_POLL_INTERVAL = float(os.environ.get('PAYMENT_STATUS_POLL_INTERVAL', '2'))
+    MPESA_CALLBACK_BATCH_SIZE = int(os.environ.get('MPESA_CALLBACK_BATCH_SIZE', '100'))
+    # How long a callback may wait for its payment to record the CheckoutRequestID
+    MPESA_CALLBACK_MATCH_GRACE_SECONDS = int(os.environ.get('MPESA_CALLBACK_MATCH_GRACE_SECONDS', '300'))
+    # Payment reconciliation (flask reconcile-payments)
+    RECONCILE_PENDING_AFTER_MINUTES = int(os.environ.get('RECONCILE_PENDING_AFTER_MINUTES', '15'))
+    RECONCILE_BATCH_SIZE = int(os.environ.get('RECONCILE_BATCH_SIZE', '500'))
+    RECONCILE_MAX_WORKERS = int(os.environ.get('RECONCILE_MAX_WORKERS', '8'))
+    
+    # Background jobs
+    BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', '4'))
+    BACKGROUND_TASKS_EAGER = os.environ.get('BACKGROUND_TASKS_EAGER', 'false').lower() in ['true', 'on', '1']
     
     # Pagination
     ITEMS_PER_PAGE = 10
 
+    # Bulk admin operations
+    BULK_MAX_IDS = int(os.environ.get('BULK_MAX_IDS', '1000'))
+
     # Frontend URL for email verification
     FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:5174')
 
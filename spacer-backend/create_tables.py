@@ -3,6 +3,7 @@ from app.models.user import User
 from app.models.space import Space, SpaceImage, SpaceAmenity
 from app.models.booking import Booking, Payment
 from app.models.testimonial import Testimonial
+from app.models.media import StoredImage, ImageTombstone
 
 app = create_app()
 with app.app_context():
@@ -0,0 +1,83 @@
+"""Gunicorn settings for production.
+    
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment. Worker models:
+
+- ``gthread`` (default): each worker serves WEB_THREADS (4) requests at once.
+- ``sync``: used when WEB_THREADS=1; one request per worker process at a time.
+- ``gevent`` / ``eventlet``: many requests per worker on green threads
+  (``pip install gevent`` or ``eventlet``). Mostly useful for clients that
+  long-poll ``GET /api/payments/<id>/status?wait=``.
+
+A long poll holds its worker (sync) or thread (gthread) for the whole wait,
+so with sync workers a handful of polling clients can take every worker.
+Under sync workers PAYMENT_STATUS_MAX_WAIT therefore defaults to 5 seconds
+instead of 30, unless it is set in the environment. WEB_WORKER_CLASS=sync
+always runs one thread per worker, whatever WEB_THREADS says.
+
+METRICS_DIR defaults to ``instance/metrics``, emptied at startup, so two
+servers run from one checkout need their own METRICS_DIR.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5001')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get('WEB_THREADS', '4'))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+if worker_class == 'sync':
+    # Gunicorn quietly runs gthread for sync with more than one thread
+    threads = 1
+    # Read by config.py, which the app imports after this file
+    os.environ.setdefault('PAYMENT_STATUS_MAX_WAIT', '5')
+# Shared by the workers, so /metrics adds up all of them whichever one answers
+os.environ.setdefault('METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics'))
+# Concurrent clients per gevent/eventlet worker
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', '1000'))
+# Longer than PAYMENT_STATUS_MAX_WAIT, so long polls are not killed
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+# Recycle workers after this many requests (0 = never), staggered by the jitter
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', '0'))
+# Import the app once in the master and fork workers from it
+preload_app = os.environ.get('WEB_PRELOAD', 'true').lower() in ['true', 'on', '1']
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+def on_starting(server):
+    # Totals written by the workers of a previous run would be summed into this one's
+    from config import Config
+    from app.utils.metrics import metrics
+    metrics.directory = Config.METRICS_DIR
+    metrics.clear_directory()
+    if worker_class == 'sync' and Config.PAYMENT_STATUS_MAX_WAIT > 5:
+        server.log.warning(f'Sync workers with PAYMENT_STATUS_MAX_WAIT={Config.PAYMENT_STATUS_MAX_WAIT}: '
+                           f'each long-polling client holds a whole worker for up to that many seconds')
+
+def when_ready(server):
+    if preload_app:
+        from app.utils.workers import prepare_master
+        prepare_master(server.app.wsgi())
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.utils.workers import after_fork
+        after_fork(server.app.wsgi())
+
+def post_worker_init(worker):
+    # Runs after the worker has loaded the app and before it accepts connections
+    from app.utils.workers import warm_up
+    elapsed = warm_up(worker.wsgi, connections=threads if worker_class in ('sync', 'gthread') else worker_connections)
+    if elapsed is not None:
+        worker.log.info(f'Warmed up in {elapsed:.0f} ms')
+
+def worker_exit(server, worker):
+    # Let queued background jobs (emails, image processing) finish
+    from app.utils import tasks
+    from app.utils.metrics import metrics
+    tasks.shutdown(wait=True)
+    # Flushes are throttled; without this a recycled worker's last requests go uncounted
+    metrics.flush()
@@ -0,0 +1,41 @@
+import pytest
+from config import Config
+from app import create_app, db
+from app.utils.synthetic_data import SyntheticDataset
+from app.utils.sql_instrumentation import query_budget as _query_budget
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The app on a throwaway SQLite database filled with a small synthetic dataset."""
+    directory = tmp_path_factory.mktemp('spacer')
+    
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory / 'test.db'}"
+        SEED_TESTIMONIALS_ON_STARTUP = False
+        IMAGE_STORAGE_BACKEND = 'local'
+        IMAGE_STORAGE_LOCAL_ROOT = str(directory / 'media')
+        SLOW_QUERY_LOG = str(directory / 'slow_queries.log')
+        PROFILE_DIR = str(directory / 'profiles')
+    
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        SyntheticDataset(users=40, spaces=25, bookings=200, seed=1).load()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(n): ...`` fails the test if the block runs more than ``n`` queries.
+    
+    Yields the block's ``QueryStats`` for further checks, e.g. that a
+    list costs the same number of queries whatever its page size.
+    """
+    return _query_budget
@@ -0,0 +1,26 @@
+import json
+import time
+from app.utils.cache import RefreshAheadCache
+
+def test_expired_document_is_rebuilt_before_it_is_served(app, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    builds = []
+    def build():
+        builds.append(now[0])
+        return {'build': len(builds)}
+    cache = RefreshAheadCache('test', build, ttl=60, refresh_ahead=0)
+    
+    with app.app_context():
+        body, etag, age = cache.get()
+        assert json.loads(body) == {'build': 1}
+        
+        now[0] += 59
+        body, etag, age = cache.get()
+        assert (json.loads(body), age) == ({'build': 1}, 59)
+        
+        # A quiet worker: hours later the stale copy is not served
+        now[0] += 3 * 3600
+        body, etag, age = cache.get()
+        assert (json.loads(body), age) == ({'build': 2}, 0)
+    assert len(builds) == 2
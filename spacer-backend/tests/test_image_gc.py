@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models.media import ImageTombstone, StoredImage
+from app.utils.image_gc import collect_garbage
+from app.utils.storage import get_storage
+
+def test_failed_deletes_are_retried_and_not_reclaimed(app, monkeypatch):
+    with app.app_context():
+        storage = get_storage()
+        keys = {}
+        for name in ('a', 'b'):
+            keys[name] = [f'spacer/gc/{name}/full.jpg', f'spacer/gc/{name}/full.webp']
+            urls = [storage.save(key, b'x' * 100) for key in keys[name]]
+            db.session.add(StoredImage(content_hash=name * 64, backend=storage.name, variants={},
+                                       url=urls[0], keys=keys[name], size_bytes=200))
+            db.session.add(ImageTombstone(url=urls[0], reason='images_replaced',
+                                          created_at=datetime.utcnow() - timedelta(days=1)))
+        db.session.commit()
+        
+        delete = type(storage).delete
+        def flaky_delete(self, key):
+            if key == keys['b'][1]:
+                raise OSError('storage unavailable')
+            return delete(self, key)
+        monkeypatch.setattr(type(storage), 'delete', flaky_delete)
+        
+        report = collect_garbage(older_than_minutes=0)
+        assert report['objects_deleted'] == 3
+        assert report['bytes_reclaimed'] == 200
+        assert [error['key'] for error in report['errors']] == [keys['b'][1]]
+        retry = ImageTombstone.query.filter_by(reason='gc_retry').one()
+        assert retry.source_key == keys['b'][1]
+        
+        monkeypatch.setattr(type(storage), 'delete', delete)
+        report = collect_garbage(older_than_minutes=-1)
+        assert report['errors'] == []
+        assert storage.stat(keys['b'][1]) is None
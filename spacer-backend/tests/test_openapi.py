@@ -0,0 +1,16 @@
+import json
+from app import create_app
+from app.utils.openapi import build_spec, diff_spec
+
+def test_spec_check_and_served_spec_follow_optional_routes(app):
+    config = type('WithoutOptionalRoutes', (), {**app.config, 'PROFILING_ENABLED': False, 'METRICS_ENABLED': False})
+    lean = create_app(config)
+    with open(lean.config['OPENAPI_SPEC_PATH']) as f:
+        saved = json.load(f)
+
+    assert diff_spec(build_spec(lean), saved) == []
+
+    served = lean.test_client().get('/apispec.json').get_json()
+    assert '/api/profiles/{profile_id}' in saved['paths'] and '/metrics' in saved['paths']
+    assert '/api/profiles/{profile_id}' not in served['paths'] and '/metrics' not in served['paths']
+    assert served['paths']['/api/spaces'] == saved['paths']['/api/spaces']
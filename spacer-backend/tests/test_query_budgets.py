@@ -0,0 +1,24 @@
+import pytest
+
+def test_space_list_stays_within_budget(client, query_budget):
+    with query_budget(5):
+        response = client.get('/api/spaces?per_page=20')
+    assert response.status_code == 200
+    assert len(response.get_json()['spaces']) == 20
+
+def test_space_list_queries_do_not_grow_with_page_size(client, query_budget):
+    with query_budget() as small:
+        client.get('/api/spaces?per_page=2')
+    with query_budget() as large:
+        client.get('/api/spaces?per_page=20')
+    assert large.count == small.count
+
+def test_space_detail_stays_within_budget(client, query_budget):
+    with query_budget(4):
+        response = client.get('/api/spaces/1')
+    assert response.status_code == 200
+
+def test_budget_overrun_lists_the_statements(client, query_budget):
+    with pytest.raises(AssertionError, match=r'queries ran, the budget is 0:\n.*SELECT'):
+        with query_budget(0):
+            client.get('/api/spaces/1')
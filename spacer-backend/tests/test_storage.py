@@ -0,0 +1,53 @@
+import cloudinary.uploader
+import pytest
+from app.utils.storage import CloudinaryStorage, variant_key
+
+@pytest.fixture
+def cloudinary_assets(app, monkeypatch):
+    """Stub the Cloudinary uploader; returns ``{public_id: format}`` of the assets it holds."""
+    assets = {}
+    
+    def upload(file, public_id=None, format=None, overwrite=True, **options):
+        if overwrite or public_id not in assets:
+            assets[public_id] = format
+        return {'secure_url': f'https://res.cloudinary.com/demo/image/upload/v1/{public_id}.{assets[public_id]}'}
+    
+    def destroy(public_id):
+        return {'result': 'ok' if assets.pop(public_id, None) else 'not found'}
+    
+    monkeypatch.setattr(cloudinary.uploader, 'upload', upload)
+    monkeypatch.setattr(cloudinary.uploader, 'destroy', destroy)
+    with app.app_context():
+        yield assets
+
+def test_formats_of_one_size_are_separate_assets(cloudinary_assets):
+    storage = CloudinaryStorage()
+    jpeg_key = variant_key('spacer', 'ab' * 32, 'full', 'jpeg')
+    webp_key = variant_key('spacer', 'ab' * 32, 'full', 'webp')
+    jpeg_url = storage.save(jpeg_key, b'jpeg')
+    webp_url = storage.save(webp_key, b'webp')
+    
+    assert len(cloudinary_assets) == 2
+    assert jpeg_url.endswith('.jpg') and webp_url.endswith('.webp')
+    assert storage.key_for_url(jpeg_url) == jpeg_key
+    assert storage.key_for_url(webp_url) == webp_key
+    
+    assert storage.delete(webp_key)
+    assert list(cloudinary_assets.values()) == ['jpg']
+
+def test_assets_without_format_in_public_id_map_to_their_own_id(cloudinary_assets):
+    storage = CloudinaryStorage()
+    url = 'https://res.cloudinary.com/demo/image/upload/v1/spacer/ab/abab/full.jpg'
+    cloudinary_assets['spacer/ab/abab/full'] = 'jpg'
+    
+    key = storage.key_for_url(url)
+    assert storage.public_id(key) == ('spacer/ab/abab/full', None)
+    assert storage.delete(key)
+
+def test_failed_cloudinary_delete_raises(cloudinary_assets, monkeypatch):
+    storage = CloudinaryStorage()
+    assert storage.delete('spacer/ab/abab/missing.jpg') is False
+    
+    monkeypatch.setattr(cloudinary.uploader, 'destroy', lambda public_id: {'result': 'error'})
+    with pytest.raises(RuntimeError):
+        storage.delete('spacer/ab/abab/full.jpg')
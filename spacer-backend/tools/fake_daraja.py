@@ -0,0 +1,150 @@
+"""Minimal local stand-in for the Safaricom Daraja sandbox.
+
+Usage:
+    python -m tools.fake_daraja --port 8089
+    MPESA_BASE_URL=http://127.0.0.1:8089 flask run
+
+Implements just enough of the OAuth, STK push and STK query endpoints for
+local runs and tests. ``GET /__stats`` returns how many calls each endpoint has received, which
+is handy for checking that tokens are being reused.
+"""
+import argparse
+import json
+import threading
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+QUERY_RESULT_DESCRIPTIONS = {
+    0: 'The service request is processed successfully.',
+    1032: 'Request cancelled by user',
+    1037: 'DS timeout user cannot be reached',
+}
+
+
+class FakeDarajaHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeDaraja/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _authorized(self):
+        header = self.headers.get('Authorization', '')
+        return header.startswith('Bearer ') and header[len('Bearer '):] in self.server.tokens
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        self.server.record(path)
+        if path == '/oauth/v1/generate':
+            if not self.headers.get('Authorization', '').startswith('Basic '):
+                return self._send_json(400, {'errorMessage': 'Invalid Authentication passed'})
+            token = uuid.uuid4().hex
+            self.server.tokens.add(token)
+            return self._send_json(200, {'access_token': token, 'expires_in': str(self.server.token_ttl)})
+        if path == '/__stats':
+            return self._send_json(200, dict(self.server.calls))
+        self._send_json(404, {'errorMessage': 'Not found'})
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        self.server.record(path)
+        if not self._authorized():
+            return self._send_json(401, {'errorMessage': 'Invalid Access Token'})
+        payload = self._read_json()
+        if path == '/mpesa/stkpush/v1/processrequest':
+            checkout_request_id = f'ws_CO_{uuid.uuid4().hex[:20]}'
+            self.server.checkouts[checkout_request_id] = payload
+            return self._send_json(200, {
+                'MerchantRequestID': uuid.uuid4().hex[:16],
+                'CheckoutRequestID': checkout_request_id,
+                'ResponseCode': '0',
+                'ResponseDescription': 'Success. Request accepted for processing',
+                'CustomerMessage': 'Success. Request accepted for processing'
+            })
+        if path == '/mpesa/stkpushquery/v1/query':
+            checkout_request_id = payload.get('CheckoutRequestID')
+            result_code = self.server.query_results.get(checkout_request_id, self.server.default_query_result)
+            if result_code is None:
+                return self._send_json(500, {
+                    'requestId': uuid.uuid4().hex[:16],
+                    'errorCode': '500.001.1001',
+                    'errorMessage': 'The transaction is being processed'
+                })
+            return self._send_json(200, {
+                'ResponseCode': '0',
+                'ResponseDescription': 'The service request has been accepted successsfully',
+                'MerchantRequestID': uuid.uuid4().hex[:16],
+                'CheckoutRequestID': checkout_request_id,
+                'ResultCode': str(result_code),
+                'ResultDesc': QUERY_RESULT_DESCRIPTIONS.get(result_code, 'The transaction failed')
+            })
+        self._send_json(404, {'errorMessage': 'Not found'})
+
+
+class FakeDarajaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, token_ttl=3599, default_query_result=0, verbose=False):
+        super().__init__(address, FakeDarajaHandler)
+        self.token_ttl = token_ttl
+        self.verbose = verbose
+        self.tokens = set()
+        self.checkouts = {}
+        # STK query ResultCode per CheckoutRequestID; None means still processing
+        self.query_results = {}
+        self.default_query_result = default_query_result
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+
+    def record(self, path):
+        with self._calls_lock:
+            self.calls[path] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_in_thread(host='127.0.0.1', port=0, **kwargs):
+    """Start a server on a background thread; returns it so callers can read ``base_url``."""
+    server = FakeDarajaServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Daraja API for local development.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--token-ttl', type=int, default=3599, help='expires_in returned with OAuth tokens')
+    parser.add_argument('--query-result', type=int, default=0,
+                        help='ResultCode returned by STK queries (0 = paid, 1032 = cancelled)')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = FakeDarajaServer((args.host, args.port), token_ttl=args.token_ttl,
+                              default_query_result=args.query_result, verbose=args.verbose)
+    print(f'Fake Daraja listening on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Minimal local stand-in for the Sendinblue transactional email API.
+
+Usage:
+    python -m tools.fake_sendinblue --port 8090
+    SENDINBLUE_API_HOST=http://127.0.0.1:8090/v3 flask run
+
+Accepts ``POST /v3/smtp/email`` and drops the message. ``GET /__stats``
+returns how many emails were "sent".
+"""
+import argparse
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSendinblueHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeSendinblue/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/__stats':
+            return self._send_json(200, {'sent': self.server.sent})
+        self._send_json(404, {'code': 'not_found', 'message': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        if self.path.split('?', 1)[0] != '/v3/smtp/email':
+            return self._send_json(404, {'code': 'not_found', 'message': 'Not found'})
+        if not self.headers.get('api-key'):
+            return self._send_json(401, {'code': 'unauthorized', 'message': 'Key not found'})
+        with self.server.sent_lock:
+            self.server.sent += 1
+        self._send_json(201, {'messageId': f'<{uuid.uuid4().hex}@fake-sendinblue>'})
+
+
+class FakeSendinblueServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, verbose=False):
+        super().__init__(address, FakeSendinblueHandler)
+        self.verbose = verbose
+        self.sent = 0
+        self.sent_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v3'
+
+
+def start_in_thread(host='127.0.0.1', port=0, **kwargs):
+    """Start a server on a background thread; returns it so callers can read ``base_url``."""
+    server = FakeSendinblueServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Sendinblue API for local development.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = FakeSendinblueServer((args.host, args.port), verbose=args.verbose)
+    print(f'Fake Sendinblue listening on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
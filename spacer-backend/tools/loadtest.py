@@ -0,0 +1,497 @@
+"""Load-test the API with weighted scenarios built from the bundled Postman collections.
+
+Usage:
+    python -m tools.loadtest --concurrency 20 --duration 60 --output report.json
+    python -m tools.loadtest --database-url postgresql://localhost/spacer_load
+    python -m tools.loadtest --url http://127.0.0.1:5001
+
+Without --url the app is started in this process on a scratch database (a
+temporary SQLite file unless --database-url is given), with M-Pesa,
+Sendinblue and Cloudinary replaced by tools.fake_daraja,
+tools.fake_sendinblue and the local image storage backend. The scratch
+database is dropped and recreated, so never point --database-url at data
+you want to keep.
+
+Each request a scenario makes is taken from the collections: method, path,
+query string and example body come from there, and only ids, emails and
+times are filled in. The report lists p50/p95/p99 latency and throughput
+per endpoint as JSON, so two runs can be diffed.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Earlier collections win when several describe the same endpoint
+COLLECTIONS = (
+    'postman_collection.json',
+    'Peerspace_Spaces.postman_collection.json',
+    'postman_collection_spaces.json',
+)
+
+# Endpoints the scenarios need that no collection covers yet
+EXTRA_REQUESTS = {
+    'GET /api/payments/{id}/status': ('Get Payment Status', 'GET', '/api/payments/{}/status', {}, None),
+}
+
+SCENARIO_WEIGHTS = {'browse': 6, 'book_and_pay': 3, 'account': 1}
+
+CITIES = ('Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret')
+
+PASSWORD = 'LoadTest123!'
+
+_PATH_ID = re.compile(r'^(?:\d+|:\w+|\{\{\w+\}\})$')
+
+
+class CollectionRequest:
+    def __init__(self, name, method, path, query, body, form=False):
+        self.name = name
+        self.method = method
+        self.path = path  # with '{}' where the ids go
+        self.query = query
+        self.body = body  # parsed JSON, or the text fields of a form
+        self.form = form
+
+
+def load_collections(paths):
+    """Index the requests in Postman collections by ``'METHOD /path'``, ids written as ``{id}``."""
+    catalog = {}
+
+    def walk(items):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'])
+                continue
+            request = item['request']
+            url = request['url']['raw'] if isinstance(request['url'], dict) else request['url']
+            path, _, query = url.replace('{{base_url}}', '').partition('?')
+            segments = ['{}' if _PATH_ID.match(segment) else segment for segment in path.strip('/').split('/')]
+            path = '/' + '/'.join(segments)
+            endpoint = f"{request['method']} {path.replace('{}', '{id}')}"
+            if endpoint not in catalog:
+                catalog[endpoint] = CollectionRequest(
+                    item['name'], request['method'], path, dict(parse_qsl(query)), _example_body(request),
+                    form=(request.get('body') or {}).get('mode') == 'formdata'
+                )
+
+    for path in paths:
+        with open(path) as f:
+            walk(json.load(f)['item'])
+    for endpoint, args in EXTRA_REQUESTS.items():
+        catalog.setdefault(endpoint, CollectionRequest(*args))
+    return catalog
+
+
+def _example_body(request):
+    body = request.get('body') or {}
+    if body.get('mode') == 'raw' and body.get('raw'):
+        try:
+            return json.loads(body['raw'])
+        except ValueError:
+            return None
+    if body.get('mode') == 'formdata':
+        return {field['key']: field['value'] for field in body['formdata'] if field.get('type', 'text') == 'text'}
+    return None
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Latency and status of every request, grouped by endpoint."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = Counter()
+        self.scenarios = {}
+
+    def record(self, endpoint, seconds, status, ok):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.statuses.setdefault(endpoint, Counter())[str(status)] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def scenario_finished(self, name, outcome):
+        with self._lock:
+            self.scenarios.setdefault(name, Counter())[outcome] += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        all_latencies = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            all_latencies.extend(latencies)
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'statuses': dict(self.statuses[endpoint]),
+                'throughput_rps': round(len(latencies) / elapsed, 2),
+                **_latency_summary(latencies)
+            }
+        all_latencies.sort()
+        return {
+            'totals': {
+                'requests': len(all_latencies),
+                'errors': sum(self.errors.values()),
+                'throughput_rps': round(len(all_latencies) / elapsed, 2),
+                **_latency_summary(all_latencies)
+            },
+            'scenarios': {name: dict(outcomes) for name, outcomes in sorted(self.scenarios.items())},
+            'endpoints': endpoints
+        }
+
+
+def _latency_summary(sorted_latencies):
+    if not sorted_latencies:
+        return {}
+    return {
+        'p50_ms': round(percentile(sorted_latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(sorted_latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(sorted_latencies, 99) * 1000, 2),
+        'mean_ms': round(sum(sorted_latencies) / len(sorted_latencies) * 1000, 2),
+        'max_ms': round(sorted_latencies[-1] * 1000, 2)
+    }
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class ScenarioSkipped(Exception):
+    pass
+
+
+class VirtualUser:
+    """One simulated client with its own HTTP session and random stream."""
+
+    def __init__(self, base_url, catalog, recorder, rng, email=None):
+        self.base_url = base_url
+        self.catalog = catalog
+        self.recorder = recorder
+        self.rng = rng
+        self.email = email
+        self.session = requests.Session()
+        self.token = None
+
+    def call(self, endpoint, ids=(), query=None, body=None, expect=(200,)):
+        """Send the collection's request for ``endpoint``.
+
+        ``query`` and ``body`` are merged over the collection's examples;
+        ``body`` may also be a function that edits a copy of the example.
+        """
+        template = self.catalog[endpoint]
+        example = copy.deepcopy(template.body) if template.body is not None else {}
+        if callable(body):
+            payload = body(example)
+        else:
+            payload = {**example, **(body or {})} if (body or example) else None
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                template.method,
+                self.base_url + template.path.format(*ids),
+                params={**template.query, **(query or {})},
+                data=payload if template.form else None,
+                json=None if template.form or template.method == 'GET' else payload,
+                headers=headers,
+                timeout=60
+            )
+        except requests.RequestException as e:
+            self.recorder.record(endpoint, time.perf_counter() - started, type(e).__name__, False)
+            raise ScenarioFailed(f'{endpoint}: {e}')
+        ok = response.status_code in expect
+        self.recorder.record(endpoint, time.perf_counter() - started, response.status_code, ok)
+        if not ok:
+            raise ScenarioFailed(f'{endpoint}: {response.status_code} {response.text[:200]}')
+        return response.json() if response.content else None
+
+    def login(self):
+        data = self.call('POST /api/auth/login', body={'email': self.email, 'password': PASSWORD})
+        self.token = data['access_token']
+
+
+def browse(user):
+    """Anonymous search, a later page of results, then a look at one space."""
+    user.token = None
+    city = user.rng.choice(CITIES)
+    data = user.call('GET /api/spaces', query={'city': city})
+    if data['pages'] > 1:
+        data = user.call('GET /api/spaces', query={'city': city, 'page': user.rng.randint(2, data['pages'])})
+    if data['spaces']:
+        user.call('GET /api/spaces/{id}', ids=(user.rng.choice(data['spaces'])['id'],))
+
+
+def book_and_pay(user):
+    """Log in, find an available space, book it and pay with M-Pesa."""
+    user.login()
+    data = user.call('GET /api/spaces', query={
+        'city': user.rng.choice(CITIES), 'status': 'available', 'per_page': 20, 'min_price': None, 'max_price': None
+    })
+    if not data['spaces']:
+        raise ScenarioSkipped('no available spaces')
+    space = user.rng.choice(data['spaces'])
+
+    start = (datetime.utcnow() + timedelta(days=user.rng.randint(1, 60))).replace(
+        hour=user.rng.randint(8, 16), minute=0, second=0, microsecond=0
+    )
+    booking = user.call('POST /api/bookings', expect=(201,), body={
+        'space_id': space['id'],
+        'start_time': start.isoformat() + 'Z',
+        'end_time': (start + timedelta(hours=user.rng.randint(1, 3))).isoformat() + 'Z'
+    })
+    payment = user.call('POST /api/payments/mpesa/initiate/{id}', ids=(booking['id'],), expect=(202,))
+
+    # Wait for the STK push job to store the CheckoutRequestID, then play Safaricom
+    deadline = time.monotonic() + 30
+    while True:
+        status = user.call('GET /api/payments/{id}/status', ids=(payment['payment_id'],))
+        checkout_request_id = status['payment']['transaction_id']
+        if checkout_request_id or status['payment']['status'] != 'pending':
+            break
+        if time.monotonic() > deadline:
+            raise ScenarioFailed('STK push was never sent')
+        time.sleep(0.1)
+    if not checkout_request_id:
+        raise ScenarioFailed(f"STK push failed: {status['payment']['result_description']}")
+
+    def callback(example):
+        stk_callback = example['Body']['stkCallback']
+        stk_callback['CheckoutRequestID'] = checkout_request_id
+        stk_callback['ResultCode'] = 0
+        return example
+    user.call('POST /api/payments/mpesa-callback', body=callback)
+
+    status = user.call('GET /api/payments/{id}/status', ids=(payment['payment_id'],), query={'wait': 10})
+    if status['payment']['status'] != 'completed':
+        raise ScenarioFailed(f"payment ended {status['payment']['status']}")
+
+
+def account(user):
+    """Log in and look at the account pages."""
+    user.login()
+    user.call('GET /api/auth/me')
+    user.call('GET /api/users/activities')
+    user.call('GET /api/bookings')
+
+
+SCENARIOS = {'browse': browse, 'book_and_pay': book_and_pay, 'account': account}
+
+# Everything the scenarios and seeding call
+ENDPOINTS = (
+    'POST /api/auth/register', 'POST /api/auth/login', 'GET /api/auth/me', 'GET /api/users/activities',
+    'POST /api/spaces', 'GET /api/spaces', 'GET /api/spaces/{id}', 'GET /api/bookings', 'POST /api/bookings',
+    'POST /api/payments/mpesa/initiate/{id}', 'GET /api/payments/{id}/status', 'POST /api/payments/mpesa-callback',
+)
+
+
+def seed(base_url, catalog, recorder, rng, run_id, users, spaces):
+    """Register an owner with ``spaces`` spaces and ``users`` clients through the API."""
+    owner = VirtualUser(base_url, catalog, recorder, rng, f'loadtest-{run_id}-owner@example.com')
+    register(owner, 'owner')
+    for i in range(spaces):
+        owner.call('POST /api/spaces', expect=(201,), body={
+            'name': f'Load test space {i}',
+            'city': CITIES[i % len(CITIES)],
+            'price_per_hour': str(rng.randrange(100, 500, 10)),
+            'capacity': str(rng.randint(2, 50))
+        })
+
+    emails = [f'loadtest-{run_id}-client-{i}@example.com' for i in range(users)]
+    for email in emails:
+        register(VirtualUser(base_url, catalog, recorder, rng, email), 'client')
+    return emails
+
+
+def register(user, role):
+    try:
+        data = user.call('POST /api/auth/register', expect=(201,), body={
+            'email': user.email, 'password': PASSWORD, 'role': role
+        })
+        user.token = data['access_token']
+    except ScenarioFailed:
+        # Already registered by an earlier run with the same seed
+        user.login()
+
+
+def run(base_url, catalog, concurrency, duration, iterations, weights, seed_value, users, spaces):
+    recorder = Recorder()
+    rng = random.Random(seed_value)
+    emails = seed(base_url, catalog, recorder, rng, seed_value, users, spaces)
+
+    names = list(weights)
+    cumulative_weights = [weights[name] for name in names]
+    remaining = [iterations]
+    remaining_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def take_iteration():
+        if time.monotonic() >= deadline:
+            return False
+        if iterations is None:
+            return True
+        with remaining_lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def virtual_user(index):
+        user_rng = random.Random(f'{seed_value}-{index}')
+        user = VirtualUser(base_url, catalog, recorder, user_rng, emails[index % len(emails)])
+        while take_iteration():
+            name = user_rng.choices(names, cumulative_weights)[0]
+            try:
+                SCENARIOS[name](user)
+                recorder.scenario_finished(name, 'completed')
+            except ScenarioSkipped:
+                recorder.scenario_finished(name, 'skipped')
+            except ScenarioFailed:
+                recorder.scenario_finished(name, 'failed')
+
+    recorder.enabled = True
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(virtual_user, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return elapsed, recorder.report(elapsed)
+
+
+def start_local_app(database_url, scratch_dir):
+    """Start the app on a scratch database with every external service stubbed; returns its URL."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from config import Config
+    from app import create_app, db
+    from tools import fake_daraja, fake_sendinblue
+
+    daraja = fake_daraja.start_in_thread()
+    sendinblue = fake_sendinblue.start_in_thread()
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        MPESA_BASE_URL = daraja.base_url
+        MPESA_CONSUMER_KEY = 'loadtest'
+        MPESA_CONSUMER_SECRET = 'loadtest'
+        MPESA_BUSINESS_SHORTCODE = '174379'
+        MPESA_PASSKEY = 'loadtest'
+        SENDINBLUE_API_HOST = sendinblue.base_url
+        SENDINBLUE_API_KEY = 'loadtest'
+        IMAGE_STORAGE_BACKEND = 'local'
+        IMAGE_STORAGE_LOCAL_ROOT = os.path.join(scratch_dir, 'media')
+        SLOW_QUERY_LOG = os.path.join(scratch_dir, 'slow_queries.log')
+        PROFILE_DIR = os.path.join(scratch_dir, 'profiles')
+        SEED_TESTIMONIALS_ON_STARTUP = False
+
+    app = create_app(LoadTestConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server, app
+
+
+def parse_weights(value):
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Test an already running server instead of starting one')
+    parser.add_argument('--database-url', help='Scratch database for the local app (defaults to a temporary SQLite file)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Virtual users running scenarios at once')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run for')
+    parser.add_argument('--iterations', type=int, help='Stop after this many scenarios, if sooner')
+    parser.add_argument('--mix', type=parse_weights, default=SCENARIO_WEIGHTS,
+                        help='Scenario weights, e.g. browse=6,book_and_pay=3,account=1')
+    parser.add_argument('--users', type=int, default=20, help='Client accounts to register')
+    parser.add_argument('--spaces', type=int, default=200,
+                        help='Spaces to create; each booking takes one off the market')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the scenario mix and data')
+    parser.add_argument('--collection', action='append',
+                        help='Postman collection to read (repeatable; defaults to the bundled ones)')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    catalog = load_collections(args.collection or [os.path.join(BACKEND_DIR, name) for name in COLLECTIONS])
+    missing = [endpoint for endpoint in ENDPOINTS if endpoint not in catalog]
+    if missing:
+        parser.error(f"the collections don't describe: {', '.join(missing)}")
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        server = app = None
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            database_url = args.database_url or f"sqlite:///{os.path.join(scratch_dir, 'loadtest.db')}"
+            base_url, server, app = start_local_app(database_url, scratch_dir)
+
+        try:
+            elapsed, report = run(base_url, catalog, args.concurrency, args.duration, args.iterations,
+                                  args.mix, args.seed, args.users, args.spaces)
+        finally:
+            if server is not None:
+                server.shutdown()
+                from app import db
+                with app.app_context():
+                    db.session.remove()
+                    db.drop_all()
+                    db.engine.dispose()
+
+    report = {
+        'target': args.url or 'local',
+        'database': None if args.url else (args.database_url or 'sqlite').split(':', 1)[0],
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'mix': args.mix,
+        'duration_seconds': round(elapsed, 2),
+        **report
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        totals = report['totals']
+        print(f"{totals['requests']} requests, {totals['errors']} errors, "
+              f"{totals['throughput_rps']} req/s, p95 {totals.get('p95_ms')} ms -> {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
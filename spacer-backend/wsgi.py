@@ -0,0 +1,8 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+``run.py`` starts Flask's development server with the debugger on; never
+deploy that.
+"""
+from app import create_app
+
+app = create_app()